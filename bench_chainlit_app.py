@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+bench_chainlit_app.py - load test of the chat path of chainlit_app.py: N
+concurrent chat sessions against a local fake inference endpoint, time to
+first token (p50/p99) with a client per session & no streaming (as
+chainlit_app.py used to do) vs the shared, streaming InferenceClient, plus
+sessions that send a new message mid-answer
+
+Runs offline: fake_inference_server.py is started in a separate process, so
+the endpoint doesn't compete with the chat sessions for the event loop.
+
+usage: python bench_chainlit_app.py [--sessions N] [--messages N]
+                                    [--first-token-delay SECS] [--token-delay SECS]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+from langchain.prompts import PromptTemplate
+
+from fake_inference_server import make_app
+from inference_client import ChatSession, InferenceClient
+
+TEMPLATE = PromptTemplate(template="Answer politely.\n\n{question}", input_variables=["question"])
+
+
+def run_server(port, first_token_delay, token_delay):
+    web.run_app(make_app(first_token_delay, token_delay), host="127.0.0.1", port=port, print=None)
+
+
+def start_server(first_token_delay, token_delay):
+    """fake endpoint in its own process, its base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_server, args=(port, first_token_delay, token_delay), daemon=True
+    )
+    process.start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return process, f"http://127.0.0.1:{port}"
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(name, ttfts, elapsed, stats):
+    print(
+        f"{name:32} first token p50 {statistics.median(ttfts):5.2f}s  "
+        f"p99 {percentile(ttfts, 0.99):5.2f}s  wall {elapsed:5.2f}s  "
+        f"connections {stats['connections']:4}  tokens generated {stats['tokens']}"
+    )
+
+
+async def blocking_session(url, questions, max_new_tokens, ttfts):
+    """the old way: own client, the answer shows once it is complete"""
+    async with aiohttp.ClientSession() as http:
+        for question in questions:
+            start = time.perf_counter()
+            payload = {
+                "inputs": TEMPLATE.format(question=question),
+                "parameters": {"max_new_tokens": max_new_tokens},
+            }
+            async with http.post(url, json=payload) as response:
+                await response.json()
+            ttfts.append(time.perf_counter() - start)
+
+
+async def streaming_session(client, questions, ttfts, interrupt_after=None):
+    chat = ChatSession(client, TEMPLATE)
+    if interrupt_after is None:
+        answers = [await chat.ask(question) for question in questions]
+    else:
+        # the user sends the next message before the answer is done
+        tasks = []
+        for question in questions:
+            tasks.append(asyncio.create_task(chat.ask(question)))
+            await asyncio.sleep(interrupt_after)
+        answers = await asyncio.gather(*tasks)
+    ttfts.extend(a.time_to_first_token for a in answers if a.time_to_first_token is not None)
+    return sum(a.interrupted for a in answers)
+
+
+async def run(args):
+    async def scenario(name, make_sessions):
+        server, base_url = start_server(args.first_token_delay, args.token_delay)
+        ttfts = []
+        start = time.perf_counter()
+        results = await asyncio.gather(*make_sessions(f"{base_url}/models/fake", ttfts))
+        elapsed = time.perf_counter() - start
+        # let the server notice disconnected clients
+        await asyncio.sleep(0.2)
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f"{base_url}/stats") as response:
+                stats = await response.json()
+        server.terminate()
+        report(name, ttfts, elapsed, stats)
+        return results, stats
+
+    questions = [[f"Question {i}.{j} about vector databases" for j in range(args.messages)] for i in range(args.sessions)]
+    answer_time = args.first_token_delay + args.token_delay * (args.max_new_tokens - 1)
+    print(
+        f"{args.sessions} sessions x {args.messages} messages, "
+        f"{args.max_new_tokens} tokens per answer ({answer_time:.2f}s)\n"
+    )
+
+    await scenario(
+        "client per session, no streaming",
+        lambda url, ttfts: [
+            blocking_session(url, session_questions, args.max_new_tokens, ttfts)
+            for session_questions in questions
+        ],
+    )
+
+    clients = []
+
+    def streaming(interrupt_after=None):
+        def make_sessions(url, ttfts):
+            client = InferenceClient(url, max_new_tokens=args.max_new_tokens)
+            clients.append(client)
+            return [
+                streaming_session(client, session_questions, ttfts, interrupt_after)
+                for session_questions in questions
+            ]
+
+        return make_sessions
+
+    await scenario("shared client, streaming", streaming())
+    interrupted, stats = await scenario(
+        "new message mid-answer", streaming(interrupt_after=answer_time / 3)
+    )
+    print(
+        f"\n{sum(interrupted)} answers interrupted by a new message, "
+        f"{stats['disconnected']} generations stopped on the server, {stats['active']} still running"
+    )
+    for client in clients:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=3)
+    parser.add_argument("--max-new-tokens", type=int, default=100)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+bench_completion_cache.py - hit rate & latency saved by completion_cache.py:
+repeated prompts without a cache, with response_cache.py (the disk tier
+alone, no stampede protection) & with CompletionCache, concurrent identical
+requests, and the disk tier after a restart
+
+Runs offline against fake_local_model.py, its prompts (a few popular ones
+asked most of the time, some with different indentation) drawn at random.
+
+usage: python bench_completion_cache.py [--requests N] [--prompts N] [--latency SECS]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import warnings
+
+from completion_cache import CompletionCache
+from fake_local_model import FakeLocalModel
+from response_cache import ResponseCache
+
+warnings.filterwarnings("ignore", message=".*is in beta")
+
+
+def make_prompts(requests, prompts, seed=0):
+    """requests prompts out of prompts different ones, Zipf distributed"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(prompts)]
+    chosen = rng.choices(range(prompts), weights, k=requests)
+    # the same question from a triple quoted string, indented or not
+    return [
+        f"\n    Tell me about celebrity {i}.\n    " if rng.random() < 0.3 else f"Tell me about celebrity {i}."
+        for i in chosen
+    ]
+
+
+def run(llm, prompts):
+    start = time.perf_counter()
+    for prompt in prompts:
+        llm.invoke(prompt)
+    return time.perf_counter() - start
+
+
+def stampede(llm, prompt, threads):
+    workers = [threading.Thread(target=llm.invoke, args=(prompt,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--prompts", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    def make_llm(cache=None):
+        return FakeLocalModel(
+            first_token_delay=args.latency, cold_start_delay=0, token_delay=0, max_new_tokens=64, cache=cache
+        )
+
+    tmp = tempfile.mkdtemp()
+    prompts = make_prompts(args.requests, args.prompts)
+    print(f"{args.requests} requests, {len(set(p.strip() for p in prompts))} different prompts:")
+    elapsed = run(make_llm(), prompts)
+    print(f"  {'no cache':18} {elapsed:6.2f}s")
+    response_cache = ResponseCache(os.path.join(tmp, "response.db"))
+    elapsed = run(make_llm(response_cache), prompts)
+    print(f"  {'response_cache':18} {elapsed:6.2f}s  hit rate {response_cache.stats['hit_rate']:.0%}")
+    db_path = os.path.join(tmp, "completion.db")
+    cache = CompletionCache(db_path)
+    elapsed = run(make_llm(cache), prompts)
+    print(f"  {'completion_cache':18} {elapsed:6.2f}s  hit rate {cache.stats['hit_rate']:.0%}  {cache.stats}")
+
+    print(f"\n{args.threads} identical requests at once:")
+    response_cache = ResponseCache(os.path.join(tmp, "stampede_response.db"))
+    elapsed = stampede(make_llm(response_cache), "Who won the 1986 ICC world cup?", args.threads)
+    print(f"  {'response_cache':18} {elapsed:6.2f}s  model calls {response_cache.misses}")
+    stampede_cache = CompletionCache(os.path.join(tmp, "stampede_completion.db"))
+    elapsed = stampede(make_llm(stampede_cache), "Who won the 1986 ICC world cup?", args.threads)
+    print(f"  {'completion_cache':18} {elapsed:6.2f}s  model calls {stampede_cache.misses}  {stampede_cache.stats}")
+
+    print("\nlookup latency:")
+    llm = make_llm(cache)
+    start = time.perf_counter()
+    llm.invoke(prompts[0])
+    print(f"  {'memory':18} {(time.perf_counter() - start) * 1000:7.2f} ms")
+    # a restart: a new process opens the same db, the memory tier is empty
+    restarted = CompletionCache(db_path)
+    llm = make_llm(restarted)
+    start = time.perf_counter()
+    llm.invoke(prompts[0])
+    print(f"  {'disk (restarted)':18} {(time.perf_counter() - start) * 1000:7.2f} ms")
+    llm = make_llm()
+    start = time.perf_counter()
+    llm.invoke(prompts[0])
+    print(f"  {'model':18} {(time.perf_counter() - start) * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
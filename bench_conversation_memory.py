@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+bench_conversation_memory.py - prompt tokens & latency per turn over a long
+scripted chat: the full history in every prompt vs ConversationMemory
+(rolling window, with or without a summary, summarized in the background or
+inline, or with a summarizer that always fails)
+
+Runs offline: the chat model & the summarizer are fakes, with a latency of
+--base-latency seconds plus --prefill seconds per prompt token (& a fixed
+--summary-latency for the summarizer).
+
+usage: python bench_conversation_memory.py [--turns N] [--token-budget TOKENS]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from conversation_memory import ConversationMemory, _estimate_tokens, format_turn
+
+CHAT_PROMPT = """You are a helpful assistant.
+
+{history}
+
+User: {question}
+AI:"""
+TOPICS = ["budget", "deadline", "database", "hiring", "roadmap", "pricing", "security", "launch"]
+WORDS = "the we a plan team should next week data users cost risk review option".split()
+
+
+def scripted_question(turn, rng):
+    topic = TOPICS[turn % len(TOPICS)]
+    return f"Turn {turn}: what about the {topic}? We decided on option {rng.randint(1, 9)} last time."
+
+
+def fake_answer(question, rng, words=60):
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + "."
+
+
+def fake_summarizer(latency, words):
+    def summarize(prompt):
+        time.sleep(latency)
+        # the current summary + the new questions, most recent words kept
+        summary = prompt.split("Current summary:\n")[1].split("\n\n")[0].replace("(none yet)", "")
+        lines = [line[6:] for line in prompt.splitlines() if line.startswith("User: ")]
+        return " ".join(" ".join([summary, *lines]).split()[-words:])
+
+    return summarize
+
+
+def failing_summarizer(prompt):
+    raise RuntimeError("summarizer unavailable")
+
+
+def run_chat(args, memory=None):
+    rng = random.Random(0)
+    history = []
+    prompt_tokens, latencies = [], []
+    for turn in range(1, args.turns + 1):
+        question = scripted_question(turn, rng)
+        start = time.perf_counter()
+        past = memory.history() if memory is not None else "\n\n".join(history)
+        prompt = CHAT_PROMPT.format(history=past, question=question)
+        tokens = _estimate_tokens(prompt)
+        # the model: fixed latency + prompt processing
+        time.sleep(args.base_latency + args.prefill * tokens)
+        answer = fake_answer(question, rng)
+        if memory is not None:
+            memory.add_turn(question, answer)
+        else:
+            history.append(format_turn(question, answer))
+        latencies.append(time.perf_counter() - start)
+        prompt_tokens.append(tokens)
+    return prompt_tokens, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--token-budget", type=int, default=1000)
+    parser.add_argument("--summary-words", type=int, default=150)
+    parser.add_argument("--base-latency", type=float, default=0.02)
+    parser.add_argument("--prefill", type=float, default=0.00002, help="seconds per prompt token")
+    parser.add_argument("--summary-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    summarize = fake_summarizer(args.summary_latency, args.summary_words)
+    scenarios = [
+        ("full history", lambda: None),
+        ("window only", lambda: ConversationMemory(None, args.token_budget)),
+        (
+            "window + summary, background",
+            lambda: ConversationMemory(summarize, args.token_budget, args.summary_words),
+        ),
+        (
+            "window + summary, inline",
+            lambda: ConversationMemory(summarize, args.token_budget, args.summary_words, background=False),
+        ),
+        (
+            "window + failing summary",
+            lambda: ConversationMemory(failing_summarizer, args.token_budget, args.summary_words, background=False),
+        ),
+    ]
+    checkpoints = [t for t in (1, 50, 100, args.turns) if t <= args.turns]
+    print(f"{args.turns} turns, window of {args.token_budget} tokens\n")
+    print(
+        f"{'':30} prompt tokens at turn {', '.join(map(str, checkpoints)):16} {'mean':>6} | "
+        f"latency p50    p95    max  total"
+    )
+    for name, make_memory in scenarios:
+        memory = make_memory()
+        tokens, latencies = run_chat(args, memory)
+        latencies.sort()
+        at = ", ".join(str(tokens[t - 1]) for t in checkpoints)
+        print(
+            f"{name:30} {at:38} {statistics.mean(tokens):6.0f} | "
+            f"{statistics.median(latencies):10.3f}s {latencies[int(len(latencies) * 0.95)]:.3f}s "
+            f"{latencies[-1]:.3f}s {sum(latencies):5.2f}s"
+        )
+        if memory is not None:
+            memory.wait()
+            print(f"{'':30} {memory.stats}")
+
+
+if __name__ == "__main__":
+    main()
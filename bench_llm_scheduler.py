@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+bench_llm_scheduler.py - latency of concurrent requests to one CPU bound
+local model, called directly vs through GenerationScheduler
+
+Runs offline against fake_local_model.py, with a CPU cost per token. The fake
+model burns CPU in Python, so it effectively has one core: the scheduler is
+run with --concurrency 1 by default.
+
+usage: python bench_llm_scheduler.py [--users N] [--topics N] [--token-cpu SECS]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from fake_local_model import FakeLocalModel
+from llm_scheduler import CancelledError, GenerationScheduler
+
+TOPICS = [
+    "vector databases", "prompt engineering", "model evaluation", "data pipelines",
+    "GPU scheduling", "fine tuning", "RAG systems", "feature stores",
+]
+
+
+def prompt_for(user, num_topics):
+    return f"Write a blog for Researchers on {TOPICS[user % num_topics]}"
+
+
+def run_users(num_users, ask):
+    """num_users threads calling ask(user) at the same time, their latencies"""
+    latencies = [None] * num_users
+    start_line = threading.Barrier(num_users)
+
+    def user(i):
+        start_line.wait()
+        start = time.perf_counter()
+        if ask(i):
+            latencies[i] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(num_users)]
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [t for t in latencies if t is not None], time.perf_counter() - start, time.process_time() - cpu_start
+
+
+def report(name, latencies, elapsed, cpu):
+    latencies = sorted(latencies)
+    print(
+        f"{name:34} mean {statistics.mean(latencies):5.2f}s  "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:5.2f}s  "
+        f"first {latencies[0]:5.2f}s  wall {elapsed:5.2f}s  CPU {cpu:5.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--topics", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-cpu", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    llm = FakeLocalModel(
+        first_token_delay=0.0,
+        cold_start_delay=0.0,
+        token_delay=0.0,
+        token_cpu=args.token_cpu,
+        max_new_tokens=args.tokens,
+    )
+    # the fake model keeps no state per generation, it can stand in for
+    # one instance per concurrent request
+    llms = [llm] * args.concurrency
+    print(
+        f"{args.users} users, {args.topics} distinct prompts, "
+        f"{args.tokens * args.token_cpu:.2f}s CPU per answer\n"
+    )
+
+    report("direct, all at once", *run_users(
+        args.users, lambda i: llm.invoke(prompt_for(i, args.topics))
+    ))
+
+    scheduler = GenerationScheduler(llms)
+    report("scheduler", *run_users(
+        args.users, lambda i: scheduler.submit(prompt_for(i, args.topics)).result()
+    ))
+    print(f"  {scheduler.stats}")
+
+    scheduler = GenerationScheduler(llms)
+    report("scheduler, all distinct prompts", *run_users(
+        args.users, lambda i: scheduler.submit(prompt_for(i, len(TOPICS)) + f" #{i}").result()
+    ))
+
+    # every other user gives up after 0.3s: their requests are dropped
+    scheduler = GenerationScheduler(llms)
+
+    def impatient(i):
+        ticket = scheduler.submit(prompt_for(i, len(TOPICS)) + f" #{i}")
+        try:
+            return ticket.result(timeout=0.3 if i % 2 else None)
+        except (TimeoutError, CancelledError):
+            return None
+
+    report("scheduler, half the users give up", *run_users(args.users, impatient))
+    print(f"  {scheduler.stats}")
+
+    # a high priority request submitted after a queue has built up
+    scheduler = GenerationScheduler(llms)
+    tickets = [scheduler.submit(f"background job {i}") for i in range(args.users)]
+    start = time.perf_counter()
+    scheduler.submit("urgent request", priority=-1).result()
+    print(f"\nurgent request behind {args.users} queued ones: {time.perf_counter() - start:.2f}s")
+    for ticket in tickets:
+        ticket.cancel()
+
+
+if __name__ == "__main__":
+    main()
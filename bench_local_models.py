@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+bench_local_models.py - load time, first-token latency & resident memory of a
+local model: cold (loaded per request, as llama2_app1.py used to do) vs warm
+(ModelRegistry) vs a ModelWorker process
+
+Uses fake_local_model.py unless --model points at a real GGML model file (and
+ctransformers is installed).
+
+usage: python bench_local_models.py [--model PATH] [--requests N]
+                                    [--load-delay SECS] [--weights-mb MB]
+"""
+import argparse
+import functools
+import gc
+import time
+
+from fake_local_model import load_fake_local_model
+from local_models import ModelRegistry, ModelWorker, load_ctransformers, rss_mb, stream_tokens
+
+PROMPT = "Write a blog for Researchers job profile for the topic vector databases"
+CONFIG = {"max_new_tokens": 64, "temperature": 0}
+
+
+def first_token(tokens):
+    start = time.perf_counter()
+    next(iter(tokens), None)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=None, help="GGML model file, fake model if not given")
+    parser.add_argument("--model-type", default="llama")
+    parser.add_argument("--requests", type=int, default=3)
+    parser.add_argument("--load-delay", type=float, default=2.0, help="fake model only")
+    parser.add_argument("--weights-mb", type=int, default=512, help="fake model only")
+    args = parser.parse_args()
+
+    if args.model:
+        model, loader = args.model, load_ctransformers
+    else:
+        model = "fake-llama"
+        loader = functools.partial(
+            load_fake_local_model, load_delay=args.load_delay, weights_mb=args.weights_mb
+        )
+
+    print(f"baseline RSS {rss_mb():.0f} MB\n")
+    print("cold - model loaded for every request:")
+    for i in range(args.requests):
+        start = time.perf_counter()
+        llm = loader(model, args.model_type, CONFIG)
+        load_time = time.perf_counter() - start
+        ttft = first_token(stream_tokens(llm, PROMPT))
+        print(
+            f"  request {i + 1}: load {load_time:6.2f}s  first token {ttft:6.2f}s  "
+            f"total {load_time + ttft:6.2f}s  RSS {rss_mb():6.0f} MB"
+        )
+        del llm
+        gc.collect()
+
+    print("warm - ModelRegistry, loaded & warmed up once:")
+    registry = ModelRegistry(loader)
+    for i in range(args.requests):
+        start = time.perf_counter()
+        llm = registry.get(model, args.model_type, CONFIG)
+        load_time = time.perf_counter() - start
+        ttft = first_token(stream_tokens(llm, PROMPT))
+        print(
+            f"  request {i + 1}: get  {load_time:6.2f}s  first token {ttft:6.2f}s  "
+            f"total {load_time + ttft:6.2f}s  RSS {rss_mb():6.0f} MB"
+        )
+    print(f"  load stats: {registry.stats[0]}")
+    del llm, registry
+    gc.collect()
+
+    print("worker - model loaded in a separate process:")
+    start = time.perf_counter()
+    worker = ModelWorker(model, args.model_type, CONFIG, loader=loader)
+    print(f"  worker start {time.perf_counter() - start:6.2f}s")
+    for i in range(args.requests):
+        ttft = first_token(worker.stream(PROMPT))
+        # let the worker finish the answer before the next request
+        worker.generate("", max_new_tokens=1)
+        print(f"  request {i + 1}: first token {ttft:6.2f}s  UI process RSS {rss_mb():6.0f} MB")
+    stats = worker.stats()
+    print(f"  worker process RSS {stats['rss_total_mb']:.0f} MB, load stats: {stats}")
+    worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+bench_menu_parser.py - fuzz corpus & benchmark for menu_parser.py
+
+Builds a corpus of menus in the formats an LLM tends to return (tuples, JSON,
+numbered lists), then mangles them the ways LLM output goes wrong: truncation,
+missing brackets/quotes, code fences, trailing commas, chatter around the
+answer, etc. Reports for parse_menu() vs the old eval(): how many outputs
+parse, how many of the menu items are recovered, and the parse time.
+
+usage: python bench_menu_parser.py [--menus N] [--seed S]
+"""
+import argparse
+import ast
+import json
+import random
+import time
+
+from menu_parser import MenuParseError, parse_menu
+
+DISHES = [
+    "Paneer Tikka", "Butter Chicken", "Pad Thai", "Pho Bo", "Chef's Special Curry",
+    "Margherita Pizza", "Tacos al Pastor", "Kung Pao Chicken", "Croque Monsieur",
+    "Falafel Wrap", "Miso Ramen", "Tom Yum Soup", "Crème Brûlée", "Fish & Chips",
+    "Dal Makhani", "Gyoza (6 pcs)", "Bánh Mì", "Spaghetti Carbonara", "Hummus, Pita",
+]
+
+
+def make_menu(rng):
+    return [(d, f"${rng.randint(3, 40)}.{rng.choice(['00', '50', '99'])}")
+            for d in rng.sample(DISHES, rng.randint(8, 15))]
+
+
+def render(menu, rng):
+    """well formed output, in one of the formats LLMs use"""
+    fmt = rng.choice(["tuples", "tuples_single", "json", "json_lists", "lines"])
+    if fmt == "tuples":
+        return "[" + ", ".join(f'("{i}", "{p}")' for i, p in menu) + "]"
+    if fmt == "tuples_single":
+        return "[" + ", ".join(f"('{i}', '{p}')" for i, p in menu) + "]"
+    if fmt == "json":
+        return json.dumps([{"item": i, "price": p} for i, p in menu], ensure_ascii=False)
+    if fmt == "json_lists":
+        return json.dumps([[i, p] for i, p in menu], ensure_ascii=False, indent=2)
+    return "\n".join(f"{n}. {i} - {p}" for n, (i, p) in enumerate(menu, 1))
+
+
+def mangle(text, rng):
+    """break well formed output the way LLMs do"""
+    how = rng.choice(
+        ["none", "truncate", "no_brackets", "unquoted", "fence", "trailing_comma",
+         "chatter", "newlines", "drop_close_paren"]
+    )
+    if how == "truncate":
+        return text[: rng.randint(len(text) // 2, len(text) - 1)]
+    if how == "no_brackets":
+        return text.strip("[]")
+    if how == "unquoted":
+        return text.replace('"', "").replace("'", "") if text.startswith("[(") else text
+    if how == "fence":
+        return f"```python\n{text}\n```"
+    if how == "trailing_comma":
+        return text[:-1] + ",]" if text.endswith("]") else text
+    if how == "chatter":
+        return f"Sure! Here is the menu:\n{text}\nEnjoy your meal!"
+    if how == "newlines":
+        return text.replace("), (", "),\n(").replace("}, {", "},\n{")
+    if how == "drop_close_paren":
+        return text.replace(")", "", 1)
+    return text
+
+
+def old_eval(text):
+    # ast.literal_eval stands in for eval() - same parse rules, but safe to run
+    return list(ast.literal_eval(text.strip()))
+
+
+def evaluate(label, parse, corpus):
+    parsed = recovered = total = 0
+    start = time.perf_counter()
+    for text, menu in corpus:
+        total += len(menu)
+        try:
+            items = parse(text)
+        except (MenuParseError, ValueError, SyntaxError, TypeError):
+            continue
+        parsed += 1
+        recovered += len(set(map(tuple, items)) & set(menu))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:12s} parsed={parsed / len(corpus):6.1%}  "
+        f"items recovered={recovered / total:6.1%}  "
+        f"time={elapsed / len(corpus) * 1e6:7.1f} µs/output"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--menus", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = []
+    for _ in range(args.menus):
+        menu = make_menu(rng)
+        corpus.append((mangle(render(menu, rng), rng), menu))
+    evaluate("eval()", old_eval, corpus)
+    evaluate("parse_menu()", parse_menu, corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+bench_model_factory.py - script startup up to its first LLM client, before
+(provider imported & client built at the top of the script) vs after
+(model_factory.get_model()), and the cost of building a client on every
+Streamlit rerun vs get_model()'s cache
+
+Every startup is timed in a fresh interpreter (median of --runs), with dummy
+API keys - no request is made. Providers whose package isn't installed are
+reported as such. The scripts call get_model() at their top level, so the
+provider is still imported at startup: the factory doesn't make that
+faster, it saves building clients again (reruns, sessions, other scripts).
+
+usage: python bench_model_factory.py [--runs N] [--reruns N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from model_factory import ModelFactory, Provider
+
+# script -> what it did to create its LLM client, what it does now
+SCRIPTS = {
+    "example1.py": (
+        "from langchain.llms import OpenAI\nOpenAI(temperature=0.7)",
+        "from model_factory import get_model\nget_model('openai-llm', temperature=0.7)",
+    ),
+    "streamlit1.py": (
+        "from openai import OpenAI\nOpenAI()",
+        "from model_factory import get_model\nget_model('openai-client')",
+    ),
+    "gemini/app.py": (
+        "import google.generativeai as genai\ngenai.configure(api_key='x')\ngenai.GenerativeModel('gemini-pro')",
+        "from model_factory import get_model\nget_model('genai', 'gemini-pro')",
+    ),
+    "ice_breaker.py": (
+        "from langchain_google_genai import ChatGoogleGenerativeAI\nChatGoogleGenerativeAI(model='gemini-2.5-flash')",
+        "from model_factory import get_model\nget_model('gemini', 'gemini-2.5-flash')",
+    ),
+    "tutorial/simple_llm_with_lcel.py": (
+        "from langchain_openai import ChatOpenAI\nChatOpenAI(model='gpt-4')",
+        "from model_factory import get_model\nget_model('openai', 'gpt-4')",
+    ),
+    # a provider installed everywhere, to compare the two where the others aren't
+    "(FakeListLLM)": (
+        "from langchain_community.llms.fake import FakeListLLM\nFakeListLLM(responses=['ok'])",
+        "from model_factory import ModelFactory, Provider\n"
+        "ModelFactory({'fake': Provider('langchain_community.llms.fake', 'FakeListLLM', None, 'model_name')})"
+        ".get('fake', responses=['ok'])",
+    ),
+}
+DUMMY_KEYS = {"OPENAI_API_KEY": "sk-dummy", "GOOGLE_API_KEY": "dummy"}
+
+
+def startup_time(statements, runs):
+    """median seconds statements take in a fresh interpreter, None if they fail"""
+    code = f"import time\nstart = time.perf_counter()\n{statements}\nprint(time.perf_counter() - start)"
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent,
+            env={**os.environ, **DUMMY_KEYS},
+        )
+        if result.returncode:
+            return None
+        times.append(float(result.stdout))
+    return statistics.median(times)
+
+
+def _ms(seconds):
+    return "not installed" if seconds is None else f"{seconds * 1000:7.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--reruns", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'script':34} {'before':>13} {'after':>13}")
+    for script, (before, after) in SCRIPTS.items():
+        before, after = startup_time(before, args.runs), startup_time(after, args.runs)
+        print(f"{script:34} {_ms(before):>13} {_ms(after):>13}")
+
+    # a client per Streamlit rerun vs the cached one, with a provider that
+    # is installed everywhere
+    factory = ModelFactory(
+        {"fake": Provider("langchain_community.llms.fake", "FakeListLLM", None, "model_name")}
+    )
+    from langchain_community.llms.fake import FakeListLLM
+
+    start = time.perf_counter()
+    for _ in range(args.reruns):
+        FakeListLLM(responses=["ok"])
+    created = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.reruns):
+        factory.get("fake", responses=["ok"])
+    cached = time.perf_counter() - start
+    print(
+        f"\n{args.reruns} reruns: new client each time {created * 1000:.1f} ms, "
+        f"get_model() {cached * 1000:.1f} ms, {factory.stats}"
+    )
+
+
+if __name__ == "__main__":
+    main()
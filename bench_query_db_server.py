@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+bench_query_db_server.py - load test of query_db_server.py: N simulated users
+asking questions concurrently, plus a cancelled & a timed out question
+
+Runs offline: the server is started in-process on a synthetic SQLite database
+and the scripted fake LLM of bench_sql_fast_path.py (with --latency seconds
+per call) writes the SQL & answers.
+
+usage: python bench_query_db_server.py [--users N] [--questions N] [--latency SECS]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+
+from bench_sql_fast_path import QUESTIONS, ScriptedLLM, make_database
+from query_db import build_fast_path
+from query_db_server import QueryServer, make_app
+
+SLOW_QUESTION = "Please count to 1000000000"
+
+
+async def simulated_user(base_url, http, num_questions, rng, latencies, statuses):
+    async with http.post(f"{base_url}/sessions") as response:
+        session_id = (await response.json())["session_id"]
+    for _ in range(num_questions):
+        start = time.perf_counter()
+        async with http.post(
+            f"{base_url}/sessions/{session_id}/ask", json={"question": rng.choice(QUESTIONS)}
+        ) as response:
+            await response.read()
+            statuses[response.status] += 1
+        latencies.append(time.perf_counter() - start)
+    await http.delete(f"{base_url}/sessions/{session_id}")
+
+
+async def ask(base_url, http, session_id, question):
+    start = time.perf_counter()
+    async with http.post(
+        f"{base_url}/sessions/{session_id}/ask", json={"question": question}
+    ) as response:
+        return response.status, time.perf_counter() - start
+
+
+async def run(args, fast_path):
+    server = QueryServer(
+        fast_path, engine=fast_path.db.schema_cache.engine, timeout=args.timeout
+    )
+    runner = web.AppRunner(make_app(server))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        latencies, statuses = [], Counter()
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                simulated_user(
+                    base_url, http, args.questions, random.Random(i), latencies, statuses
+                )
+                for i in range(args.users)
+            )
+        )
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        print(
+            f"{args.users} users x {args.questions} questions: {elapsed:.1f}s, "
+            f"{len(latencies) / elapsed:.1f} questions/s, statuses {dict(statuses)}"
+        )
+        print(
+            f"latency p50 {latencies[len(latencies) // 2]:.2f}s, "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:.2f}s, "
+            f"mean {statistics.mean(latencies):.2f}s "
+            f"(one at a time, the same questions take {sum(latencies):.1f}s)"
+        )
+
+        # cancel a question (and its SQL) from the same session
+        async with http.post(f"{base_url}/sessions") as response:
+            session_id = (await response.json())["session_id"]
+        question = asyncio.create_task(ask(base_url, http, session_id, SLOW_QUESTION))
+        await asyncio.sleep(args.latency + 0.5)
+        await http.post(f"{base_url}/sessions/{session_id}/cancel")
+        status, seconds = await question
+        print(f"cancelled question: HTTP {status} after {seconds:.2f}s")
+
+        # a question running into the timeout
+        status, seconds = await ask(base_url, http, session_id, SLOW_QUESTION)
+        print(f"slow question: HTTP {status} after {seconds:.2f}s (timeout {args.timeout}s)")
+        # interrupted queries hand their connections back to the pool
+        await asyncio.sleep(0.5)
+        async with http.get(f"{base_url}/stats") as response:
+            print(f"server stats: {await response.json()}")
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "shop.db")
+        make_database(db_path)
+        fast_path = build_fast_path(
+            f"sqlite:///{db_path}",
+            llm=ScriptedLLM(latency=args.latency),
+            verbose=False,
+            schema_cache_path=os.path.join(tmp_dir, "schema_cache.json"),
+        )
+        asyncio.run(run(args, fast_path))
+        fast_path.db.schema_cache.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+bench_query_executor.py - tokens handed to the agent, latency & memory per
+query, SQLDatabase.run() vs QueryExecutor (first run & cached)
+
+Runs offline against a synthetic SQLite table of --rows rows (1 million by
+default), created in a temporary folder.
+
+usage: python bench_query_executor.py [--rows N] [--token-budget N]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from langchain.sql_database import SQLDatabase
+
+from query_executor import QueryExecutor, _estimate_tokens
+from schema_cache import create_pooled_engine
+
+QUERIES = [
+    "SELECT * FROM orders",
+    "SELECT * FROM orders WHERE amount > 999",
+    "SELECT category, COUNT(*), AVG(amount) FROM orders GROUP BY category",
+    "select *   from orders where amount > 999;",  # same as the 2nd, normalized
+]
+CATEGORIES = ["books", "games", "garden", "kitchen", "music", "sports", "toys"]
+
+
+def make_table(path, num_rows):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, category TEXT, amount REAL, note TEXT)"
+    )
+    rng = random.Random(0)
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?, ?)",
+        (
+            (
+                i,
+                rng.choice(CATEGORIES),
+                round(rng.uniform(0, 1000), 2),
+                None if i % 10 == 0 else f"order note {i}",
+            )
+            for i in range(num_rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    output = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return output, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--token-budget", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "orders.db")
+        start = time.perf_counter()
+        make_table(path, args.rows)
+        print(f"created {args.rows} rows in {time.perf_counter() - start:.1f}s\n")
+
+        engine = create_pooled_engine(f"sqlite:///{path}")
+        db = SQLDatabase(engine, sample_rows_in_table_info=0)
+        executor = QueryExecutor(engine, token_budget=args.token_budget, tables=lambda: ["orders"])
+
+        print(f"{'':36} {'tokens':>10} {'latency':>9} {'peak mem':>10}")
+        for sql in QUERIES:
+            print(sql)
+            for name, fn in [
+                ("SQLDatabase.run", lambda: db.run(sql)),
+                ("QueryExecutor", lambda: executor.run(sql)),
+                ("QueryExecutor, again", lambda: executor.run(sql)),
+            ]:
+                output, elapsed, peak = measure(fn)
+                tokens = _estimate_tokens(output) if output else 0
+                print(
+                    f"  {name:34} {tokens:10d} {elapsed * 1000:7.1f}ms "
+                    f"{peak / 2**20:8.1f}MB"
+                )
+        print(f"\nresult cache: {executor.stats}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
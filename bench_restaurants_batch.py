@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+bench_restaurants_batch.py - wall time for names & menus of every cuisine,
+sequential loop vs get_restaurant_name_and_items_batch() style pipelines
+
+Runs offline against a fake LLM with a random latency per call.
+
+usage: python bench_restaurants_batch.py [--latency SECS] [--concurrency N]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.llms import LLM
+
+from menu_parser import parse_menu
+from restaurants import CUISINES, arun_restaurant_pipelines, build_menu_retry_chain
+from restaurants import build_restaurant_chain
+
+
+class FakeSlowLLM(LLM):
+    """returns a restaurant name or a JSON menu, after a random delay of
+    latency +/- 50%"""
+
+    latency: float = 1.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-slow"
+
+    def _answer(self, prompt):
+        if "menu items" in prompt:
+            return json.dumps([{"item": f"Dish {i}", "price": f"${i}.99"} for i in range(12)])
+        return "The Fancy Fork"
+
+    def _delay(self):
+        return self.latency * random.uniform(0.5, 1.5)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        time.sleep(self._delay())
+        return self._answer(prompt)
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        await asyncio.sleep(self._delay())
+        return self._answer(prompt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    llm = FakeSlowLLM(latency=args.latency)
+    seq_chain = build_restaurant_chain(llm)
+    retry_chain = build_menu_retry_chain(llm)
+
+    start = time.perf_counter()
+    for cuisine in CUISINES:
+        parse_menu(seq_chain({"cuisine": cuisine})["menu_items"])
+    sequential = time.perf_counter() - start
+    print(f"sequential loop:        {sequential:6.2f}s for {len(CUISINES)} cuisines")
+
+    for concurrency in sorted({1, args.concurrency, len(CUISINES)}):
+        start = time.perf_counter()
+        responses = asyncio.run(
+            arun_restaurant_pipelines(CUISINES, seq_chain, retry_chain, concurrency)
+        )
+        elapsed = time.perf_counter() - start
+        assert all("menu" in response for response in responses)
+        print(
+            f"pipelines, {concurrency:2d} in flight: {elapsed:6.2f}s "
+            f"({sequential / elapsed:.1f}x faster)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+bench_sql_fast_path.py - LLM calls & latency per question, SQL agent (ReAct)
+vs SQLFastPath (single SQL prompt + template cache, agent as fallback)
+
+Runs offline: a scripted fake LLM (with a fixed latency per call) plays both
+the agent and the fast path, against a small synthetic SQLite database.
+
+usage: python bench_sql_fast_path.py [--latency SECS]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from typing import Any, List, Optional
+
+from langchain.agents import create_sql_agent
+from langchain.agents.agent_toolkits import SQLDatabaseToolkit
+from langchain.agents.agent_types import AgentType
+from langchain_core.language_models.llms import LLM
+
+from query_executor import QueryExecutor
+from schema_cache import CachedSQLDatabase, SchemaCache, create_pooled_engine
+from sql_fast_path import LLMCallCounter, SQLFastPath
+
+# question pattern -> SQL the fake LLM writes for it
+SCRIPT = [
+    (r"How many orders are in category '(\w+)'", "SELECT COUNT(*) FROM orders WHERE category = '{0}'"),
+    (r"average amount of orders over (\d+)", "SELECT AVG(amount) FROM orders WHERE amount > {0}"),
+    (r"How many customers live in (\w+)", "SELECT COUNT(*) FROM customers WHERE country = '{0}'"),
+    (r"top (\d+) customers", (
+        "SELECT c.name, SUM(o.amount) AS total FROM customers c JOIN orders o "
+        "ON o.customer_id = c.id GROUP BY c.name ORDER BY total DESC LIMIT {0}"
+    )),
+    # a slow query, to exercise timeouts (see bench_query_db_server.py)
+    (r"count to (\d+)", (
+        "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < {0}) "
+        "SELECT COUNT(*) FROM c"
+    )),
+    # the fast path gets this one wrong, so the agent has to take over
+    (r"busiest month", "SELECT month(created), COUNT(*) FROM orders GROUP BY 1 ORDER"),
+]
+AGENT_SQL = "SELECT strftime('%m', created) AS m, COUNT(*) FROM orders GROUP BY m ORDER BY 2 DESC LIMIT 1"
+QUESTIONS = [
+    "How many orders are in category 'books'?",
+    "How many orders are in category 'games'?",
+    "How many orders are in category 'toys'?",
+    "What is the average amount of orders over 500?",
+    "What is the average amount of orders over 900?",
+    "How many customers live in Canada?",
+    "How many customers live in Brazil?",
+    "Who are the top 3 customers by amount spent?",
+    "Who are the top 5 customers by amount spent?",
+    "Which was the busiest month?",
+]
+
+
+def scripted_sql(question):
+    for pattern, sql in SCRIPT:
+        match = re.search(pattern, question)
+        if match:
+            return sql.format(*match.groups())
+    return "SELECT 1"
+
+
+class ScriptedLLM(LLM):
+    """plays the SQL agent (list tables, schema, check, query, answer) and the
+    fast path prompts, waiting latency seconds per call"""
+
+    latency: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    def _answer(self, prompt):
+        if "Double check the" in prompt:  # the agent's query checker tool
+            return prompt.split("Double check the")[0].strip()
+        if "SQL result:" in prompt:  # fast path answer
+            return "Here is the answer: " + prompt.split("SQL result:")[1].split("\n")[0]
+        question = prompt.rsplit("Question: ", 1)[1].split("\n")[0]
+        if "SQL query:" in prompt:  # fast path SQL
+            return scripted_sql(question)
+        sql = AGENT_SQL if "busiest" in question else scripted_sql(question)
+        steps = prompt.rsplit("Question: ", 1)[1].count("Observation:")
+        return [
+            "Action: sql_db_list_tables\nAction Input: ",
+            "Thought: I should look at the schema.\nAction: sql_db_schema\nAction Input: customers, orders",
+            f"Thought: I should check my query.\nAction: sql_db_query_checker\nAction Input: {sql}",
+            f"Thought: I should run my query.\nAction: sql_db_query\nAction Input: {sql}",
+            "Thought: I now know the final answer\nFinal Answer: here it is",
+        ][min(steps, 4)]
+
+
+def make_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, country TEXT)")
+    conn.execute(
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, "
+        "category TEXT, amount REAL, created TEXT)"
+    )
+    rng = random.Random(0)
+    countries = ["Brazil", "Canada", "India", "Japan"]
+    conn.executemany(
+        "INSERT INTO customers VALUES (?, ?, ?)",
+        [(i, f"customer {i}", rng.choice(countries)) for i in range(500)],
+    )
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                i,
+                rng.randrange(500),
+                rng.choice(["books", "games", "toys"]),
+                round(rng.uniform(1, 1000), 2),
+                f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            )
+            for i in range(20_000)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        make_database(os.path.join(tmp_dir, "shop.db"))
+        engine = create_pooled_engine(f"sqlite:///{os.path.join(tmp_dir, 'shop.db')}")
+        schema_cache = SchemaCache(engine, os.path.join(tmp_dir, "schema_cache.json"))
+        executor = QueryExecutor(engine, tables=lambda: schema_cache.tables)
+        db = CachedSQLDatabase(engine, schema_cache, executor=executor)
+        llm = ScriptedLLM(latency=args.latency)
+        agent = create_sql_agent(
+            llm=llm,
+            toolkit=SQLDatabaseToolkit(db=db, llm=llm),
+            agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        )
+        fast_path = SQLFastPath(llm, db, agent=agent)
+
+        totals = {"agent": [0, 0.0], "fast path": [0, 0.0]}
+        print(f"{'question':50} {'agent':>14} {'fast path':>14}  route")
+        for question in QUESTIONS:
+            counter = LLMCallCounter()
+            start = time.perf_counter()
+            agent.run(question, callbacks=[counter])
+            agent_time = time.perf_counter() - start
+            start = time.perf_counter()
+            response = fast_path.answer(question)
+            fast_time = time.perf_counter() - start
+            totals["agent"][0] += counter.calls
+            totals["agent"][1] += agent_time
+            totals["fast path"][0] += response["llm_calls"]
+            totals["fast path"][1] += fast_time
+            print(
+                f"{question[:50]:50} {counter.calls:2d} calls {agent_time:4.1f}s "
+                f"{response['llm_calls']:2d} calls {fast_time:4.1f}s  {response['source']}"
+            )
+        print()
+        for name, (calls, elapsed) in totals.items():
+            print(
+                f"{name:10}: {calls / len(QUESTIONS):.1f} LLM calls & "
+                f"{elapsed / len(QUESTIONS):.2f}s per question"
+            )
+
+
+if __name__ == "__main__":
+    main()
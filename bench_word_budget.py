@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+bench_word_budget.py - tokens generated vs words asked for, with a fixed
+max_new_tokens (256, as llama2_app1.py used to do) vs a token budget derived
+from the words & early stopping (word_budget.py)
+
+Uses fake_local_model.py (which, like a real model, writes more words than it
+is asked for) unless --model points at a real GGML model file.
+
+usage: python bench_word_budget.py [--model PATH] [--words 50,100,200,400]
+"""
+import argparse
+import time
+
+from fake_local_model import FakeLocalModel
+from local_models import load_ctransformers, stream_tokens
+from word_budget import SENTENCE_END_RE, token_budget, tokens_per_word, until_word_target
+
+AUDIENCES = ["Researchers", "Data Scientists", "Common People"]
+TEMPLATE = """
+    Write a blog for {target_audience} job profile for the topic {blog_topic}
+    no more than {num_words} words.
+    """
+
+
+def generate(tokens):
+    start = time.perf_counter()
+    tokens = list(tokens)
+    text = "".join(tokens)
+    return len(tokens), len(text.split()), bool(SENTENCE_END_RE.search(text)), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=None, help="GGML model file, fake model if not given")
+    parser.add_argument("--model-type", default="llama")
+    parser.add_argument("--topic", default="vector databases")
+    parser.add_argument("--words", default="50,100,200,400")
+    parser.add_argument("--fixed-tokens", type=int, default=256)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="fake model only")
+    args = parser.parse_args()
+
+    if args.model:
+        llm = load_ctransformers(args.model, args.model_type, {"temperature": 0, "context_length": 2048})
+    else:
+        llm = FakeLocalModel(first_token_delay=0.0, cold_start_delay=0.0, token_delay=args.token_delay)
+    print(f"{tokens_per_word(llm):.2f} tokens per word\n")
+    print(
+        f"{'audience':16} {'words':>5} | {'fixed: tokens':>13} {'words':>5} {'ends':>5} {'time':>6} | "
+        f"{'budget':>6} {'tokens':>6} {'words':>5} {'ends':>5} {'time':>6}"
+    )
+
+    totals = {"fixed": [0, 0.0, 0], "budget": [0, 0.0, 0]}
+    for audience in AUDIENCES:
+        for num_words in map(int, args.words.split(",")):
+            prompt = TEMPLATE.format(
+                target_audience=audience, blog_topic=args.topic, num_words=num_words
+            )
+            fixed = generate(stream_tokens(llm, prompt, max_new_tokens=args.fixed_tokens))
+            budget = token_budget(llm, num_words)
+            adaptive = generate(
+                until_word_target(stream_tokens(llm, prompt, max_new_tokens=budget), num_words)
+            )
+            for name, (tokens, _, ends, elapsed) in (("fixed", fixed), ("budget", adaptive)):
+                totals[name][0] += tokens
+                totals[name][1] += elapsed
+                totals[name][2] += not ends
+            print(
+                f"{audience:16} {num_words:5} | {fixed[0]:13} {fixed[1]:5} {str(fixed[2]):>5} "
+                f"{fixed[3]:5.2f}s | {budget:6} {adaptive[0]:6} {adaptive[1]:5} "
+                f"{str(adaptive[2]):>5} {adaptive[3]:5.2f}s"
+            )
+
+    print()
+    for name, (tokens, elapsed, cut_off) in totals.items():
+        print(f"{name:6}: {tokens:6} tokens generated in {elapsed:6.2f}s, {cut_off} blogs cut off mid-sentence")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,51 +2,75 @@
 """
 chainlit_app.py: basic chainlit application with TII Falcon 7 Bn model on Hugging Face
 to run: $> chainlit run chainlit_app.py -w
+
+All chat sessions share one async client (& its connection pool) to the
+inference endpoint, answers are streamed token by token, and a new message
+cancels the answer still being generated (see inference_client.py). Each
+session remembers the recent turns & a summary of the older ones (see
+conversation_memory.py).
+Set INFERENCE_URL to use another endpoint, e.g. fake_inference_server.py.
 """
 
 import os
+from functools import partial
+
 from dotenv import load_dotenv
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain.llms import HuggingFaceHub
 import chainlit as cl
 
+from conversation_memory import ConversationMemory
+from inference_client import HF_INFERENCE_URL, ChatSession, InferenceClient
+
 template = """
 You are an AI assistant who gives helpful, detailed and polite answers to the user's questions.
 
-{question}
-"""
+{history}
+
+User: {question}
+AI:"""
+
+# load all API keys from .env file
+load_dotenv()
+
+# we'll be using the Falcon 7 Bn model on HuggingFace Hub
+repo_id = "tiiuae/falcon-7b-instruct"
+# shared by all chat sessions
+client = InferenceClient(
+    os.environ.get("INFERENCE_URL", HF_INFERENCE_URL.format(repo_id=repo_id)),
+    token=os.environ.get("HUGGINGFACEHUB_API_TOKEN"),
+    temperature=0.6,
+    max_new_tokens=2000,
+)
+prompt_template = PromptTemplate(template=template, input_variables=["history", "question"])
 
 
 @cl.on_chat_start
 def main():
     """initializations when the chat starts"""
-    # load all API keys from .env file
-    load_dotenv()
-
-    # we'll be using the Falcon 7 Bn model on HuggingFace Hub
-    repo_id = "tiiuae/falcon-7b-instruct"
-    llm = HuggingFaceHub(
-        repo_id=repo_id,
-        huggingfacehub_api_token=os.environ["HUGGINGFACEHUB_API_TOKEN"],
-        model_kwargs={"temperature": 0.6, "max_new_tokens": 2000},
-    )
-    prompt_template = PromptTemplate(template=template, input_variables=["question"])
-    llm_chain = LLMChain(prompt=prompt_template, llm=llm, verbose=True)
-    # store chain in user's session
-    cl.user_session.set("llm_chain", llm_chain)
+    # the memory's summary is updated in the background, by the same model
+    memory = ConversationMemory(partial(client.generate, max_new_tokens=400))
+    # store the chat in user's session
+    cl.user_session.set("chat", ChatSession(client, prompt_template, memory))
 
 
 @cl.on_message
-async def main(message: str):
+async def main(message):
     """will be called every time a user submits a prompt on chat window"""
-    # add your custom logic here..
-    llm_chain = cl.user_session.get("llm_chain")
-    # call chain asynchronously
-    res = await llm_chain.acall(message, callbacks=[cl.AsyncLangchainCallbackHandler()])
+    chat = cl.user_session.get("chat")
+    # older chainlit versions pass the text, newer ones a cl.Message
+    question = getattr(message, "content", message)
+
+    # stream the answer into the message as tokens arrive; an answer still
+    # being generated for this session is cancelled
+    msg = cl.Message(content="")
+    answer = await chat.ask(question, on_token=msg.stream_token)
+    if answer.text:
+        await msg.send()
 
-    # post processing
 
-    # "res" is a Dict. For this chain, we get the response by reading the "text" key.
-    # This varies from chain to chain, you should check which key to read.
-    await cl.Message(content=res["text"]).send()
+@cl.on_stop
+def on_stop():
+    """the user clicked stop: cancel the answer being generated"""
+    chat = cl.user_session.get("chat")
+    if chat is not None:
+        chat.cancel()
@@ -0,0 +1,297 @@
+"""
+completion_cache.py - two tier (memory + SQLite) completion cache shared by
+LangChain LLMs and the raw openai & google.generativeai clients
+
+CompletionCache is a response_cache.ResponseCache with a memory tier in
+front of it. A completion is found by the normalized prompt & the model +
+all its parameters (see response_cache.py):
+    1. in memory, an LRU of the memory_entries most recently used, else
+    2. in ResponseCache's SQLite db, shared by processes & kept across
+       restarts (entries expire after a TTL, the least recently used are
+       evicted beyond max_entries), else
+    3. from the model - identical requests made while it is in flight (from
+       other Streamlit sessions or threads) wait for that one call instead of
+       making their own
+A LangChain call that fails never gets to the cache (only lookup() & update()
+are), so the in-flight call belongs to the thread that looked it up: it is
+released when that thread looks the prompt up again (a retry, or the same
+prompt twice in one batch) or, with error_handler in the LLM's callbacks,
+when the call fails. Async LangChain calls are looked up but not coalesced,
+they are looked up on executor threads.
+Every entry remembers how long its call took, so stats also reports the
+latency saved by the hits.
+
+NOTE: a cached answer is returned as is - only cache calls with temperature
+0. The raw client helpers check: calls at another temperature (or the
+client's default one) go straight to the model.
+
+Usage:
+    cache = CompletionCache("completion_cache.db")
+    # LangChain: per LLM, or for all of them with set_llm_cache(cache)
+    llm = get_model("openai-llm", temperature=0, cache=cache, callbacks=[cache.error_handler])
+    # raw clients, both return the answer's text
+    text = cache.chat_completion(client.chat.completions.create, model="gpt-4o", messages=messages)
+    text = cache.generate_content(genai_model, "Hello")
+    print(cache.stats)
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Callable, Optional, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE
+from langchain_core.callbacks import BaseCallbackHandler
+
+from response_cache import ResponseCache, _key
+
+
+def _temperature(config) -> Optional[float]:
+    """temperature of a generation config - a dict, or an object like
+    genai.GenerationConfig"""
+    if config is None:
+        return None
+    if isinstance(config, dict):
+        return config.get("temperature")
+    return getattr(config, "temperature", None)
+
+
+def _model_string(name: str, params: dict) -> str:
+    return f"{name}:{json.dumps(params, sort_keys=True, default=repr)}"
+
+
+# the result of an in-flight call that was given up: its waiters make their own
+_RELEASED = object()
+
+
+class _ReleaseOnError(BaseCallbackHandler):
+    """releases the calls in flight of the failing thread (LangChain calls
+    on_llm_error in the thread that made the call)"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.cache._release(threading.get_ident())
+
+
+class CompletionCache(ResponseCache):
+    """see module docstring
+
+    Args:
+        db_path: SQLite database file
+        memory_entries: completions kept in memory
+        ttl: seconds a completion stays valid (None = forever)
+        max_entries: max completions kept on disk, least recently used are evicted
+        wait_timeout: max seconds to wait for an identical call in flight,
+            after that the caller makes its own
+        embeddings, similarity_threshold: see ResponseCache
+    """
+
+    def __init__(
+        self,
+        db_path: str = "completion_cache.db",
+        memory_entries: int = 256,
+        ttl: Optional[float] = 7 * 24 * 60 * 60,
+        max_entries: int = 10_000,
+        wait_timeout: float = 60,
+        embeddings=None,
+        similarity_threshold: float = 0.95,
+    ):
+        super().__init__(db_path, ttl, max_entries, embeddings, similarity_threshold)
+        self.memory_entries = memory_entries
+        self.wait_timeout = wait_timeout
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.shared = 0  # waited for an identical call in flight
+        self.misses = 0
+        self.saved = 0.0  # seconds the hits would have spent on calls
+        self._memory = OrderedDict()  # key -> (value, elapsed, created)
+        self._in_flight = {}  # key -> (Future, start, thread making the call)
+        self.error_handler = _ReleaseOnError(self)
+
+    def _fresh(self, created: float) -> bool:
+        return self.ttl is None or time.time() - created < self.ttl
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _cached(self, key, prompt, model):
+        """(value, elapsed, created) of key from memory, else from disk, None
+        if it isn't cached - call with _lock held"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            if self._fresh(entry[2]):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+            del self._memory[key]
+        entry = self._read(key, prompt, model)
+        if entry is None:
+            return None
+        self.disk_hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def _begin(self, key, prompt, model, coalesce: bool = True) -> Tuple[bool, Any]:
+        """(True, value) if key is cached or an identical call in flight
+        returns it in time, else (False, None) and the caller makes the call"""
+        with self._lock:
+            entry = self._cached(key, prompt, model)
+            if entry is not None:
+                self.saved += entry[1]
+                return True, entry[0]
+            in_flight = self._in_flight.get(key) if coalesce else None
+            now = time.perf_counter()
+            thread = threading.get_ident()
+            # this thread's own earlier call is over (a retry, or the same
+            # prompt twice in a batch) - or it is too old to wait for
+            if in_flight is None or in_flight[2] == thread or now - in_flight[1] > self.wait_timeout:
+                if coalesce:
+                    self._in_flight[key] = (Future(), now, thread)
+                self.misses += 1
+                waiting = None
+            else:
+                waiting = in_flight
+        if waiting is None:
+            if in_flight is not None:
+                # its waiters make their own call
+                self._set_result(in_flight[0], _RELEASED)
+            return False, None
+        future, start, _ = waiting
+        try:
+            # an exception of the call is raised here too
+            value = future.result(timeout=self.wait_timeout - (now - start))
+        except TimeoutError:
+            value = _RELEASED
+        with self._lock:
+            if value is _RELEASED:
+                self.misses += 1
+                return False, None
+            self.shared += 1
+            # the part of the call that was over before this caller came
+            self.saved += now - start
+        return True, value
+
+    @staticmethod
+    def _set_result(future: Future, value):
+        if not future.done():
+            future.set_result(value)
+
+    def _store(self, key, model: str, prompt: str, value):
+        with self._lock:
+            future, start, _ = self._in_flight.pop(key, (None, time.perf_counter(), None))
+            elapsed = time.perf_counter() - start
+            self._remember(key, (value, elapsed, time.time()))
+            self._write(key, model, prompt, value, elapsed)
+        if future is not None:
+            self._set_result(future, value)
+
+    def _fail(self, key, error: Exception):
+        with self._lock:
+            future, _, _ = self._in_flight.pop(key, (None, None, None))
+        if future is not None and not future.done():
+            future.set_exception(error)
+
+    def _release(self, thread: int):
+        """give up the calls in flight of thread, their waiters make their own"""
+        with self._lock:
+            keys = [key for key, (_, _, owner) in self._in_flight.items() if owner == thread]
+            futures = [self._in_flight.pop(key)[0] for key in keys]
+        for future in futures:
+            self._set_result(future, _RELEASED)
+
+    # LangChain's cache interface, the prompt & llm_string come from LangChain
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        found, value = self._begin(_key(prompt, llm_string), prompt, llm_string)
+        return value if found else None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self._store(_key(prompt, llm_string), llm_string, prompt, list(return_val))
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        # not coalesced: the default alookup() runs lookup() on an executor
+        # thread, which doesn't own the call & can't release it
+        found, value = self._begin(_key(prompt, llm_string), prompt, llm_string, coalesce=False)
+        return value if found else None
+
+    def evict(self, prompt: str) -> int:
+        with self._lock:
+            # memory entries are found by key only, drop them all
+            self._memory.clear()
+            return super().evict(prompt)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            super().clear()
+
+    # raw clients
+
+    def get_or_call(self, model: str, prompt: str, call: Callable[[], Any]):
+        """the cached completion of prompt by model (a string naming the model
+        & its parameters), else call() - its result must be JSON serializable"""
+        key = _key(prompt, model)
+        found, value = self._begin(key, prompt, model)
+        if found:
+            return value
+        try:
+            value = call()
+        except Exception as e:
+            self._fail(key, e)
+            raise
+        self._store(key, model, prompt, value)
+        return value
+
+    def chat_completion(self, create: Callable, **kwargs) -> str:
+        """text of the chat completion create(**kwargs) - create is
+        client.chat.completions.create, or openai.ChatCompletion.create with
+        openai < 1.0 - cached with temperature=0 only"""
+
+        def call():
+            return create(**kwargs).choices[0].message.content
+
+        if kwargs.get("temperature") != 0:
+            return call()
+        params = {name: value for name, value in kwargs.items() if name != "messages"}
+        prompt = "\n".join(f"{m['role']}: {m['content']}" for m in kwargs["messages"])
+        return self.get_or_call(_model_string("openai", params), prompt, call)
+
+    def generate_content(self, model, contents, **kwargs) -> str:
+        """text of model.generate_content(contents, **kwargs) - model is a
+        google.generativeai.GenerativeModel - cached if its generation config
+        has temperature 0"""
+
+        def call():
+            return model.generate_content(contents, **kwargs).text
+
+        config = kwargs.get("generation_config", getattr(model, "_generation_config", None))
+        if _temperature(config) != 0:
+            return call()
+        params = {
+            "model": model.model_name,
+            "generation_config": getattr(model, "_generation_config", None),
+            **kwargs,
+        }
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=repr)
+        return self.get_or_call(_model_string("genai", params), prompt, call)
+
+    @property
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits + self.shared
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "semantic_hits": self.semantic_hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "saved_seconds": round(self.saved, 3),
+        }
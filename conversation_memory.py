@@ -0,0 +1,206 @@
+"""
+conversation_memory.py - bounded chat memory: recent turns + a running summary
+
+Sending the whole chat history with every question makes the prompt (and
+so latency & cost) grow with every turn. ConversationMemory keeps:
+    * a rolling window of the most recent turns, within token_budget tokens
+    * a summary of the older turns, updated incrementally: turns that drop
+      out of the window are folded into the summary by one LLM call, in the
+      background (a thread, or an asyncio task for async summarizers), so it
+      never delays an answer. Until then they stay in the history as is,
+      within pending_budget tokens: if summaries keep failing (or can't keep
+      up), the oldest turns not being summarized are dropped rather than
+      letting the prompt grow without bound.
+
+summarize is any callable(prompt) -> text, sync or async, e.g.
+    ConversationMemory(lambda prompt: model.generate_content(prompt).text)
+    ConversationMemory(inference_client.generate)
+
+Usage:
+    prompt = template.format(history=memory.history(), question=question)
+    answer = llm(prompt)
+    memory.add_turn(question, answer)
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+SUMMARY_PROMPT = """Progressively summarize the conversation between a user and an AI assistant.
+Extend the current summary with the new lines of conversation, keep the facts, names,
+numbers and decisions, and write at most {words} words.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+# summaries of all sessions run here, off the request path
+_summary_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summary")
+
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 characters per token
+    return max(1, len(text) // 4)
+
+
+def format_turn(question: str, answer: str) -> str:
+    return f"User: {question}\nAI: {answer}"
+
+
+class ConversationMemory:
+    """one chat session's memory, see module docstring
+
+    Args:
+        summarize: callable(prompt) -> summary (or awaitable), None to just
+            forget turns that drop out of the window
+        token_budget: max tokens of the recent turns kept verbatim
+        summary_words: length the summary is kept to
+        count_tokens: callable(text) -> tokens, ~4 characters per token by default
+        background: False to summarize in add_turn() itself
+        pending_budget: max tokens of the turns waiting to be summarized,
+            the oldest are dropped beyond it (default token_budget)
+    """
+
+    def __init__(
+        self,
+        summarize: Optional[Callable] = None,
+        token_budget: int = 1_000,
+        summary_words: int = 200,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        background: bool = True,
+        pending_budget: Optional[int] = None,
+    ):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.pending_budget = token_budget if pending_budget is None else pending_budget
+        self.summary_words = summary_words
+        self.count_tokens = count_tokens or _estimate_tokens
+        self.background = background
+        self.summary = ""
+        self.turns = deque()  # (question, answer, tokens) of the recent turns
+        self.pending = deque()  # turns out of the window, not yet summarized
+        self.window_tokens = 0
+        self.pending_tokens = 0
+        self.dropped = 0  # pending turns dropped unsummarized
+        self.num_turns = 0
+        self.num_summaries = 0
+        self.summary_time = 0.0
+        self.errors = 0
+        self._summarizing = False
+        self._in_flight = 0  # pending turns (at the front) being summarized
+        self._task = None  # keeps the asyncio task alive
+        self._lock = threading.Condition()
+
+    def add_turn(self, question: str, answer: str):
+        tokens = self.count_tokens(format_turn(question, answer))
+        with self._lock:
+            self.num_turns += 1
+            self.turns.append((question, answer, tokens))
+            self.window_tokens += tokens
+            # the latest turn always stays, even when it's over the budget
+            while self.window_tokens > self.token_budget and len(self.turns) > 1:
+                turn = self.turns.popleft()
+                self.window_tokens -= turn[2]
+                if self.summarize is not None:
+                    self.pending.append(turn)
+                    self.pending_tokens += turn[2]
+            # the oldest turns that aren't being summarized right now
+            while self.pending_tokens > self.pending_budget and len(self.pending) > self._in_flight:
+                turn = self.pending[self._in_flight]
+                del self.pending[self._in_flight]
+                self.pending_tokens -= turn[2]
+                self.dropped += 1
+        self._schedule_summary()
+
+    def snapshot(self):
+        """the summary & (question, answer) of the turns not in it (yet)"""
+        with self._lock:
+            return self.summary, [(q, a) for q, a, _ in (*self.pending, *self.turns)]
+
+    def history(self) -> str:
+        """summary & recent turns, to put in the prompt"""
+        summary, turns = self.snapshot()
+        parts = [f"Summary of the earlier conversation:\n{summary}"] if summary else []
+        parts.extend(format_turn(q, a) for q, a in turns)
+        return "\n\n".join(parts)
+
+    def _schedule_summary(self):
+        with self._lock:
+            if self._summarizing or not self.pending:
+                return
+            self._summarizing = True
+            batch = list(self.pending)
+            self._in_flight = len(batch)
+            prompt = SUMMARY_PROMPT.format(
+                words=self.summary_words,
+                summary=self.summary or "(none yet)",
+                lines="\n".join(format_turn(q, a) for q, a, _ in batch),
+            )
+        if asyncio.iscoroutinefunction(self.summarize):
+            self._task = asyncio.get_running_loop().create_task(self._summarize_async(batch, prompt))
+        elif self.background:
+            _summary_pool.submit(self._summarize_sync, batch, prompt)
+        else:
+            self._summarize_sync(batch, prompt)
+
+    def _summarize_sync(self, batch, prompt):
+        start = time.perf_counter()
+        try:
+            summary = self.summarize(prompt)
+        except Exception:
+            summary = None
+        self._finish_summary(batch, summary, time.perf_counter() - start)
+
+    async def _summarize_async(self, batch, prompt):
+        start = time.perf_counter()
+        try:
+            summary = await self.summarize(prompt)
+        except Exception:
+            summary = None
+        self._finish_summary(batch, summary, time.perf_counter() - start)
+
+    def _finish_summary(self, batch, summary, elapsed):
+        with self._lock:
+            self._summarizing = False
+            self._in_flight = 0
+            self.summary_time += elapsed
+            if summary is None:
+                # the turns stay pending, tried again after the next turn
+                self.errors += 1
+            else:
+                self.summary = summary.strip()
+                self.num_summaries += 1
+                for _ in batch:
+                    self.pending_tokens -= self.pending.popleft()[2]
+            self._lock.notify_all()
+        if summary is not None:
+            # turns that dropped out of the window in the meantime
+            self._schedule_summary()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """wait for the summary to catch up (not from the event loop)"""
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._summarizing, timeout)
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": self.num_turns,
+                "window_turns": len(self.turns),
+                "window_tokens": self.window_tokens,
+                "pending_turns": len(self.pending),
+                "pending_tokens": self.pending_tokens,
+                "dropped_turns": self.dropped,
+                "summary_tokens": self.count_tokens(self.summary) if self.summary else 0,
+                "summaries": self.num_summaries,
+                "summary_time": self.summary_time,
+                "errors": self.errors,
+            }
@@ -1,11 +1,12 @@
 # example1.py - using prompts with OpenAI API
 import os
 from dotenv import load_dotenv
-from langchain.llms import OpenAI
 from langchain import PromptTemplate
 from langchain.chains import LLMChain
 import streamlit as st
 
+from model_factory import get_model
+
 
 # # setup the OpenAI API Key (read from file)
 # OPEN_API_KEY_FILE = r"c:\dev\OpenAIKey.txt"
@@ -22,8 +23,9 @@ load_dotenv()
 st.title("Celebrity Search Results")
 input_text = st.text_input("Enter name of celebrity to get an interesting titbit")
 
-# the LLM to use
-llm = OpenAI(temperature=0.7)
+# the LLM to use (created once per process, not on every rerun) - not cached:
+# at temperature 0.7 every search is meant to find another titbit
+llm = get_model("openai-llm", temperature=0.7)
 
 # prompt template
 input_prompt1 = PromptTemplate(
@@ -0,0 +1,86 @@
+"""
+fake_inference_server.py - local stand-in for a Hugging Face text generation
+endpoint
+
+Answers POST /models/{repo_id} like the Inference API / text-generation-
+inference: {"inputs": ..., "parameters": {...}, "stream": true} streams
+server-sent events, one per token, else the whole answer comes back as
+[{"generated_text": ...}]. The words are deterministic (see
+fake_local_model.py), after first_token_delay seconds and then one every
+token_delay seconds. A client that disconnects stops the generation.
+
+Usage:
+    python fake_inference_server.py --port 8081
+    INFERENCE_URL=http://127.0.0.1:8081/models/fake chainlit run chainlit_app.py
+"""
+
+import argparse
+import asyncio
+import json
+
+from aiohttp import web
+
+from fake_local_model import FakeLocalModel
+
+
+def make_app(first_token_delay: float = 0.5, token_delay: float = 0.02) -> web.Application:
+    model = FakeLocalModel()
+    stats = {"requests": 0, "active": 0, "completed": 0, "disconnected": 0, "tokens": 0, "connections": 0}
+    peers = set()
+
+    async def handle_generate(request):
+        body = await request.json()
+        max_new_tokens = body.get("parameters", {}).get("max_new_tokens", 256)
+        tokens = model._tokens(body["inputs"], max_new_tokens)
+        stats["requests"] += 1
+        stats["active"] += 1
+        peers.add(request.transport.get_extra_info("peername") if request.transport else None)
+        stats["connections"] = len(peers)
+        try:
+            await asyncio.sleep(first_token_delay)
+            if not body.get("stream"):
+                await asyncio.sleep(token_delay * (len(tokens) - 1))
+                stats["tokens"] += len(tokens)
+                stats["completed"] += 1
+                return web.json_response([{"generated_text": "".join(tokens)}])
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(token_delay)
+                event = {
+                    "token": {"id": i, "text": token, "logprob": 0.0, "special": False},
+                    "generated_text": "".join(tokens) if i == len(tokens) - 1 else None,
+                    "details": None,
+                }
+                await response.write(f"data:{json.dumps(event)}\n\n".encode("utf-8"))
+                stats["tokens"] += 1
+            await response.write_eof()
+            stats["completed"] += 1
+            return response
+        except ConnectionResetError:
+            # the client went away: stop generating
+            stats["disconnected"] += 1
+            return response
+        finally:
+            stats["active"] -= 1
+
+    async def handle_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app["stats"] = stats
+    app.add_routes(
+        [web.post("/models/{repo_id:.+}", handle_generate), web.get("/stats", handle_stats)]
+    )
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fake text generation endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--first-token-delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+    web.run_app(make_app(args.first_token_delay, args.token_delay), host=args.host, port=args.port)
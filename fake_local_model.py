@@ -0,0 +1,131 @@
+"""
+fake_local_model.py - local stand-in for a CTransformers (GGML) model
+
+FakeLocalModel behaves like a local Llama model without needing the 7 GB
+weights file or ctransformers: loading takes load_delay seconds and holds
+weights_mb MB of memory, generation emits deterministic words (derived from
+the prompt) with a delay before the first token and between tokens. The
+first generation after loading is slower (cold_start_delay), like a real
+model whose memory-mapped weights are first paged in. With token_cpu set,
+every token also burns that many seconds of CPU time, so concurrent
+generations slow each other down like they do on a real CPU bound model.
+Like a real model, it splits long words into several tokens and, asked for
+"N words", rambles on for overshoot * N words (or until max_new_tokens).
+load_fake_local_model() has the same signature as the loader used by
+local_models.ModelRegistry, so it can be plugged in for benchmarks & tests.
+"""
+
+import hashlib
+import random
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+WORDS = (
+    "data model learning system research results team performance training "
+    "features value insight pipeline approach analysis customers quality scale "
+    "the a of to and in is for with that on as this we can"
+).split()
+WORD_LIMIT_RE = re.compile(r"(\d+)\s+words")
+
+
+def _burn_cpu(seconds: float):
+    """busy loop until this thread has used seconds of CPU time"""
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def _pieces(word: str) -> List[str]:
+    """a word as tokens: words of more than 6 characters are 2 tokens"""
+    return [word[:4], word[4:]] if len(word) > 6 else [word]
+
+
+class FakeWeights:
+    """memory standing in for model weights"""
+
+    def __init__(self, data: bytearray):
+        self.data = data
+
+    def __repr__(self):
+        # LangChain puts repr(model) in its run metadata, keep it short
+        return f"FakeWeights({len(self.data) // 2**20} MB)"
+
+
+class FakeLocalModel(LLM):
+    first_token_delay: float = 0.3
+    cold_start_delay: float = 1.0
+    token_cpu: float = 0.0
+    warm: bool = False
+    token_delay: float = 0.02
+    max_new_tokens: int = 256
+    overshoot: float = 1.5
+    weights: Any = None  #: :meta private:
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-local"
+
+    def get_num_tokens(self, text: str) -> int:
+        return sum(len(_pieces(word)) for word in text.split())
+
+    def _tokens(self, prompt: str, max_new_tokens: int) -> List[str]:
+        """the same prompt always gets the same answer"""
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        limit = WORD_LIMIT_RE.search(prompt)
+        num_words = round(int(limit.group(1)) * self.overshoot) if limit else max_new_tokens
+        tokens = []
+        for i in range(num_words):
+            # a full stop every ~12 words & at the end, so answers have sentences
+            word = rng.choice(WORDS) + ("." if i % 12 == 11 or i == num_words - 1 else "")
+            for j, piece in enumerate(_pieces(word)):
+                tokens.append((" " if i and not j else "") + piece)
+            if len(tokens) >= max_new_tokens:
+                break
+        return tokens[:max_new_tokens]
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        time.sleep(self.first_token_delay + (0 if self.warm else self.cold_start_delay))
+        self.warm = True
+        max_new_tokens = kwargs.get("max_new_tokens", self.max_new_tokens)
+        for i, token in enumerate(self._tokens(prompt, max_new_tokens)):
+            if i:
+                time.sleep(self.token_delay)
+            _burn_cpu(self.token_cpu)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def load_fake_local_model(
+    model: str, model_type: str, config: dict, load_delay: float = 2.0, weights_mb: int = 256
+) -> FakeLocalModel:
+    """'load' a fake model: wait load_delay seconds & allocate weights_mb MB"""
+    time.sleep(load_delay)
+    weights = bytearray(weights_mb * 1024 * 1024)
+    # touch every page, so the memory is really resident
+    for i in range(0, len(weights), 4096):
+        weights[i] = 1
+    return FakeLocalModel(
+        max_new_tokens=config.get("max_new_tokens", 256), weights=FakeWeights(weights)
+    )
@@ -0,0 +1,91 @@
+"""
+ann_index.py - approximate nearest neighbour index modes for large corpora
+
+FAISS.from_texts() always builds a flat (exact) index: search time grows
+linearly with the number of chunks and every vector is held in full float32.
+For corpora of thousands of PDFs, one of these modes can be used instead:
+    flat  - exact search, the default
+    ivf   - inverted file: vectors are clustered, only the nprobe closest
+            clusters are searched
+    hnsw  - hierarchical navigable small world graph
+    ivfpq - inverted file + product quantization: vectors are compressed
+            to a few bytes each (lossy)
+ivf & ivfpq must be trained (clustering) on a sample of the vectors. The
+parameters picked for a mode are saved in the index manifest, so that
+searches use the same settings when the index is reloaded.
+"""
+
+import math
+
+import faiss
+import numpy as np
+
+INDEX_MODES = ("flat", "ivf", "hnsw", "ivfpq")
+
+# fewer vectors than this & an ANN index isn't worth it (or can't be trained)
+MIN_VECTORS = {"flat": 0, "ivf": 2_000, "hnsw": 2_000, "ivfpq": 10_000}
+# training on a random sample is about as good as training on everything
+MAX_TRAINING_VECTORS = 50_000
+
+
+def _pq_subquantizers(dims: int) -> int:
+    """number of PQ sub-vectors (1 byte each): must divide dims, ~8 dims each"""
+    for m in range(max(dims // 8, 1), 0, -1):
+        if dims % m == 0:
+            return m
+    return 1
+
+
+def index_params(mode: str, dims: int, num_vectors: int) -> dict:
+    """pick index parameters for a corpus of num_vectors vectors"""
+    if mode not in INDEX_MODES:
+        raise ValueError(f"Unknown index mode {mode}, expecting one of {INDEX_MODES}")
+    if mode == "flat":
+        return {"factory": "Flat"}
+    if mode == "hnsw":
+        return {"factory": "HNSW32", "efSearch": 64}
+    # rule of thumb: ~4 * sqrt(N) clusters, with 39+ training vectors per cluster
+    nlist = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+    nprobe = max(1, min(nlist, nlist // 16 or 1))
+    if mode == "ivf":
+        return {"factory": f"IVF{nlist},Flat", "nprobe": nprobe}
+    return {"factory": f"IVF{nlist},PQ{_pq_subquantizers(dims)}", "nprobe": nprobe}
+
+
+def apply_search_params(index, params: dict):
+    """set search time parameters, which aren't always saved with the index"""
+    if "nprobe" in params:
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    if "efSearch" in params:
+        index.hnsw.efSearch = params["efSearch"]
+
+
+def build_index(params: dict, vectors: np.ndarray):
+    """create an empty index from params, trained on vectors if it needs training"""
+    index = faiss.index_factory(vectors.shape[1], params["factory"])
+    if not index.is_trained:
+        if len(vectors) > MAX_TRAINING_VECTORS:
+            rng = np.random.default_rng(0)
+            sample = rng.choice(len(vectors), MAX_TRAINING_VECTORS, replace=False)
+            index.train(vectors[sample])
+        else:
+            index.train(vectors)
+    apply_search_params(index, params)
+    return index
+
+
+def empty_copy(index):
+    """an empty index with the same parameters & training (clusters, PQ
+    codebooks) as index, so it can be refilled without training again"""
+    copy = faiss.clone_index(index)
+    copy.reset()
+    return copy
+
+
+def reconstruct_all(index) -> np.ndarray:
+    """get back all vectors held by index (approximations, for ivfpq)"""
+    try:
+        faiss.extract_index_ivf(index).make_direct_map()
+    except RuntimeError:
+        pass  # not an IVF index
+    return index.reconstruct_n(0, index.ntotal)
@@ -1,23 +1,27 @@
-import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 import streamlit as st
-import google.generativeai as genai
 import textwrap
 
 from IPython.display import display
 from IPython.display import Markdown
 
+# model_factory.py is shared by all the scripts, in the repository root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from model_factory import get_model
+
 # load all environment variables from .env
 load_dotenv(find_dotenv())
-# and configure for Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
-# create your LLM (Google Gemini-Pro)
-model = genai.GenerativeModel("gemini-pro")
+# create your LLM (Google Gemini-Pro), google.generativeai is configured with
+# GOOGLE_API_KEY & the model created once per process (not on every rerun)
+model = get_model("genai", "gemini-pro")
 
 
 def get_gemini_response(question):
     """function to call the Google Gemini Pro model & get response"""
+    # not cached: gemini-pro answers at its default (non-zero) temperature
     response = model.generate_content(question)
     return response.text
 
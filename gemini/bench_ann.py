@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+bench_ann.py - recall vs latency of the ANN index modes against the flat baseline
+
+Uses synthetic, clustered vectors (roughly how embeddings of many documents
+behave), so it runs offline & needs no embedding model. For each mode (and a
+few search settings), reports recall@k against exact search, the average
+query latency and the size of the index per vector.
+
+usage: python bench_ann.py [--vectors N] [--dims D] [--queries N] [-k 10]
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import INDEX_MODES, apply_search_params, build_index, index_params
+
+
+def synthetic_vectors(num_vectors, dims, num_clusters=200, seed=42):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, dims)).astype(np.float32)
+    labels = rng.integers(num_clusters, size=num_vectors)
+    noise = rng.normal(scale=0.35, size=(num_vectors, dims)).astype(np.float32)
+    return centers[labels] + noise
+
+
+def run(label, index, params, queries, truth, k):
+    apply_search_params(index, params)
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    bytes_per_vector = faiss.serialize_index(index).nbytes / index.ntotal
+    print(
+        f"{label:28s} recall@{k}={recall:5.3f}  "
+        f"latency={elapsed / len(queries) * 1000:7.3f} ms/query  "
+        f"size={bytes_per_vector:7.1f} bytes/vector"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    data = synthetic_vectors(args.vectors + args.queries, args.dims)
+    vectors, queries = data[: args.vectors], data[args.vectors :]
+
+    for mode in INDEX_MODES:
+        params = index_params(mode, args.dims, args.vectors)
+        start = time.perf_counter()
+        index = build_index(params, vectors)
+        index.add(vectors)
+        print(f"{mode}: {params['factory']} built in {time.perf_counter() - start:.1f}s")
+        if mode == "flat":
+            _, truth = index.search(queries, args.k)
+            run("flat (exact)", index, params, queries, truth, args.k)
+            continue
+        if "nprobe" in params:
+            sweep = [("nprobe", n) for n in (1, params["nprobe"], params["nprobe"] * 4)]
+        else:
+            sweep = [("efSearch", n) for n in (16, params["efSearch"], 256)]
+        for name, value in sweep:
+            run(f"{mode} {name}={value}", index, {**params, name: value}, queries, truth, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+bench_chunker.py - fixed 10k/1k character splitter vs token-aware Chunker
+
+Chunks the bundled Attention_Is_All_You_Need.pdf both ways and reports the
+chunk count, total tokens that would be embedded, and the retrieval hit-rate
+(does one of the top-k chunks contain the answer?) for a set of questions
+about the paper, together with the tokens those top-k chunks add to the prompt.
+Retrieval uses a local TF-IDF scorer, so the benchmark runs offline.
+
+usage: python bench_chunker.py [--pdf PATH] [-k 4]
+"""
+import argparse
+import collections
+import math
+import pathlib
+import re
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from chunker import Chunker
+from pdf_ingest import iter_pdf_pages
+
+# (question, phrase the retrieved context must contain)
+QUESTIONS = [
+    ("How many layers are in the encoder stack?", "stack of n= 6 identical layers"),
+    ("What BLEU does the big model get on English-to-German?", "28.4"),
+    ("What BLEU does the big model get on English-to-French?", "41.8"),
+    ("Which optimizer was used for training?", "adam optimizer"),
+    ("What hardware were the models trained on?", "8 nvidia p100"),
+    ("How long did the big models take to train?", "3.5 days"),
+    ("How many warmup steps were used for the learning rate?", "4000"),
+    ("How were sentences encoded for English-German?", "byte-pair encoding"),
+    ("How big is the shared source-target vocabulary?", "37000"),
+    ("How many parallel attention heads are used?", "h= 8"),
+    ("What is the inner dimension of the feed-forward network?", "dff= 2048"),
+    ("What beam size was used during inference?", "beam size of 4"),
+    ("Which dataset was used for English constituency parsing?", "penn treebank"),
+]
+
+WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    return " ".join(text.split()).lower()
+
+
+class TfIdf:
+    """minimal TF-IDF cosine retriever"""
+
+    def __init__(self, texts):
+        self.vectors = []
+        df = collections.Counter()
+        counts = [collections.Counter(WORD_RE.findall(t.lower())) for t in texts]
+        for c in counts:
+            df.update(c.keys())
+        self.idf = {w: math.log(len(texts) / n) + 1 for w, n in df.items()}
+        self.vectors = [self._vector(c) for c in counts]
+
+    def _vector(self, counts):
+        vector = {w: n * self.idf.get(w, 0.0) for w, n in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {w: v / norm for w, v in vector.items()}
+
+    def top_k(self, query, k):
+        q = self._vector(collections.Counter(WORD_RE.findall(query.lower())))
+        scores = [sum(q[w] * v.get(w, 0.0) for w in q) for v in self.vectors]
+        return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+
+
+def evaluate(label, texts, chunker, k):
+    embedded_tokens = sum(chunker.count_tokens(t) for t in texts)
+    retriever = TfIdf(texts)
+    hits, context_tokens = 0, 0
+    for question, answer in QUESTIONS:
+        top = [texts[i] for i in retriever.top_k(question, k)]
+        hits += any(answer in normalize(t) for t in top)
+        context_tokens += sum(chunker.count_tokens(t) for t in top)
+    print(
+        f"{label:9s} chunks={len(texts):4d}  embedded tokens={embedded_tokens:6d}  "
+        f"hit-rate@{k}={hits / len(QUESTIONS):5.2f}  "
+        f"avg context tokens={context_tokens / len(QUESTIONS):7.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    default_pdf = pathlib.Path(__file__).parent.parent / "Attention_Is_All_You_Need.pdf"
+    parser.add_argument("--pdf", default=default_pdf)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    args = parser.parse_args()
+
+    pages = list(iter_pdf_pages([args.pdf], max_workers=0))
+    chunker = Chunker(max_tokens=args.max_tokens)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=10_000, chunk_overlap=1_000)
+    baseline = splitter.split_text("".join(page.text for page in pages))
+    evaluate("10k/1k", baseline, chunker, args.k)
+
+    chunks = [doc.page_content for doc in chunker.chunk_pages(pages)]
+    evaluate("Chunker", chunks, chunker, args.k)
+
+
+if __name__ == "__main__":
+    main()
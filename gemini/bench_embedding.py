@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+bench_embedding.py - embedded chunks/sec, sequential vs EmbeddingScheduler
+
+Runs offline against fake_embedding_server.py, started on a background thread.
+
+usage: python bench_embedding.py [--chunks N] [--latency SECS] [--error-rate F]
+"""
+import argparse
+import time
+
+from embedding_scheduler import EmbeddingScheduler, pack_batches
+from fake_embedding_server import HttpEmbeddings, start_in_background
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2_000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=20.0)
+    args = parser.parse_args()
+
+    server = start_in_background(
+        port=args.port, latency=args.latency, error_rate=args.error_rate
+    )
+    embeddings = HttpEmbeddings(f"http://127.0.0.1:{args.port}/embed")
+    # ~1000 character chunks
+    texts = [f"chunk {i}: " + "lorem ipsum dolor sit amet " * 36 for i in range(args.chunks)]
+
+    scheduler = EmbeddingScheduler(
+        embeddings,
+        max_concurrency=args.concurrency,
+        requests_per_second=args.rps,
+        base_delay=0.1,
+    )
+    batches = pack_batches(texts, scheduler.max_batch_tokens, scheduler.max_batch_size)
+    print(f"{len(texts)} chunks in {len(batches)} batches")
+
+    # baseline: one batch after another, no retries (a failure restarts the batch)
+    start = time.perf_counter()
+    for batch in batches:
+        while True:
+            try:
+                embeddings.embed_documents([texts[i] for i in batch])
+                break
+            except Exception:
+                pass
+    elapsed = time.perf_counter() - start
+    print(f"sequential: {elapsed:7.2f}s  {len(texts) / elapsed:8.1f} chunks/sec")
+
+    vectors = scheduler.embed(texts)
+    assert len(vectors) == len(texts) and all(vectors)
+    print(
+        f"scheduler:  {scheduler.elapsed:7.2f}s  {scheduler.chunks_per_sec:8.1f} chunks/sec"
+        f"  ({scheduler.num_retries} retries)"
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
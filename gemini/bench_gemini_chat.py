@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+bench_gemini_chat.py - hello_gemini.py's startup & per-turn latency: the
+model list fetched at every start vs cached on disk, a blocking
+generate_content() per line vs a streamed chat session (full history vs
+ConversationMemory)
+
+Runs offline against fake_genai.py.
+
+usage: python bench_gemini_chat.py [--turns N] [--first-chunk-delay SECS]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fake_genai as genai
+from gemini_chat import GeminiChat, list_chat_models
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from conversation_memory import ConversationMemory
+
+
+def report(name, chat):
+    first = [turn.first_chunk for turn in chat.stats]
+    prompt_tokens = [turn.prompt_tokens for turn in chat.stats]
+    print(
+        f"  {name:24} first chunk p50 {statistics.median(first):5.2f}s  "
+        f"prompt tokens last turn {prompt_tokens[-1]:6}  mean {statistics.mean(prompt_tokens):7.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--first-chunk-delay", type=float, default=0.3)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--list-models-delay", type=float, default=1.5)
+    args = parser.parse_args()
+    genai.FIRST_CHUNK_DELAY = args.first_chunk_delay
+    genai.CHUNK_DELAY = args.chunk_delay
+    genai.LIST_MODELS_DELAY = args.list_models_delay
+
+    cache_path = os.path.join(tempfile.mkdtemp(), "gemini_models.json")
+    print("startup - list of models:")
+    for name, refresh in (("from the API", True), ("cached on disk", False)):
+        start = time.perf_counter()
+        list_chat_models(genai, cache_path, refresh=refresh)
+        print(f"  {name:24} {time.perf_counter() - start:6.3f}s")
+
+    llm = genai.GenerativeModel("gemini-2.5-flash")
+    print(f"\n{args.turns} turns:")
+    blocking = []
+    for i in range(args.turns):
+        start = time.perf_counter()
+        llm.generate_content(f"Question {i}").text
+        blocking.append(time.perf_counter() - start)
+    print(f"  {'blocking, no history':24} first text  p50 {statistics.median(blocking):5.2f}s")
+
+    chat = GeminiChat(llm)
+    for i in range(args.turns):
+        "".join(chat.send(f"Question {i}"))
+    report("streamed, full history", chat)
+
+    memory = ConversationMemory(lambda prompt: llm.generate_content(prompt).text, token_budget=1000)
+    chat = GeminiChat(llm, memory)
+    for i in range(args.turns):
+        "".join(chat.send(f"Question {i}"))
+    report("streamed, memory", chat)
+    memory.wait()
+    print(f"  memory: {memory.stats}")
+
+
+if __name__ == "__main__":
+    main()
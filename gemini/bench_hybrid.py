@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+bench_hybrid.py - query latency of the lexical (BM25) fast path vs hybrid retrieval
+
+Runs offline on a synthetic corpus. The fake embedding model sleeps for
+--embed-latency seconds per question, to stand in for the remote embedding
+call that the lexical path avoids.
+
+usage: python bench_hybrid.py [--chunks N] [--questions N] [--embed-latency SECS]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from index_manager import IndexManager
+from retriever_service import RetrieverService
+
+
+class SlowFakeEmbeddings(DeterministicFakeEmbedding):
+    """fake embeddings with the latency of a remote API call per question"""
+
+    latency: float = 0.1
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--embed-latency", type=float, default=0.1)
+    parser.add_argument("--dims", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words = [f"term{i}" for i in range(5_000)]
+    embeddings = SlowFakeEmbeddings(size=args.dims, latency=args.embed_latency)
+    with tempfile.TemporaryDirectory() as index_path:
+        print(f"Building FAISS + BM25 index of {args.chunks} chunks...")
+        index_manager = IndexManager(embeddings, index_path)
+        start = time.perf_counter()
+        index_manager.add_documents(
+            Document(
+                page_content=" ".join(rng.choices(words, k=200)),
+                metadata={"source": "synthetic"},
+            )
+            for _ in range(args.chunks)
+        )
+        index_manager.save()
+        print(f"  built & saved in {time.perf_counter() - start:.1f}s")
+
+        service = RetrieverService(embeddings, chain_factory=None, index_path=index_path)
+        questions = [" ".join(rng.choices(words, k=2)) for _ in range(args.questions)]
+        service.retrieve(questions[0])  # load the indexes
+        for mode in ("lexical", "hybrid", "dense"):
+            timings = []
+            for question in questions:
+                start = time.perf_counter()
+                service.retrieve(question, k=4, mode=mode)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(
+                f"{mode:8s} mean={statistics.mean(timings):8.2f} ms  "
+                f"p50={statistics.median(timings):8.2f} ms  max={max(timings):8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
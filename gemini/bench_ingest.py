@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+bench_ingest.py - throughput benchmark for the PDF ingestion pipeline
+
+Extracts every page of every PDF in a local directory and reports pages/sec
+and peak resident memory (RSS), for the in-process path and the process pool.
+
+usage: python bench_ingest.py [pdf_dir] [--workers N]
+"""
+import argparse
+import pathlib
+import sys
+import time
+
+from pdf_ingest import iter_pdf_pages
+from query_pdf import get_text_chunks
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """peak RSS of this process + its (finished) children in MB"""
+    if resource is None:
+        return float("nan")
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    usage = max(usage, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS, kilobytes everywhere else
+    return usage / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run(pdfs, workers):
+    start = time.perf_counter()
+    pages = chunks = chars = 0
+
+    def counted(records):
+        nonlocal pages, chars
+        for record in records:
+            pages += 1
+            chars += len(record.text)
+            yield record
+
+    for _ in get_text_chunks(counted(iter_pdf_pages(pdfs, max_workers=workers))):
+        chunks += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"workers={workers!s:>4}  pages={pages:5d}  chunks={chunks:5d}  chars={chars:9d}  "
+        f"time={elapsed:7.2f}s  pages/sec={pages / elapsed:8.1f}  peak RSS={peak_rss_mb():7.1f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    default_dir = pathlib.Path(__file__).parent.parent
+    parser.add_argument("pdf_dir", nargs="?", default=default_dir)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    pdfs = sorted(pathlib.Path(args.pdf_dir).glob("*.pdf"))
+    if not pdfs:
+        sys.exit(f"No PDFs found in {args.pdf_dir}")
+    print(f"Benchmarking {len(pdfs)} PDF(s) from {args.pdf_dir}")
+    # in-process first, so RSS of the pool's children doesn't mask it
+    run(pdfs, workers=0)
+    run(pdfs, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+bench_retriever.py - per-question latency, cold (load everything per question)
+vs warm (shared RetrieverService)
+
+Runs fully offline: a synthetic index is built with fake embeddings in a
+temporary folder and the QA chain uses a fake LLM, so only the overhead of
+loading the index & building the chain is measured.
+
+usage: python bench_retriever.py [--chunks N] [--questions N]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from langchain.chains.question_answering import load_qa_chain
+from langchain.prompts import PromptTemplate
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.llms import FakeListLLM
+
+from index_manager import IndexManager, generation_names
+from retriever_service import RetrieverService
+
+PROMPT = PromptTemplate(
+    template="Context:\n {context}?\nQuestion: \n{question}\n\nAnswer:",
+    input_variables=["context", "question"],
+)
+
+
+def fake_chain():
+    llm = FakeListLLM(responses=["answer is not available in the context"])
+    return load_qa_chain(llm, chain_type="stuff", prompt=PROMPT)
+
+
+def cold_answer(question, index_path, embeddings, index_name="index"):
+    """what query_pdf.user_input used to do for every question"""
+    context_db = FAISS.load_local(
+        index_path, embeddings, index_name, allow_dangerous_deserialization=True
+    )
+    docs = context_db.similarity_search(question)
+    return fake_chain()(
+        {"input_documents": docs, "question": question}, return_only_outputs=True
+    )
+
+
+def report(label, timings):
+    timings = [t * 1000 for t in timings]
+    print(
+        f"{label:5s} mean={statistics.mean(timings):8.2f} ms  "
+        f"median={statistics.median(timings):8.2f} ms  max={max(timings):8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--dims", type=int, default=768)
+    args = parser.parse_args()
+
+    embeddings = DeterministicFakeEmbedding(size=args.dims)
+    questions = [f"question number {i}" for i in range(args.questions)]
+    with tempfile.TemporaryDirectory() as index_path:
+        print(f"Building index of {args.chunks} chunks...")
+        index_manager = IndexManager(embeddings, index_path)
+        index_manager.add_documents(
+            Document(page_content=f"chunk {i} " * 20, metadata={"source": "synthetic"})
+            for i in range(args.chunks)
+        )
+        index_manager.save()
+        index_name, _ = generation_names(index_manager.manifest["generation"])
+
+        cold = []
+        for question in questions:
+            start = time.perf_counter()
+            cold_answer(question, index_path, embeddings, index_name)
+            cold.append(time.perf_counter() - start)
+
+        service = RetrieverService(embeddings, fake_chain, index_path)
+        service.answer(questions[0])  # first question pays for loading
+        warm = []
+        for question in questions:
+            start = time.perf_counter()
+            service.answer(question)
+            warm.append(time.perf_counter() - start)
+
+    report("cold", cold)
+    report("warm", warm)
+    print(f"speedup: {statistics.mean(cold) / statistics.mean(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+bench_streaming.py - time until the user sees something, blocking vs streaming
+
+Answers questions from a small synthetic index with FakeStreamingChatModel,
+once with the blocking answer() and once with stream_answer(), and reports
+time-to-first-token and tokens/sec. Runs offline.
+
+usage: python bench_streaming.py [--first-token-delay SECS] [--token-delay SECS]
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from langchain.chains.question_answering import load_qa_chain
+from langchain.prompts import PromptTemplate
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from fake_chat_model import FakeStreamingChatModel
+from index_manager import IndexManager
+from retriever_service import RetrieverService
+from streaming import StreamingAnswerHandler
+
+PROMPT = PromptTemplate(
+    template="Context:\n {context}?\nQuestion: \n{question}\n\nAnswer:",
+    input_variables=["context", "question"],
+)
+ANSWER = (
+    "The Transformer is built from stacked self-attention and point-wise, "
+    "fully connected layers for both the encoder and the decoder. " * 3
+).strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--first-token-delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    parser.add_argument("--quiet", action="store_true", help="don't echo tokens")
+    args = parser.parse_args()
+
+    model = FakeStreamingChatModel(
+        response=ANSWER,
+        first_token_delay=args.first_token_delay,
+        token_delay=args.token_delay,
+    )
+    embeddings = DeterministicFakeEmbedding(size=64)
+    with tempfile.TemporaryDirectory() as index_path:
+        index_manager = IndexManager(embeddings, index_path)
+        index_manager.add_documents(
+            Document(page_content=f"chunk {i}", metadata={"source": "synthetic"})
+            for i in range(100)
+        )
+        index_manager.save()
+        service = RetrieverService(
+            embeddings,
+            lambda: load_qa_chain(model, chain_type="stuff", prompt=PROMPT),
+            index_path,
+        )
+        question = "what is the architecture of the transformer model?"
+
+        start = time.perf_counter()
+        service.answer(question)
+        print(f"blocking:  first output after {time.perf_counter() - start:.2f}s")
+
+        def render(text):
+            if not args.quiet:
+                sys.stdout.write("\r" + text[-70:].ljust(72))
+                sys.stdout.flush()
+
+        handler = StreamingAnswerHandler(render)
+        service.stream_answer(question, callbacks=[handler])
+        print()
+        print(
+            f"streaming: first output after {handler.time_to_first_token:.2f}s, "
+            f"{handler.num_tokens} tokens @ {handler.tokens_per_sec:.1f} tokens/sec"
+        )
+
+
+if __name__ == "__main__":
+    main()
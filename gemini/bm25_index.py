@@ -0,0 +1,173 @@
+"""
+bm25_index.py - in-process BM25 inverted index + hybrid (lexical + vector) retrieval
+
+Dense retrieval needs a remote embedding call for every question, even for
+exact-term lookups like "Table 3" or "BLEU". BM25Index is a classic inverted
+index, held in a few flat numpy arrays (CSR layout - one postings list per
+term, back to back), that is built next to the FAISS index at ingest time.
+It answers lexical queries in-process, and reciprocal_rank_fusion() merges
+its ranking with the FAISS ranking for hybrid retrieval.
+"""
+
+import json
+import math
+import os
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from context_packer import tokenize
+
+# files are <name>.npz & <name>_vocab.json
+BM25_NAME = "bm25"
+
+
+class BM25Index:
+    """BM25 over a set of chunks, identified by their chunk ids
+
+    Arrays:
+        offsets[t]:offsets[t + 1] - slice of postings of term t
+        doc_ids, tfs - postings: chunk (row) number & term frequency
+        doc_lengths - number of terms in each chunk
+    """
+
+    def __init__(self, vocab, chunk_ids, offsets, doc_ids, tfs, doc_lengths, k1=1.5, b=0.75):
+        self.vocab: Dict[str, int] = vocab
+        self.chunk_ids: List[str] = chunk_ids
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, chunks: Dict[str, str]):
+        """build the index from {chunk_id: text}"""
+        vocab, postings = {}, []
+        chunk_ids, doc_lengths = [], []
+        for row, (chunk_id, text) in enumerate(chunks.items()):
+            counts = Counter(tokenize(text))
+            chunk_ids.append(chunk_id)
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                if term not in vocab:
+                    vocab[term] = len(vocab)
+                    postings.append([])
+                postings[vocab[term]].append((row, tf))
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in postings])
+        flat = [entry for p in postings for entry in p]
+        doc_ids = np.fromiter((row for row, _ in flat), dtype=np.int32, count=len(flat))
+        tfs = np.fromiter((tf for _, tf in flat), dtype=np.int32, count=len(flat))
+        return cls(
+            vocab, chunk_ids, offsets, doc_ids, tfs, np.asarray(doc_lengths, dtype=np.int32)
+        )
+
+    def update(self, added: Dict[str, str], removed=()):
+        """a new index without the chunks in removed & with the added
+        {chunk_id: text} - only the added texts are tokenized, the postings of
+        the others are carried over"""
+        removed = set(removed)
+        # (term, row, tf) of every posting kept, rows renumbered 0..n-1
+        keep = np.fromiter((cid not in removed for cid in self.chunk_ids), dtype=bool, count=len(self.chunk_ids))
+        new_row = np.cumsum(keep) - 1
+        terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        kept = keep[self.doc_ids]
+        terms, rows, tfs = terms[kept], new_row[self.doc_ids[kept]], self.tfs[kept]
+        chunk_ids = [cid for cid in self.chunk_ids if cid not in removed]
+        doc_lengths = list(self.doc_lengths[keep])
+
+        vocab = dict(self.vocab)
+        new_terms, new_rows, new_tfs = [], [], []
+        for chunk_id, text in added.items():
+            counts = Counter(tokenize(text))
+            row = len(chunk_ids)
+            chunk_ids.append(chunk_id)
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                new_terms.append(vocab.setdefault(term, len(vocab)))
+                new_rows.append(row)
+                new_tfs.append(tf)
+        terms = np.concatenate([terms, np.asarray(new_terms, dtype=terms.dtype)])
+        rows = np.concatenate([rows, np.asarray(new_rows, dtype=rows.dtype)])
+        tfs = np.concatenate([tfs, np.asarray(new_tfs, dtype=np.int32)])
+
+        # back to one postings list per term (stable: rows stay in order)
+        order = np.argsort(terms, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(terms, minlength=len(vocab)))
+        return BM25Index(
+            vocab,
+            chunk_ids,
+            offsets,
+            rows[order].astype(np.int32),
+            tfs[order].astype(np.int32),
+            np.asarray(doc_lengths, dtype=np.int32),
+            self.k1,
+            self.b,
+        )
+
+    def save(self, index_path, name=BM25_NAME):
+        np.savez(
+            os.path.join(index_path, f"{name}.npz"),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+        )
+        with open(os.path.join(index_path, f"{name}_vocab.json"), "w", encoding="utf-8") as f:
+            json.dump({"vocab": self.vocab, "chunk_ids": self.chunk_ids}, f)
+
+    @classmethod
+    def load(cls, index_path, name=BM25_NAME):
+        """load a saved index, None if there isn't one"""
+        vocab_file = os.path.join(index_path, f"{name}_vocab.json")
+        if not os.path.exists(vocab_file):
+            return None
+        with open(vocab_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(os.path.join(index_path, f"{name}.npz")) as arrays:
+            return cls(
+                meta["vocab"],
+                meta["chunk_ids"],
+                arrays["offsets"],
+                arrays["doc_ids"],
+                arrays["tfs"],
+                arrays["doc_lengths"],
+            )
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def search(self, query: str, k: int = 4):
+        """top k (chunk_id, score) pairs for query, best first"""
+        num_docs = len(self.chunk_ids)
+        scores = np.zeros(num_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows, tfs = self.doc_ids[start:end], self.tfs[start:end]
+            df = end - start
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / self.avg_length)
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunk_ids[row], float(scores[row])) for row in top]
+
+
+def reciprocal_rank_fusion(*rankings, k: int = 60):
+    """merge rankings (lists of ids, best first) by reciprocal rank fusion"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,162 @@
+"""
+chunker.py - token-aware, structure-preserving chunking of PDF pages
+
+RecursiveCharacterTextSplitter(chunk_size=10_000, chunk_overlap=1_000) cuts
+text every 10k characters, wherever that falls, and embeds 10% of the text
+twice. Chunker instead:
+    * sizes chunks in tokenizer tokens (tiktoken), not characters
+    * never lets a chunk span two sections (or two PDFs), and only breaks
+      between sentences - so every chunk is a coherent passage
+    * records the PDF, section & page(s) each chunk came from
+    * tokenizes all sentences of a page in one (multi-threaded)
+      encode_batch() call, instead of one call per piece of text
+    * reads the pages as a stream: only the page & the chunk being built are
+      held, not the whole PDF
+"""
+
+import itertools
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+import tiktoken
+from langchain.schema import Document
+
+# section headings as extracted from PDFs, e.g. "3.2 Attention", "Abstract"
+HEADING_RE = re.compile(
+    r"^(\d+(\.\d+)*\.?\s+[A-Z][^.]{0,80}|Abstract|Acknowledge?ments?|References|Appendix.*)$"
+)
+# lines holding nothing but a page number
+PAGE_NUMBER_RE = re.compile(r"^\s*\d{1,4}\s*$")
+# sentence ends: ., ! or ? followed by whitespace & an upper case letter/bracket
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z(\[])")
+
+
+class Sentence(NamedTuple):
+    section: str
+    page_no: int
+    text: str
+    starts_section: bool
+
+
+def split_sentences(pages) -> Iterator[List[Sentence]]:
+    """break the pages of one PDF into sentences, tagged with section & page
+    - yields the sentences of each page"""
+    section, starts_section = "", True
+    for page in pages:
+        sentences, paragraph = [], []
+
+        def flush():
+            nonlocal starts_section
+            text = " ".join(paragraph)
+            # re-join words hyphenated across lines ("position- wise")
+            text = re.sub(r"(\w)- (\w)", r"\1-\2", text)
+            for sentence in SENTENCE_END_RE.split(text):
+                if sentence.strip():
+                    sentences.append(
+                        Sentence(section, page.page_no, sentence.strip(), starts_section)
+                    )
+                    starts_section = False
+            paragraph.clear()
+
+        for line in page.text.splitlines():
+            line = line.strip()
+            if not line or PAGE_NUMBER_RE.match(line):
+                continue
+            if HEADING_RE.match(line):
+                flush()
+                section, starts_section = line, True
+                paragraph.append(line)
+            else:
+                paragraph.append(line)
+        # sentences may carry on over the page break, but the page number of
+        # each sentence must be right, so flush at the end of every page
+        flush()
+        yield sentences
+
+
+class Chunker:
+    """token-aware chunker, see module docstring
+
+    Args:
+        max_tokens: max tokens in a chunk
+        overlap_tokens: trailing sentences (up to this many tokens) of a chunk
+            are repeated at the start of the next chunk of the same section
+        encoding_name: tiktoken encoding used to count tokens
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 512,
+        overlap_tokens: int = 48,
+        encoding_name: str = "cl100k_base",
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def _document(self, doc, sentences, lengths) -> Document:
+        return Document(
+            page_content=" ".join(s.text for s in sentences),
+            metadata={
+                "source": doc,
+                "section": sentences[0].section,
+                "page": sentences[0].page_no,
+                "page_end": sentences[-1].page_no,
+                "tokens": sum(lengths),
+            },
+        )
+
+    def _tokenized(self, pages) -> Iterator[Tuple[Sentence, List[int]]]:
+        """(sentence, its tokens) of the pages, tokenized a page at a time"""
+        for sentences in split_sentences(pages):
+            if sentences:
+                tokens = self.encoding.encode_batch(
+                    [s.text for s in sentences], disallowed_special=()
+                )
+                yield from zip(sentences, tokens)
+
+    def chunk_document(self, doc: str, pages) -> Iterator[Document]:
+        """chunk all pages of one PDF, pages can be a stream"""
+        # sentences of the chunk being built & their token counts
+        chunk, lengths = [], []
+        for sentence, sentence_tokens in self._tokenized(pages):
+            length = len(sentence_tokens)
+            if length > self.max_tokens:
+                # a single huge "sentence" (e.g. a table) - cut it by tokens
+                if chunk:
+                    yield self._document(doc, chunk, lengths)
+                    chunk, lengths = [], []
+                for start in range(0, length, self.max_tokens):
+                    window = sentence_tokens[start : start + self.max_tokens]
+                    piece = sentence._replace(text=self.encoding.decode(window))
+                    yield self._document(doc, [piece], [len(window)])
+                continue
+
+            if chunk and (
+                sentence.starts_section or sum(lengths) + length > self.max_tokens
+            ):
+                yield self._document(doc, chunk, lengths)
+                # carry trailing sentences over as overlap, within a section only
+                keep = 0
+                if not sentence.starts_section:
+                    while (
+                        keep < len(chunk)
+                        and sum(lengths[len(lengths) - keep - 1 :]) <= self.overlap_tokens
+                    ):
+                        keep += 1
+                    if sum(lengths[len(lengths) - keep :]) + length > self.max_tokens:
+                        keep = 0
+                chunk = chunk[len(chunk) - keep :]
+                lengths = lengths[len(lengths) - keep :]
+            chunk.append(sentence)
+            lengths.append(length)
+        if chunk:
+            yield self._document(doc, chunk, lengths)
+
+    def chunk_pages(self, pages: Iterable) -> Iterator[Document]:
+        """chunk a stream of page records (see pdf_ingest.py), one PDF at a time"""
+        for doc, doc_pages in itertools.groupby(pages, key=lambda page: page.doc):
+            yield from self.chunk_document(doc, doc_pages)
@@ -0,0 +1,125 @@
+"""
+context_packer.py - post-retrieval deduplication, reranking & packing
+
+Passing the raw top-k of similarity_search() to the "stuff" chain leaves the
+prompt size (and so LLM latency & cost) to chance. ContextPacker takes a
+larger set of candidate chunks and:
+    1. drops chunks that mostly repeat a better ranked chunk (overlaps)
+    2. reranks the rest with BM25 against the question, blended with the
+       vector search rank - all local, no extra model calls
+    3. greedily packs the best chunks into a fixed token budget
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Callable, List
+
+import tiktoken
+
+WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def _shingles(words, n=5):
+    return {tuple(words[i : i + n]) for i in range(max(len(words) - n + 1, 1))}
+
+
+def bm25_scores(query: str, texts: List[str], k1: float = 1.5, b: float = 0.75):
+    """BM25 score of each text for query, with IDF computed over texts"""
+    docs = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+    scores = [0.0] * len(docs)
+    for term in set(tokenize(query)):
+        df = sum(1 for doc in docs if term in doc)
+        if not df:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(docs):
+            tf = doc.get(term, 0)
+            if tf:
+                norm = k1 * (1 - b + b * lengths[i] / (avg_length or 1))
+                scores[i] += idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+class ContextPacker:
+    """dedupe, rerank & pack retrieved chunks, see module docstring
+
+    Args:
+        token_budget: max tokens of context handed to the QA chain
+        dedupe_threshold: a chunk sharing more than this fraction of its
+            5-word shingles with a better ranked chunk is dropped
+        lexical_weight: weight of BM25 vs the vector search rank (0..1)
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 1_500,
+        dedupe_threshold: float = 0.5,
+        lexical_weight: float = 0.5,
+        count_tokens: Callable[[str], int] = None,
+    ):
+        self.token_budget = token_budget
+        self.dedupe_threshold = dedupe_threshold
+        self.lexical_weight = lexical_weight
+        if count_tokens is None:
+            encoding = tiktoken.get_encoding("cl100k_base")
+            count_tokens = lambda text: len(encoding.encode(text, disallowed_special=()))
+        self.count_tokens = count_tokens
+
+    def dedupe(self, docs):
+        """drop documents that largely overlap an earlier (better ranked) one"""
+        kept, kept_shingles = [], []
+        for doc in docs:
+            shingles = _shingles(tokenize(doc.page_content))
+            if any(
+                len(shingles & other) > self.dedupe_threshold * len(shingles)
+                for other in kept_shingles
+            ):
+                continue
+            kept.append(doc)
+            kept_shingles.append(shingles)
+        return kept
+
+    def rerank(self, question, docs):
+        """order documents by BM25 blended with their vector search rank"""
+        if not docs:
+            return []
+        lexical = bm25_scores(question, [doc.page_content for doc in docs])
+        top = max(lexical) or 1.0
+        scores = [
+            self.lexical_weight * lexical[rank] / top
+            + (1 - self.lexical_weight) * (1 - rank / len(docs))
+            for rank in range(len(docs))
+        ]
+        order = sorted(range(len(docs)), key=scores.__getitem__, reverse=True)
+        return [docs[i] for i in order]
+
+    def pack(self, question, docs, baseline_k=4):
+        """returns the documents to stuff into the prompt + stats of the
+        prompt tokens saved, compared to stuffing the plain top-k
+
+        Args:
+            question: the user's question
+            docs: candidate documents, in vector search order
+            baseline_k: the top-k the chain used to get, for the tokens saved stat
+        """
+        baseline = sum(self.count_tokens(d.page_content) for d in docs[:baseline_k])
+        packed, used = [], 0
+        for doc in self.rerank(question, self.dedupe(docs)):
+            tokens = self.count_tokens(doc.page_content)
+            # skip what doesn't fit, a smaller chunk further down may still fit
+            if used + tokens <= self.token_budget:
+                packed.append(doc)
+                used += tokens
+        stats = {
+            "baseline_tokens": baseline,
+            "context_tokens": used,
+            "tokens_saved": baseline - used,
+        }
+        return packed, stats
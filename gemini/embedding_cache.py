@@ -0,0 +1,163 @@
+"""
+embedding_cache.py - persistent embedding cache with LRU eviction
+
+CachedEmbeddings wraps any LangChain Embeddings and stores every vector it
+gets back in a small SQLite database (one float32 blob per text). Texts that
+were embedded before - repeated questions, re-processed PDFs - are served
+from disk without calling the remote embedding model. The cache is bounded:
+once it holds more than max_entries vectors, the least recently used ones
+are evicted.
+"""
+
+import array
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def _to_blob(vector: List[float]) -> bytes:
+    return array.array("f", vector).tobytes()
+
+
+def _from_blob(blob: bytes) -> List[float]:
+    vector = array.array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """disk-backed cache in front of another Embeddings model
+
+    Usage:
+        embeddings = CachedEmbeddings(
+            GoogleGenerativeAIEmbeddings(model="models/embedding-001"),
+            "embedding_cache.db",
+        )
+        # use embeddings wherever the wrapped model would have been used
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        db_path: str = "embedding_cache.db",
+        max_entries: int = 100_000,
+        model_name: str = None,
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        # vectors from different models are not interchangeable, so the model
+        # name is part of every key
+        self.model_name = (
+            model_name
+            or getattr(embeddings, "model", None)
+            or getattr(embeddings, "model_name", None)
+            or type(embeddings).__name__
+        )
+        self.hits = 0
+        self.misses = 0
+        # Streamlit serves each session from its own thread
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def _key(self, kind: str, text: str) -> str:
+        # some models (e.g. Gemini) embed queries & documents differently
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def _lookup(self, keys):
+        """return {key: vector} for the keys that are cached & mark them as used"""
+        found = {}
+        with self._lock:
+            # stay well below SQLite's limit on the number of query parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                rows = self._conn.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN (%s)"
+                    % ",".join("?" * len(batch)),
+                    batch,
+                ).fetchall()
+                found.update((key, _from_blob(blob)) for key, blob in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items):
+        """store (key, vector) pairs, evicting the least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, _to_blob(vector), now) for key, vector in items],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+        # embed each distinct missing text only once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            # round to float32 now, so a vector is the same whether it's fresh
+            # or comes from the cache
+            new_items = [
+                (key, _from_blob(_to_blob(vector)))
+                for key, vector in zip(missing.keys(), vectors)
+            ]
+            self._store(new_items)
+            cached.update(new_items)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        cached = self._lookup([key])
+        if key in cached:
+            self.hits += 1
+            return cached[key]
+        self.misses += 1
+        vector = _from_blob(_to_blob(self.embeddings.embed_query(text)))
+        self._store([(key, vector)])
+        return vector
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,152 @@
+"""
+embedding_scheduler.py - batched, rate limited, concurrent embedding of chunks
+
+FAISS.from_texts() embeds all chunks in one sequential call, with no control
+over batch sizes, parallelism or retries. EmbeddingScheduler instead:
+    * packs chunks into batches bounded by a token budget & a max batch size
+    * keeps up to max_concurrency batches in flight
+    * paces requests with a token bucket, to stay under the API's rate limit
+    * retries failed batches with exponential backoff (+ jitter)
+and reports how many chunks/sec were embedded.
+"""
+
+import asyncio
+import random
+import time
+from typing import Callable, List
+
+
+def estimate_tokens(text: str) -> int:
+    """rough token count (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """asyncio token bucket - allows `rate` acquisitions/sec with bursts of up to
+    `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def pack_batches(
+    texts: List[str],
+    max_batch_tokens: int,
+    max_batch_size: int,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> List[List[int]]:
+    """group indexes of texts into batches, in order, each batch holds at most
+    max_batch_size texts and max_batch_tokens tokens (a single text larger than
+    the budget gets a batch of its own)"""
+    batches, batch, batch_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if batch and (
+            batch_tokens + tokens > max_batch_tokens or len(batch) >= max_batch_size
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingScheduler:
+    """embeds texts with any LangChain Embeddings, see module docstring
+
+    Args:
+        embeddings: the embeddings model, its aembed_documents() is used
+        max_batch_tokens: token budget of one embedding request
+        max_batch_size: max texts in one embedding request
+        max_concurrency: max requests in flight
+        requests_per_second: rate limit of the embedding API
+        max_retries: attempts per batch after the first one
+        base_delay: backoff before the first retry, doubled on every retry
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        max_batch_tokens: int = 8_000,
+        max_batch_size: int = 100,
+        max_concurrency: int = 4,
+        requests_per_second: float = 5.0,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.embeddings = embeddings
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.count_tokens = count_tokens
+        # stats of the last run
+        self.num_embedded = 0
+        self.num_retries = 0
+        self.elapsed = 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.num_embedded / self.elapsed if self.elapsed else 0.0
+
+    async def _embed_batch(self, texts, semaphore, bucket):
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                await bucket.acquire()
+                try:
+                    return await self.embeddings.aembed_documents(texts)
+                except Exception:
+                    if attempt == self.max_retries:
+                        raise
+            # back off outside the semaphore, so other batches can proceed
+            self.num_retries += 1
+            delay = self.base_delay * 2**attempt
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """embed texts, returns vectors in the same order as texts"""
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        bucket = TokenBucket(self.requests_per_second, self.max_concurrency)
+        batches = pack_batches(
+            texts, self.max_batch_tokens, self.max_batch_size, self.count_tokens
+        )
+        results = await asyncio.gather(
+            *(
+                self._embed_batch([texts[i] for i in batch], semaphore, bucket)
+                for batch in batches
+            )
+        )
+        vectors = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, results):
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+        self.num_embedded = len(texts)
+        self.elapsed = time.perf_counter() - start
+        return vectors
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """blocking version of aembed(), for use outside an event loop"""
+        return asyncio.run(self.aembed(texts))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+fake_embedding_server.py - local stand-in for a remote embedding API
+
+Serves deterministic (hash based) vectors over HTTP, with a configurable
+per-request latency and a fraction of requests failing with HTTP 429, so
+batching, concurrency, rate limiting & retries can be exercised offline.
+
+    POST /embed  {"texts": ["...", ...]}  ->  {"embeddings": [[...], ...]}
+
+usage: python fake_embedding_server.py [--port 8765] [--latency 0.2] [--error-rate 0.1]
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+def fake_vector(text: str, dims: int) -> List[float]:
+    """deterministic pseudo random unit-ish vector for text"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    return [rng.uniform(-1, 1) for _ in range(dims)]
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    # set by make_server()
+    dims = 768
+    latency = 0.2
+    error_rate = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            self.send_response(429)
+            self.end_headers()
+            return
+        payload = json.dumps(
+            {"embeddings": [fake_vector(text, self.dims) for text in body["texts"]]}
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+
+def make_server(port=8765, dims=768, latency=0.2, error_rate=0.0):
+    handler = type(
+        "Handler",
+        (FakeEmbeddingHandler,),
+        {"dims": dims, "latency": latency, "error_rate": error_rate},
+    )
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def start_in_background(**kwargs):
+    """start the fake server on a daemon thread, returns the server"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class HttpEmbeddings(Embeddings):
+    """LangChain Embeddings client for the fake server"""
+
+    def __init__(self, url="http://127.0.0.1:8765/embed", timeout=30):
+        self.url = url
+        self.timeout = timeout
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"texts": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        # HTTP 429 raises urllib.error.HTTPError
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["embeddings"]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = make_server(args.port, args.dims, args.latency, args.error_rate)
+    print(f"Fake embedding server on http://127.0.0.1:{args.port}/embed")
+    server.serve_forever()
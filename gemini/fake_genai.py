@@ -0,0 +1,120 @@
+"""
+fake_genai.py - local stand-in for the google.generativeai module
+
+Implements the part of the API hello_gemini.py & gemini_chat.py use -
+configure(), list_models(), GenerativeModel.generate_content() and
+start_chat().send_message(), with stream=True - without network or API key.
+Answers are deterministic (derived from the prompt), arrive in chunks of
+CHUNK_WORDS words after FIRST_CHUNK_DELAY seconds, then one every
+CHUNK_DELAY seconds; list_models() takes LIST_MODELS_DELAY seconds, like the
+real call. Token counts are word counts.
+
+Usage:
+    import fake_genai as genai
+"""
+
+import hashlib
+import random
+import time
+from types import SimpleNamespace
+from typing import Iterator, List
+
+FIRST_CHUNK_DELAY = 0.5
+CHUNK_DELAY = 0.05
+CHUNK_WORDS = 8
+ANSWER_WORDS = 80
+LIST_MODELS_DELAY = 1.5
+
+WORDS = (
+    "Gemini model answer context prompt token stream chat session history "
+    "the a of to and in is for with that on as this you can"
+).split()
+MODELS = [
+    ("models/gemini-2.5-pro", ["generateContent", "countTokens"]),
+    ("models/gemini-2.5-flash", ["generateContent", "countTokens"]),
+    ("models/gemini-2.0-flash", ["generateContent", "countTokens"]),
+    ("models/text-embedding-004", ["embedContent"]),
+]
+
+
+def configure(api_key=None, **kwargs):
+    pass
+
+
+def list_models():
+    time.sleep(LIST_MODELS_DELAY)
+    for name, methods in MODELS:
+        yield SimpleNamespace(name=name, supported_generation_methods=methods)
+
+
+def _text(content) -> str:
+    """text of a prompt, a {"role", "parts"} dict or a list of them"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, dict):
+        return " ".join(_text(part) for part in content.get("parts", []))
+    return " ".join(_text(item) for item in content)
+
+
+class GenerateContentResponse:
+    """iterate over it for the chunks when streaming; .text has the answer"""
+
+    def __init__(self, prompt: str, stream: bool):
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        words = [rng.choice(WORDS) for _ in range(ANSWER_WORDS)]
+        self._chunks = [
+            " ".join(words[i : i + CHUNK_WORDS]) + (" " if i + CHUNK_WORDS < len(words) else ".")
+            for i in range(0, len(words), CHUNK_WORDS)
+        ]
+        self._stream = stream
+        self._done = False
+        self.prompt_feedback = None
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=len(prompt.split()),
+            candidates_token_count=len(words),
+            total_token_count=len(prompt.split()) + len(words),
+        )
+        if not stream:
+            time.sleep(FIRST_CHUNK_DELAY + CHUNK_DELAY * (len(self._chunks) - 1))
+            self._done = True
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        for i, chunk in enumerate(self._chunks):
+            if self._stream and not self._done:
+                time.sleep(FIRST_CHUNK_DELAY if i == 0 else CHUNK_DELAY)
+            yield SimpleNamespace(text=chunk)
+        self._done = True
+
+    def resolve(self):
+        for _ in self:
+            pass
+
+    @property
+    def text(self) -> str:
+        if not self._done:
+            raise ValueError("please let the response complete iteration before accessing the final text")
+        return "".join(self._chunks)
+
+
+class ChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history: List[dict] = list(history or [])
+
+    def send_message(self, content, stream: bool = False) -> GenerateContentResponse:
+        message = {"role": "user", "parts": [_text(content)]}
+        response = self.model.generate_content([*self.history, message], stream=stream)
+        self.history.append(message)
+        self.history.append({"role": "model", "parts": ["".join(response._chunks)]})
+        return response
+
+
+class GenerativeModel:
+    def __init__(self, model_name: str = "gemini-2.5-flash", **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, stream: bool = False) -> GenerateContentResponse:
+        return GenerateContentResponse(_text(contents), stream)
+
+    def start_chat(self, history=None) -> ChatSession:
+        return ChatSession(self, history)
@@ -0,0 +1,110 @@
+"""
+gemini_chat.py - multi-turn Gemini chat with streamed answers & per-turn stats
+
+GeminiChat keeps one chat session (model.start_chat()) for the whole
+conversation and streams every answer chunk by chunk. With a
+ConversationMemory, the session's history is replaced before each message by
+the memory's summary & recent turns, so it doesn't grow with the chat.
+list_chat_models() caches the model list on disk, so it is not fetched from
+the API at every start.
+
+Works with google.generativeai or its local stand-in, fake_genai.py.
+
+Usage:
+    chat = GeminiChat(get_model("genai", "gemini-2.5-flash"), memory)
+    for text in chat.send("Hello"):
+        print(text, end="")
+    print(chat.stats[-1])
+"""
+
+import json
+import os
+import time
+from typing import Iterator, List, NamedTuple, Optional
+
+MODELS_CACHE = "gemini_models.json"
+
+
+def list_chat_models(genai, cache_path: str = MODELS_CACHE, ttl: float = 24 * 3600, refresh: bool = False) -> List[str]:
+    """names of the models supporting generateContent, from cache_path if it
+    was saved less than ttl seconds ago (or refresh is False)"""
+    if not refresh:
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if time.time() - cached["time"] < ttl:
+                return cached["models"]
+        except (OSError, ValueError, KeyError):
+            pass
+    models = [m.name for m in genai.list_models() if "generateContent" in m.supported_generation_methods]
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"time": time.time(), "models": models}, f)
+    os.replace(tmp_path, cache_path)
+    return models
+
+
+class TurnStats(NamedTuple):
+    first_chunk: float  # seconds until the first chunk arrived
+    elapsed: float
+    prompt_tokens: Optional[int]
+    answer_tokens: Optional[int]
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if self.answer_tokens is None or self.elapsed <= self.first_chunk:
+            return None
+        return self.answer_tokens / (self.elapsed - self.first_chunk)
+
+
+class GeminiChat:
+    """a chat with a Gemini model, see module docstring
+
+    Args:
+        model: genai.GenerativeModel (or fake_genai.GenerativeModel)
+        memory: conversation_memory.ConversationMemory to bound the history,
+            None to let the chat session keep all of it
+    """
+
+    def __init__(self, model, memory=None):
+        self.model = model
+        self.memory = memory
+        self.session = model.start_chat(history=[])
+        self.stats: List[TurnStats] = []
+
+    def _bounded_history(self) -> List[dict]:
+        summary, turns = self.memory.snapshot()
+        history = []
+        if summary:
+            history.append({"role": "user", "parts": [f"Summary of our earlier conversation:\n{summary}"]})
+            history.append({"role": "model", "parts": ["Noted."]})
+        for question, answer in turns:
+            history.append({"role": "user", "parts": [question]})
+            history.append({"role": "model", "parts": [answer]})
+        return history
+
+    def send(self, text: str) -> Iterator[str]:
+        """the answer to text, chunk by chunk as it arrives"""
+        if self.memory is not None:
+            self.session.history = self._bounded_history()
+        start = time.perf_counter()
+        first_chunk = None
+        chunks = []
+        response = self.session.send_message(text, stream=True)
+        for chunk in response:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            chunks.append(chunk.text)
+            yield chunk.text
+        elapsed = time.perf_counter() - start
+        usage = getattr(response, "usage_metadata", None)
+        self.stats.append(
+            TurnStats(
+                first_chunk if first_chunk is not None else elapsed,
+                elapsed,
+                getattr(usage, "prompt_token_count", None),
+                getattr(usage, "candidates_token_count", None),
+            )
+        )
+        if self.memory is not None:
+            self.memory.add_turn(text, "".join(chunks))
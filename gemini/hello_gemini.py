@@ -1,6 +1,11 @@
 """
 hello_gemini.py: Hello Google Gemini
 This script demonstrates how to use the Google Gemini model as a chatbot
+The chat remembers the recent turns & a summary of the older ones, see
+conversation_memory.py (in the repository root), answers are streamed as they
+arrive (see gemini_chat.py) and the model list is cached on disk for a day.
+Type /stats for the latency & tokens of each turn, /models to list the models.
+Set GEMINI_STUB=1 to chat with a local stand-in (fake_genai.py) instead.
 
 @author: Manish Bhobé
 My experiments with Python, ML, Gen AI, and more
@@ -8,15 +13,29 @@ Code shared for educational purposes only. Use at your own risk!!
 """
 
 import os
+import sys
+import textwrap
+from pathlib import Path
 from dotenv import load_dotenv
 from rich.console import Console
+from rich.live import Live
 from rich.markdown import Markdown
+from rich.table import Table
 
-import google.generativeai as genai
+from gemini_chat import GeminiChat, list_chat_models
+
+# conversation_memory.py & model_factory.py are shared with the other
+# scripts, in the repository root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from conversation_memory import ConversationMemory
+from model_factory import Provider, default_factory, get_model, get_module
+
+# the local stand-in has the same API, model_factory creates it like the real one
+default_factory.register("genai-stub", Provider("fake_genai", "GenerativeModel", "gemini-2.5-flash", "model_name"))
+PROVIDER = "genai-stub" if os.environ.get("GEMINI_STUB") == "1" else "genai"
 
 # load env variables from .env file
 _ = load_dotenv(override=True)  # read local .env file
-genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
 
 # for colorful output
 console = Console()
@@ -28,16 +47,36 @@ def to_markdown(text):
     return Markdown(textwrap.indent(text, "> ", predicate=lambda _: True))
 
 
+def print_stats(chat):
+    """latency & tokens of each turn of the chat"""
+    table = Table("turn", "first chunk (s)", "total (s)", "prompt tokens", "answer tokens", "tokens/s")
+    for i, turn in enumerate(chat.stats, 1):
+        tokens_per_second = turn.tokens_per_second
+        table.add_row(
+            str(i),
+            f"{turn.first_chunk:.2f}",
+            f"{turn.elapsed:.2f}",
+            str(turn.prompt_tokens),
+            str(turn.answer_tokens),
+            "-" if tokens_per_second is None else f"{tokens_per_second:.0f}",
+        )
+    console.print(table)
+
+
 def main():
-    # list all available Google models
-    for m in genai.list_models():
-        if "generateContent" in m.supported_generation_methods:
-            print(m.name)
+    # list all available Google models (cached on disk for a day)
+    # google.generativeai (configured with GOOGLE_API_KEY by model_factory)
+    genai = get_module(PROVIDER)
+    for name in list_chat_models(genai):
+        print(name)
 
     # we'll be using the gemini-2.5-flash model
     # you can choose any model from the list displayed above
     # if you want to use a different model, change the model name below
-    llm = genai.GenerativeModel("gemini-2.5-flash")
+    llm = get_model(PROVIDER, "gemini-2.5-flash")
+    # older turns are summarized by the same model, in a background thread
+    memory = ConversationMemory(lambda prompt: llm.generate_content(prompt).text)
+    chat = GeminiChat(llm, memory)
     prompt_text = ""
     console.print(
         Markdown(
@@ -50,13 +89,24 @@ def main():
         prompt_text = input()
         if prompt_text.lower() in ["bye", "quit", "exit"]:
             break
+        if prompt_text.strip() == "/stats":
+            print_stats(chat)
+            continue
+        if prompt_text.strip() == "/models":
+            for name in list_chat_models(genai, refresh=True):
+                print(name)
+            continue
+        console.print("[yellow]AI: [/yellow]")
         try:
-            response = llm.generate_content(prompt_text)
-            console.print("[yellow]AI: [/yellow]")
-            console.print(Markdown(response.text))
+            # render the answer as it streams in
+            answer = ""
+            with Live(Markdown(answer), console=console, refresh_per_second=10) as live:
+                for text in chat.send(prompt_text):
+                    answer += text
+                    live.update(Markdown(answer))
         except ValueError as err:
+            # e.g. the prompt or the answer was blocked
             console.print(f"[red]Error:[/red]\n{err}")
-            print(f"{response.prompt_feedback}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,296 @@
+"""
+index_manager.py - incremental, content-addressed updates of the FAISS index
+
+Every chunk is identified by the SHA-256 hash of its text. A manifest saved
+next to the FAISS index records which documents each chunk came from, so that
+re-processing a set of PDFs only embeds chunks that are not already in the
+index, and removing a PDF only deletes the vectors no other PDF still uses.
+A PDF processed again (e.g. a changed version uploaded under the same name)
+has its chunks replaced: the ones the new version no longer has are removed
+as if the PDF had been deleted. One IndexManager can be shared by threads
+(e.g. all Streamlit sessions).
+
+Every save writes a new generation of the index files (index-<n>.faiss &
+.pkl, bm25-<n>.npz & _vocab.json) and then atomically replaces the manifest,
+which names the generation. Readers (retriever_service.py) that memory-map
+the FAISS index never see a file rewritten under them, and always load a
+FAISS index, docstore & BM25 index that belong together.
+
+The index starts out flat (exact search). If an ANN index_mode is asked for
+(see ann_index.py), the index is rebuilt in that mode - from the vectors
+already stored, without re-embedding anything - once it holds enough chunks.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores import FAISS
+
+from ann_index import MIN_VECTORS, apply_search_params, build_index, empty_copy
+from ann_index import index_params, reconstruct_all
+from bm25_index import BM25_NAME, BM25Index
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+# new chunks are embedded & added to the index this many at a time, as the
+# chunks stream in - memory doesn't grow with the size of an upload
+EMBED_BATCH = 256
+# files of any generation of the index, see generation_names()
+INDEX_FILE_RE = re.compile(r"^(?:index|bm25)(?:-\d+)?(?:\.faiss|\.pkl|\.npz|_vocab\.json)$")
+
+
+def chunk_id(text: str) -> str:
+    """content address of a chunk of text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def generation_names(generation):
+    """FAISS index name & BM25 name of a generation of the index files
+    (None: files saved before there were generations)"""
+    if generation is None:
+        return "index", BM25_NAME
+    return f"index-{generation}", f"{BM25_NAME}-{generation}"
+
+
+class IndexManager:
+    """manages a FAISS index on disk + a manifest of the chunks in it
+
+    The manifest looks like this:
+        {
+            "version": 1,
+            "updated": <epoch seconds of last save>,
+            "generation": <n>,  # of the index files, see generation_names()
+            "chunks": {<chunk_id>: [<doc>, ...]},   # docs sharing the chunk
+            "docs": {<doc>: [<chunk_id>, ...]},
+            "index": {"mode": <index mode>, "params": {...}},  # see ann_index.py
+        }
+    """
+
+    def __init__(
+        self, embeddings, index_path="faiss_index", scheduler=None, index_mode="flat"
+    ):
+        self.embeddings = embeddings
+        # optional EmbeddingScheduler, to embed new chunks in parallel batches
+        self.scheduler = scheduler
+        # the ANN mode the index should use, once it is large enough
+        self.index_mode = index_mode
+        self.index_path = index_path
+        self.manifest_path = os.path.join(index_path, MANIFEST_FILE)
+        self.vector_store = None
+        self.bm25 = None
+        # chunks added to / removed from the index since the BM25 index was saved
+        self._bm25_added = {}
+        self._bm25_removed = set()
+        self.manifest = {"version": MANIFEST_VERSION, "chunks": {}, "docs": {}}
+        self._lock = threading.RLock()
+        self.load()
+        self.manifest.setdefault("index", {"mode": "flat", "params": {"factory": "Flat"}})
+
+    def load(self):
+        """load index + manifest from disk, if they exist"""
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest["chunks"]:
+            # the index is only ever written by us, so unpickling it is safe
+            index_name, bm25_name = generation_names(self.manifest.get("generation"))
+            self.vector_store = FAISS.load_local(
+                self.index_path,
+                self.embeddings,
+                index_name,
+                allow_dangerous_deserialization=True,
+            )
+            self.bm25 = BM25Index.load(self.index_path, bm25_name)
+            if "index" in self.manifest:
+                apply_search_params(
+                    self.vector_store.index, self.manifest["index"]["params"]
+                )
+
+    def save(self):
+        """persist index + manifest: the index files are written as a new
+        generation, then the manifest naming it is replaced atomically, so
+        readers never see a manifest describing files that aren't saved, nor
+        files changing under them"""
+        with self._lock:
+            os.makedirs(self.index_path, exist_ok=True)
+            generation = (self.manifest.get("generation") or 0) + 1
+            index_name, bm25_name = generation_names(generation)
+            if self.vector_store is not None:
+                self.vector_store.save_local(self.index_path, index_name)
+                if self.bm25 is None:
+                    # first save (or an index saved without one): from all chunks
+                    docstore = self.vector_store.docstore
+                    self.bm25 = BM25Index.build(
+                        {
+                            cid: docstore.search(cid).page_content
+                            for cid in self.vector_store.index_to_docstore_id.values()
+                        }
+                    )
+                elif self._bm25_added or self._bm25_removed:
+                    # only the chunks added since the last save are tokenized
+                    self.bm25 = self.bm25.update(self._bm25_added, self._bm25_removed)
+                self.bm25.save(self.index_path, bm25_name)
+            else:
+                self.bm25 = None
+            self._bm25_added, self._bm25_removed = {}, set()
+            self.manifest["generation"] = generation
+            self.manifest["updated"] = time.time()
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+            self._remove_old_generations(generation)
+
+    def _remove_old_generations(self, generation):
+        """delete the files of older generations - readers that have them open
+        (or memory-mapped) keep reading them until they reload"""
+        keep = set()
+        if self.vector_store is not None:
+            index_name, bm25_name = generation_names(generation)
+            keep = {f"{index_name}.faiss", f"{index_name}.pkl", f"{bm25_name}.npz", f"{bm25_name}_vocab.json"}
+        for name in os.listdir(self.index_path):
+            if INDEX_FILE_RE.match(name) and name not in keep:
+                try:
+                    os.remove(os.path.join(self.index_path, name))
+                except OSError:
+                    pass  # in use (Windows), removed at the next save
+
+    @property
+    def docs(self):
+        with self._lock:
+            return sorted(self.manifest["docs"])
+
+    def add_documents(self, documents) -> int:
+        """add chunks (LangChain Documents with a "source" metadata entry) to the
+        index, only chunks not already present are embedded - the chunks of a
+        source replace the ones recorded for it before. documents can be an
+        iterator, it is consumed (and embedded) EMBED_BATCH new chunks at a time
+        Returns the number of chunks that were embedded"""
+        with self._lock:
+            return self._add_documents(documents)
+
+    def _add_documents(self, documents) -> int:
+        chunks, docs = self.manifest["chunks"], self.manifest["docs"]
+        batch = []  # (text, metadata, chunk id) of new chunks, not embedded yet
+        num_embedded = 0
+        previous = {}  # source -> its chunk ids before this call
+        for document in documents:
+            doc = document.metadata.get("source", "")
+            if doc not in previous:
+                previous[doc] = docs.pop(doc, [])
+            cid = chunk_id(document.page_content)
+            if cid in chunks:
+                # already embedded, just record that this doc uses it too
+                if doc not in chunks.setdefault(cid, []):
+                    chunks[cid].append(doc)
+            else:
+                chunks[cid] = [doc]
+                batch.append((document.page_content, document.metadata, cid))
+                self._bm25_added[cid] = document.page_content
+                if len(batch) >= EMBED_BATCH:
+                    num_embedded += self._embed(batch)
+                    batch = []
+            if cid not in docs.setdefault(doc, []):
+                docs[doc].append(cid)
+        if batch:
+            num_embedded += self._embed(batch)
+        # chunks the sources no longer have
+        for doc, cids in previous.items():
+            current = set(docs[doc])
+            self._remove_chunks(doc, [cid for cid in cids if cid not in current])
+        return num_embedded
+
+    def _embed(self, batch) -> int:
+        """embed a batch of new chunks & add them to the FAISS index"""
+        texts, metadatas, ids = (list(column) for column in zip(*batch))
+        if self.scheduler is not None:
+            vectors = self.scheduler.embed(texts)
+        else:
+            vectors = self.embeddings.embed_documents(texts)
+        text_embeddings = list(zip(texts, vectors))
+        if self.vector_store is None:
+            self.vector_store = FAISS.from_embeddings(
+                text_embeddings, self.embeddings, metadatas=metadatas, ids=ids
+            )
+        else:
+            self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        # switch from flat to the requested ANN mode once there's enough data
+        index_info = self.manifest["index"]
+        if (
+            index_info["mode"] != self.index_mode
+            and index_info["mode"] == "flat"
+            and self.vector_store.index.ntotal >= MIN_VECTORS[self.index_mode]
+        ):
+            self.rebuild(self.index_mode)
+        return len(texts)
+
+    def rebuild(self, mode, exclude_ids=(), retrain=True):
+        """rebuild the FAISS index in another mode, from the stored vectors
+        (no re-embedding), optionally leaving out some chunks - with retrain
+        False, the index keeps its mode, parameters & training"""
+        store = self.vector_store
+        vectors = reconstruct_all(store.index)
+        keep = [
+            row
+            for row in range(store.index.ntotal)
+            if store.index_to_docstore_id[row] not in exclude_ids
+        ]
+        vectors = np.ascontiguousarray(vectors[keep], dtype=np.float32)
+        if retrain:
+            params = index_params(mode, vectors.shape[1], len(vectors))
+            index = build_index(params, vectors)
+        else:
+            params = self.manifest["index"]["params"]
+            index = empty_copy(store.index)
+            apply_search_params(index, params)
+        index.add(vectors)
+        ids = [store.index_to_docstore_id[row] for row in keep]
+        self.vector_store = FAISS(
+            self.embeddings,
+            index,
+            InMemoryDocstore({cid: store.docstore.search(cid) for cid in ids}),
+            dict(enumerate(ids)),
+        )
+        self.manifest["index"] = {"mode": mode, "params": params}
+
+    def delete_document(self, doc: str) -> int:
+        """remove a document from the index, vectors of chunks still used by
+        other documents are kept
+        Returns the number of vectors deleted"""
+        with self._lock:
+            return self._remove_chunks(doc, self.manifest["docs"].pop(doc, []))
+
+    def _remove_chunks(self, doc: str, cids) -> int:
+        """remove doc from chunks cids, deleting the vectors no other document
+        uses - returns the number deleted"""
+        chunks = self.manifest["chunks"]
+        orphans = []
+        for cid in cids:
+            chunks[cid].remove(doc)
+            if not chunks[cid]:
+                del chunks[cid]
+                orphans.append(cid)
+                # not in the saved BM25 index if it was added since
+                if self._bm25_added.pop(cid, None) is None:
+                    self._bm25_removed.add(cid)
+        if orphans:
+            if not chunks:
+                # FAISS can't save an empty index, start afresh next time
+                self.vector_store = None
+                self.manifest["index"] = {"mode": "flat", "params": {"factory": "Flat"}}
+            elif self.manifest["index"]["mode"] == "flat":
+                self.vector_store.delete(orphans)
+            else:
+                # HNSW graphs don't support removing vectors, & IVF indexes
+                # remove them without renumbering the rest (FAISS.delete()
+                # assumes they're renumbered, like a flat index does) - so
+                # refill the index with the vectors kept, ids 0..n-1
+                self.rebuild(self.manifest["index"]["mode"], exclude_ids=set(orphans), retrain=False)
+        return len(orphans)
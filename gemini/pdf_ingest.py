@@ -0,0 +1,107 @@
+"""
+pdf_ingest.py - streaming, parallel text extraction from PDF files
+
+Instead of building one giant string from every page of every PDF, pages are
+extracted in a pool of worker processes and yielded one at a time as
+(doc, page_no, text) records. Only a bounded window of pages is ever in
+flight, so memory stays flat regardless of how many PDFs are uploaded.
+
+Uploaded files (file-like objects) are spilled to temporary files, so the
+workers are handed a path rather than the PDF's bytes, and the workers count
+the pages too - the calling process never parses a PDF.
+"""
+
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, NamedTuple
+
+from PyPDF2 import PdfReader
+
+# number of pages each worker extracts per task - large enough to amortise
+# re-opening the PDF in the worker, small enough to keep the window tight
+PAGES_PER_TASK = 8
+# max number of tasks in flight per worker
+TASKS_PER_WORKER = 2
+
+
+class PageRecord(NamedTuple):
+    """one extracted page of a PDF"""
+
+    doc: str
+    page_no: int  # 1-based, as shown in PDF viewers
+    text: str
+
+
+def _source_of(pdf, temp_paths):
+    """return (name, path) for a path or a file-like object (e.g. Streamlit
+    upload) - a file-like object is copied to a temporary file, whose path is
+    added to temp_paths"""
+    if isinstance(pdf, (str, os.PathLike)):
+        return os.path.basename(os.fspath(pdf)), os.fspath(pdf)
+    name = getattr(pdf, "name", None) or f"pdf-{id(pdf)}"
+    if hasattr(pdf, "seek"):
+        pdf.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        temp_paths.append(f.name)
+        shutil.copyfileobj(pdf, f)
+    return os.path.basename(name), f.name
+
+
+def _count_pages(path: str) -> int:
+    """worker: number of pages of one PDF"""
+    return len(PdfReader(path).pages)
+
+
+def _extract_pages(doc: str, path: str, start: int, stop: int):
+    """worker: extract text of pages [start, stop) of one PDF"""
+    reader = PdfReader(path)
+    return [
+        PageRecord(doc, page_no + 1, reader.pages[page_no].extract_text() or "")
+        for page_no in range(start, stop)
+    ]
+
+
+def _tasks(sources, page_counts):
+    """split every PDF into (doc, path, start, stop) page ranges"""
+    for (doc, path), num_pages in zip(sources, page_counts):
+        for start in range(0, num_pages, PAGES_PER_TASK):
+            yield doc, path, start, min(start + PAGES_PER_TASK, num_pages)
+
+
+def iter_pdf_pages(pdfs: Iterable, max_workers: int = None) -> Iterator[PageRecord]:
+    """yield a PageRecord for every page of every PDF, in document order
+
+    Args:
+        pdfs: paths or file-like objects (e.g. from st.file_uploader)
+        max_workers: size of the process pool (default: CPU count),
+            use 0 to extract in the calling process
+    """
+    temp_paths = []
+    try:
+        sources = [_source_of(pdf, temp_paths) for pdf in pdfs]
+        if max_workers == 0:
+            page_counts = (_count_pages(path) for _, path in sources)
+            for task in _tasks(sources, page_counts):
+                yield from _extract_pages(*task)
+            return
+
+        max_workers = max_workers or os.cpu_count() or 1
+        window = max_workers * TASKS_PER_WORKER
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            # all page counts are queued ahead of the extraction tasks
+            counts = [pool.submit(_count_pages, path) for _, path in sources]
+            pending = deque()
+            for task in _tasks(sources, (count.result() for count in counts)):
+                pending.append(pool.submit(_extract_pages, *task))
+                # once the window is full, hand back the oldest batch before
+                # submitting any more work - this is what bounds memory
+                if len(pending) >= window:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    finally:
+        for path in temp_paths:
+            os.remove(path)
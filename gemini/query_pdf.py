@@ -4,53 +4,95 @@ query_pdf.py - illustrates how to interface Gemini Pro LLM with PDFs as
 a knowledge retriever
 """
 import os
+import sys
 import textwrap
+from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 import streamlit as st
-import google.generativeai as genai
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
 
+from pdf_ingest import iter_pdf_pages
+from chunker import Chunker
+from index_manager import IndexManager
+from embedding_cache import CachedEmbeddings
+from retriever_service import RetrieverService
+from embedding_scheduler import EmbeddingScheduler
+from context_packer import ContextPacker
+from streaming import StreamingAnswerHandler
+
 from IPython.display import display
 from IPython.display import Markdown
 
-# load all environment variables from .env
-load_dotenv(find_dotenv())
-# and configure API key for Google Geimini access
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# model_factory.py is shared by all the scripts, in the repository root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from model_factory import get_model
 
-# create your LLM (Google Gemini-Pro)
-# model = genai.GenerativeModel("gemini-pro")
+# load all environment variables from .env (the Gemini clients read
+# GOOGLE_API_KEY from the environment)
+load_dotenv(find_dotenv())
 
 
 def get_pdf_text(pdfs):
-    """read all text from all PDFs provided"""
-    text = ""
-    for pdf in pdfs:
-        pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
-
-
-def get_text_chunks(text):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=10_000, chunk_overlap=1_000
+    """stream (doc, page_no, text) records for every page of all PDFs provided
+    pages are extracted in parallel worker processes (see pdf_ingest.py)"""
+    return iter_pdf_pages(pdfs)
+
+
+def get_text_chunks(pages):
+    """split a stream of page records into chunks (Documents) of at most 512
+    tokens, that follow sentence & section boundaries and carry the PDF, section
+    and page numbers they came from (see chunker.py)"""
+    chunker = Chunker(max_tokens=512, overlap_tokens=48)
+    return chunker.chunk_pages(pages)
+
+
+@st.cache_resource
+def get_embeddings():
+    """Gemini embeddings, behind a local disk cache so repeated questions and
+    re-processed chunks are not sent to Google again (see embedding_cache.py)
+    - one per process, so the cache's SQLite connection is opened once"""
+    return CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(model="models/embedding-001"),
+        "embedding_cache.db",
     )
-    chunks = text_splitter.split_text(text)
-    return chunks
 
 
-def get_vector_store(text_chunks):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
+# FAISS index mode: "flat" (exact), or for large corpora "ivf", "hnsw" or
+# "ivfpq" (see ann_index.py) - the index switches over once it is big enough
+INDEX_MODE = os.getenv("PDF_INDEX_MODE", "flat")
+
+
+@st.cache_resource
+def get_index_manager(index_mode=INDEX_MODE):
+    """one index manager per process, shared by all Streamlit sessions: the
+    FAISS index is loaded from disk once, not at every rerun"""
+    embeddings = get_embeddings()
+    # embed new chunks in batches, a few requests at a time, within rate limits
+    scheduler = EmbeddingScheduler(
+        embeddings, max_concurrency=4, requests_per_second=5.0
+    )
+    return IndexManager(
+        embeddings, "faiss_index", scheduler=scheduler, index_mode=index_mode
+    )
+
+
+def get_vector_store(text_chunks, index_mode=INDEX_MODE):
+    """add chunks to the local FAISS index - only chunks that are not already
+    in the index are embedded (see index_manager.py)
+    index_mode picks exact or approximate search (see ann_index.py), user_input()
+    picks up whichever mode the saved index uses"""
+    index_manager = get_index_manager(index_mode)
+    num_embedded = index_manager.add_documents(text_chunks)
     # save locally (you can also save it to database or other location)
-    vector_store.save_local("faiss_index")
+    index_manager.save()
+    if num_embedded:
+        print(
+            f"Embedded {num_embedded} chunks @ "
+            f"{index_manager.scheduler.chunks_per_sec:.1f} chunks/sec"
+        )
+    return num_embedded
 
 
 def get_conversational_chain(temperature=0.3):
@@ -64,7 +106,7 @@ def get_conversational_chain(temperature=0.3):
     Answer:
     """
     # initialize chat model with Gemini-pro backend
-    model = ChatGoogleGenerativeAI(model="gemini-pro", temperature=temperature)
+    model = get_model("gemini", "gemini-pro", temperature=temperature)
     prompt = PromptTemplate(
         template=prompt_template, input_variables=["context", "question"]
     )
@@ -72,19 +114,38 @@ def get_conversational_chain(temperature=0.3):
     return chain
 
 
-def user_input(user_question):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+@st.cache_resource
+def get_retriever_service():
+    """one retriever service per process, shared by all Streamlit sessions
+    (see retriever_service.py)"""
+    return RetrieverService(
+        get_embeddings(),
+        get_conversational_chain,
+        "faiss_index",
+        # stuff at most 1500 tokens of the best, non-overlapping chunks
+        packer=ContextPacker(token_budget=1_500),
+    )
 
-    context_db = FAISS.load_local("faiss_index", embeddings)
-    docs = context_db.similarity_search(user_question)
-    chain = get_conversational_chain()
 
-    response = chain(
-        {"input_documents": docs, "question": user_question},
-        return_only_outputs=True,
-    )
-    print(response)
-    st.write("Reply:", response["output_text"])
+def user_input(user_question):
+    service = get_retriever_service()
+    if service.vector_store is None:
+        st.warning("Please upload your PDFs and click Submit & Process first")
+        return
+
+    st.write("Reply:")
+    # tokens are rendered into this placeholder as the model generates them
+    handler = StreamingAnswerHandler(st.empty().markdown)
+    response = service.stream_answer(user_question, callbacks=[handler])
+    print(response, handler.stats)
+    stats = response.get("context_stats")
+    if stats:
+        st.caption(
+            f"Context: {stats['context_tokens']} tokens "
+            f"({stats['tokens_saved']} saved vs. plain top-k) · "
+            f"first token after {handler.time_to_first_token:.2f}s · "
+            f"{handler.tokens_per_sec:.1f} tokens/sec"
+        )
 
 
 def get_gemini_response(question):
@@ -115,10 +176,19 @@ def main():
         )
         if st.button("Submit & Process"):
             with st.spinner("Processing..."):
-                raw_text = get_pdf_text(pdf_docs)
-                text_chunks = get_text_chunks(raw_text)
-                get_vector_store(text_chunks)
-                st.success("Done")
+                pages = get_pdf_text(pdf_docs)
+                text_chunks = get_text_chunks(pages)
+                num_embedded = get_vector_store(text_chunks)
+                st.success(f"Done - embedded {num_embedded} new chunk(s)")
+
+        # allow removing PDFs that were indexed earlier
+        index_manager = get_index_manager()
+        if index_manager.docs:
+            doc_to_remove = st.selectbox("Indexed PDFs", index_manager.docs)
+            if st.button("Remove from index"):
+                index_manager.delete_document(doc_to_remove)
+                index_manager.save()
+                st.success(f"Removed {doc_to_remove}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,229 @@
+"""
+retriever_service.py - load the FAISS index & QA chain once per process
+
+Loading the index from disk and building the QA chain for every question is
+pure overhead. RetrieverService keeps both in memory and shares them across
+all Streamlit sessions. The index is memory-mapped (where FAISS supports it)
+and is only reloaded when the manifest written by IndexManager names a new
+generation of the index files, i.e. after PDFs were added to or removed from
+the index. The FAISS index, its docstore & the BM25 index are always loaded
+from the same generation.
+
+Chunks are retrieved from FAISS, from the BM25 index saved next to it, or from
+both (merged by reciprocal rank fusion) - see RetrieverService.retrieve().
+"""
+
+import json
+import os
+import pickle
+import threading
+
+import faiss
+from langchain.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.prompts import format_document
+
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from ann_index import apply_search_params
+from index_manager import MANIFEST_FILE, chunk_id, generation_names
+
+# times to retry loading a generation that a newer save has already deleted
+MAX_LOAD_ATTEMPTS = 3
+
+
+def load_vector_store(index_path, embeddings, index_name="index"):
+    """same as FAISS.load_local(), except the index is memory-mapped read-only,
+    so loading is near instant and pages are shared with other processes"""
+    index_file = os.path.join(index_path, f"{index_name}.faiss")
+    try:
+        index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # FAISS reports a missing file as a RuntimeError too
+        if not os.path.exists(index_file):
+            raise FileNotFoundError(index_file)
+        # not every index type can be memory-mapped
+        index = faiss.read_index(index_file)
+    # the index is only ever written by IndexManager, so unpickling it is safe
+    with open(os.path.join(index_path, f"{index_name}.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+class RetrieverService:
+    """process wide owner of the vector store + QA chain
+
+    Args:
+        embeddings: embeddings used to embed questions
+        chain_factory: callable returning the QA chain, called only once
+        index_path: folder holding the FAISS index & its manifest
+        packer: optional ContextPacker, to dedupe, rerank & pack a larger
+            set of candidate chunks into a token budget
+    """
+
+    def __init__(
+        self, embeddings, chain_factory, index_path="faiss_index", packer=None
+    ):
+        self.embeddings = embeddings
+        self.chain_factory = chain_factory
+        self.index_path = index_path
+        self.packer = packer
+        self.manifest_path = os.path.join(index_path, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        # (vector store, BM25 index) of one generation, replaced together
+        self._stores = (None, None)
+        self._signature = None
+        self._generation = None
+        self._chain = None
+
+    def _manifest_signature(self):
+        """cheap fingerprint of the manifest, changes whenever the index is saved"""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        """load the vector store & BM25 index of the generation the manifest
+        names, unless it is the one already loaded"""
+        for attempt in range(MAX_LOAD_ATTEMPTS):
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                self._stores, self._generation = (None, None), None
+                return
+            generation = manifest.get("generation")
+            if not manifest["chunks"]:
+                self._stores = (None, None)
+            elif generation != self._generation or self._stores[0] is None:
+                index_name, bm25_name = generation_names(generation)
+                try:
+                    vector_store = load_vector_store(self.index_path, self.embeddings, index_name)
+                    bm25 = BM25Index.load(self.index_path, bm25_name)
+                except FileNotFoundError:
+                    # a newer save replaced the manifest & deleted these files
+                    if attempt + 1 == MAX_LOAD_ATTEMPTS:
+                        raise
+                    continue
+                # e.g. nprobe of IVF indexes, see ann_index.py
+                if manifest.get("index"):
+                    apply_search_params(vector_store.index, manifest["index"]["params"])
+                self._stores = (vector_store, bm25)
+            self._generation = generation
+            return
+
+    def _refresh(self):
+        """(re)load the vector store & BM25 index, only if they changed on disk"""
+        signature = self._manifest_signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._load()
+                    self._signature = signature
+
+    def stores(self):
+        """(vector store, lexical index) of the same generation, both None if
+        there is no index yet"""
+        self._refresh()
+        return self._stores
+
+    @property
+    def vector_store(self):
+        """the vector store, None if there is no index yet"""
+        return self.stores()[0]
+
+    @property
+    def bm25(self):
+        """the lexical index, None if there is no index yet"""
+        return self.stores()[1]
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            with self._lock:
+                if self._chain is None:
+                    self._chain = self.chain_factory()
+        return self._chain
+
+    def similarity_search(self, question, k=4):
+        vector_store = self.vector_store
+        if vector_store is None:
+            return []
+        return vector_store.similarity_search(question, k=k)
+
+    def lexical_search(self, question, k=4):
+        """BM25 search - no embedding call needed"""
+        vector_store, bm25 = self.stores()
+        if vector_store is None or bm25 is None:
+            return []
+        docs = [vector_store.docstore.search(cid) for cid, _ in bm25.search(question, k)]
+        # the docstore returns an "ID ... not found" string for unknown ids
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    def retrieve(self, question, k=4, mode="auto"):
+        """retrieve the k most relevant chunks
+
+        Args:
+            mode: "dense" - FAISS only
+                  "lexical" - BM25 only, no remote embedding call
+                  "hybrid" - both, merged by reciprocal rank fusion
+                  "auto" - lexical for short (keyword) questions that BM25 can
+                      answer, hybrid otherwise
+        """
+        if mode == "auto":
+            mode = "lexical" if len(question.split()) <= 3 else "hybrid"
+        if mode == "dense":
+            return self.similarity_search(question, k=k)
+        lexical = self.lexical_search(question, k=k)
+        if mode == "lexical" and lexical:
+            return lexical
+        dense = self.similarity_search(question, k=k)
+        if not lexical:
+            return dense
+        # documents are content addressed, so they can be matched up by hash
+        by_id = {chunk_id(d.page_content): d for d in dense + lexical}
+        ranked = reciprocal_rank_fusion(
+            [chunk_id(d.page_content) for d in dense],
+            [chunk_id(d.page_content) for d in lexical],
+        )
+        return [by_id[cid] for cid in ranked[:k]]
+
+    def _context(self, question, k, fetch_k, mode):
+        """documents to answer from + packing stats (None without a packer)"""
+        if self.packer is None:
+            return self.retrieve(question, k=k, mode=mode), None
+        candidates = self.retrieve(question, k=fetch_k, mode=mode)
+        return self.packer.pack(question, candidates, baseline_k=k)
+
+    def answer(self, question, k=4, fetch_k=12, mode="auto"):
+        """retrieve the k most relevant chunks & answer the question from them
+        with a packer, fetch_k candidates are retrieved & packed instead and the
+        packing stats are returned under the "context_stats" key"""
+        docs, stats = self._context(question, k, fetch_k, mode)
+        response = self.chain(
+            {"input_documents": docs, "question": question},
+            return_only_outputs=True,
+        )
+        if stats is not None:
+            response["context_stats"] = stats
+        return response
+
+    def stream_answer(self, question, callbacks, k=4, fetch_k=12, mode="auto"):
+        """same as answer(), but the chat model streams its answer, token by
+        token, to the callbacks (see streaming.py)"""
+        docs, stats = self._context(question, k, fetch_k, mode)
+        # fill in the prompt exactly like the "stuff" chain does, then stream
+        # from its model directly
+        chain = self.chain
+        context = chain.document_separator.join(
+            format_document(doc, chain.document_prompt) for doc in docs
+        )
+        prompt = chain.llm_chain.prompt.format(
+            **{chain.document_variable_name: context, "question": question}
+        )
+        chunks = chain.llm_chain.llm.stream(prompt, config={"callbacks": callbacks})
+        response = {"output_text": "".join(chunk.content for chunk in chunks)}
+        if stats is not None:
+            response["context_stats"] = stats
+        return response
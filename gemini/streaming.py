@@ -0,0 +1,74 @@
+"""
+streaming.py - stream the answer into the page as tokens arrive
+
+StreamingAnswerHandler is a LangChain callback handler: the chat model calls
+on_llm_new_token() for every token it generates, the handler appends it to
+the answer so far and re-renders it (e.g. into a Streamlit placeholder). It
+also records time-to-first-token and tokens/sec of each answer.
+"""
+
+import time
+from typing import Callable
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class StreamingAnswerHandler(BaseCallbackHandler):
+    """render an answer token by token
+
+    Args:
+        render: called with the answer so far, every time a token arrives
+            e.g. st.empty().markdown
+        cursor: appended to the answer while it is still being generated
+    """
+
+    def __init__(self, render: Callable[[str], None], cursor: str = "▌"):
+        self.render = render
+        self.cursor = cursor
+        self.text = ""
+        self.num_tokens = 0
+        self.start_time = time.perf_counter()
+        self.first_token_time = None
+        self.end_time = None
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.start_time = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.start_time = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+        self.text += token
+        self.num_tokens += 1
+        self.render(self.text + self.cursor)
+
+    def on_llm_end(self, response, **kwargs):
+        self.end_time = time.perf_counter()
+        if not self.num_tokens:
+            # the model didn't stream, show the complete answer in one go
+            self.text = response.generations[0][0].text
+            self.first_token_time = self.end_time
+        self.render(self.text)
+
+    @property
+    def time_to_first_token(self) -> float:
+        if self.first_token_time is None:
+            return float("nan")
+        return self.first_token_time - self.start_time
+
+    @property
+    def tokens_per_sec(self) -> float:
+        if self.first_token_time is None or self.end_time is None:
+            return float("nan")
+        elapsed = self.end_time - self.first_token_time
+        return self.num_tokens / elapsed if elapsed > 0 else float("nan")
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens": self.num_tokens,
+            "tokens_per_sec": self.tokens_per_sec,
+        }
@@ -0,0 +1,177 @@
+"""
+inference_client.py - shared, streaming async client for a text generation
+endpoint (Hugging Face Inference API / text-generation-inference)
+
+chainlit_app.py used to create a HuggingFaceHub LLM per chat session and
+only showed the answer once all of it was generated. Instead:
+    * one InferenceClient is shared by all sessions: a single aiohttp
+      session with a pool of keep-alive connections to the endpoint
+    * answers are streamed (server-sent events), token by token
+    * ChatSession.ask() cancels the answer still being generated for the
+      same session, e.g. when the user sends a new message mid-answer; the
+      connection is dropped, which stops the generation on the server
+
+Usage:
+    client = InferenceClient(HF_INFERENCE_URL.format(repo_id="tiiuae/falcon-7b-instruct"), token)
+    chat = ChatSession(client, prompt_template)
+    answer = await chat.ask("What is a vector database?", on_token=print_token)
+"""
+
+import asyncio
+import json
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple, Optional
+
+import aiohttp
+
+HF_INFERENCE_URL = "https://api-inference.huggingface.co/models/{repo_id}"
+
+
+class InferenceError(RuntimeError):
+    """the endpoint answered with an error"""
+
+
+class InferenceClient:
+    """async client for a text generation endpoint, see module docstring
+
+    The aiohttp session is created on first use, in the running event loop.
+
+    Args:
+        url: the model's endpoint, e.g. HF_INFERENCE_URL.format(repo_id=...)
+        token: API token, None for a local endpoint
+        max_connections: max connections to the endpoint, shared by all
+            sessions; a streamed answer holds one until it is done, so this
+            caps the answers generated at the same time (0: no limit)
+        read_timeout: max seconds to wait for the next token
+        parameters: default generation parameters, e.g. max_new_tokens
+    """
+
+    def __init__(
+        self,
+        url: str,
+        token: Optional[str] = None,
+        max_connections: int = 0,
+        read_timeout: float = 120,
+        **parameters,
+    ):
+        self.url = url
+        self.token = token
+        self.max_connections = max_connections
+        self.read_timeout = read_timeout
+        self.parameters = parameters
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.requests = 0
+        self.active = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=self.read_timeout),
+            )
+        return self._session
+
+    async def stream(self, prompt: str, **parameters) -> AsyncIterator[str]:
+        """the answer to prompt, token by token"""
+        payload = {"inputs": prompt, "parameters": {**self.parameters, **parameters}, "stream": True}
+        self.requests += 1
+        self.active += 1
+        try:
+            async with self._get_session().post(self.url, json=payload) as response:
+                if response.status != 200:
+                    raise InferenceError(f"{response.status}: {await response.text()}")
+                async for line in response.content:
+                    if not line.startswith(b"data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    if "error" in event:
+                        raise InferenceError(event["error"])
+                    token = event["token"]
+                    if not token.get("special"):
+                        yield token["text"]
+        finally:
+            self.active -= 1
+
+    async def generate(self, prompt: str, **parameters) -> str:
+        return "".join([token async for token in self.stream(prompt, **parameters)])
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class Answer(NamedTuple):
+    text: str
+    interrupted: bool  # cancelled by a newer message (or cancel())
+    time_to_first_token: Optional[float]
+    elapsed: float
+
+
+class ChatSession:
+    """one user's chat, answers streamed through a shared InferenceClient
+
+    Args:
+        client: the shared InferenceClient
+        prompt: PromptTemplate with a "question" variable, and a "history"
+            variable when there is a memory
+        memory: conversation_memory.ConversationMemory, None for no memory
+    """
+
+    def __init__(self, client: InferenceClient, prompt, memory=None):
+        self.client = client
+        self.prompt = prompt
+        self.memory = memory
+        self._task: Optional[asyncio.Task] = None
+
+    def cancel(self) -> bool:
+        """stop the answer being generated, if any"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            return True
+        return False
+
+    async def ask(
+        self, question: str, on_token: Optional[Callable[[str], Awaitable]] = None
+    ) -> Answer:
+        """answer question, passing each token to on_token as it arrives;
+        an answer still being generated for this session is cancelled"""
+        self.cancel()
+        start = time.perf_counter()
+        tokens, first_token_at = [], None
+        if self.memory is not None:
+            prompt = self.prompt.format(question=question, history=self.memory.history())
+        else:
+            prompt = self.prompt.format(question=question)
+
+        async def generate():
+            nonlocal first_token_at
+            # aclosing: the request is closed right away when cancelled
+            async with aclosing(self.client.stream(prompt)) as stream:
+                async for token in stream:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    tokens.append(token)
+                    if on_token is not None:
+                        await on_token(token)
+
+        task = self._task = asyncio.create_task(generate())
+        interrupted = False
+        try:
+            await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # ask() itself was cancelled, not just the generation
+                task.cancel()
+                raise
+            interrupted = True
+        if self.memory is not None and not interrupted:
+            self.memory.add_turn(question, "".join(tokens))
+        return Answer(
+            "".join(tokens),
+            interrupted,
+            None if first_token_at is None else first_token_at - start,
+            time.perf_counter() - start,
+        )
@@ -1,14 +1,19 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.tools import Tool
 from langchain.agents import create_react_agent, AgentExecutor
 from langchain import hub
 
+# model_factory.py is shared by all the scripts, in the repository root
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from model_factory import get_model
+
 
 def lookup(name: str) -> str:
     """lookup the LinkedIn profile URL for a given name
@@ -25,8 +30,9 @@ def lookup(name: str) -> str:
     # return "https://www.linkedin.com/in/eden-marco"
 
     # create our LLM
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
+    llm = get_model(
+        "gemini",
+        "gemini-2.0-flash",
         temperature=0,
         max_tokens=None,
         timeout=None,
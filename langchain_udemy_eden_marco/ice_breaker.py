@@ -1,14 +1,19 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.markdown import Markdown
 
 from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 # my local packages
 from third_party.linkedin import scrape_linkedin_profile
 
+# model_factory.py is shared by all the scripts, in the repository root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from model_factory import get_model
+
 load_dotenv()
 
 if __name__ == "__main__":
@@ -32,8 +37,9 @@ if __name__ == "__main__":
     )
 
     # create our LLM
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
+    llm = get_model(
+        "gemini",
+        "gemini-2.0-flash",
         temperature=0,
         max_tokens=None,
         timeout=None,
@@ -1,20 +1,86 @@
 """
 llama2_app1.py - create blogs using locally downloaded LLama2 model
+
+The model is loaded once per process & shared by all sessions (see
+local_models.py). Set LLAMA_WORKER=1 to run it in a separate worker process,
+or LLAMA_MAX_CONCURRENCY=n to load n instances of it (sharing the weights &
+the cores) that generate n blogs at a time.
+Requests from all sessions go through one queue (see llm_scheduler.py), so
+concurrent users don't slow each other down, identical requests share one
+answer and shorter blogs are served first. The blog is streamed into the
+page as it is generated, with a token budget derived from the number of words
+asked for; generation stops once those are written & the sentence is done
+(see word_budget.py).
 """
+import os
+from contextlib import closing
+
 import streamlit as st
 from langchain.prompts import PromptTemplate
-from langchain.llms import CTransformers
+
+from llm_scheduler import GenerationScheduler
+from local_models import ModelRegistry, ModelWorker, WorkerLLM, count_tokens, load_tokenizer
+from word_budget import token_budget, until_word_target
+
+LOCAL_LLM_PATH = "models/llama-2-7b-chat.ggmlv3.q8_0.bin"
+USE_WORKER = os.environ.get("LLAMA_WORKER", "0") == "1"
+# generations running at the same time, each on its own instance of the
+# model (an instance has one context) - always 1 with the worker
+MAX_CONCURRENCY = 1 if USE_WORKER else int(os.environ.get("LLAMA_MAX_CONCURRENCY", "1"))
+# max_new_tokens is the default, each request gets a budget for its words;
+# the context must fit the prompt & the longest blog (ctransformers: 512)
+LLM_CONFIG = {
+    "max_new_tokens": 256,
+    "temperature": 0,
+    "context_length": 2048,
+    # the cores are shared out between the instances
+    "threads": max(1, (os.cpu_count() or 1) // MAX_CONCURRENCY),
+}
+# in worker mode tokens are counted here, with the Llama 2 tokenizer (a hub
+# repo or a tokenizer.json), so counting doesn't wait for the worker
+LLAMA_TOKENIZER = os.environ.get("LLAMA_TOKENIZER", "hf-internal-testing/llama-tokenizer")
+
+
+@st.cache_resource
+def get_model_registry():
+    return ModelRegistry()
+
+
+@st.cache_resource
+def get_model_worker():
+    return ModelWorker(LOCAL_LLM_PATH, "llama", LLM_CONFIG)
+
+
+@st.cache_resource
+def get_tokenizer():
+    try:
+        return load_tokenizer(LLAMA_TOKENIZER)
+    except Exception as e:
+        # tokenizers isn't installed, or the hub can't be reached: the
+        # worker counts the tokens
+        print(f"Could not load tokenizer {LLAMA_TOKENIZER}: {e}")
+        return None
+
+
+def get_llms():
+    """the local Llama2 model, downloaded into the models directory - one
+    instance per generation running at a time"""
+    if USE_WORKER:
+        return [WorkerLLM(worker=get_model_worker(), tokenizer=get_tokenizer())]
+    registry = get_model_registry()
+    return [registry.get(LOCAL_LLM_PATH, "llama", LLM_CONFIG, instance=i) for i in range(MAX_CONCURRENCY)]
+
+
+@st.cache_resource
+def get_scheduler():
+    return GenerationScheduler(get_llms())
 
 
 # function to get response from local LLama2 model
 def getLlamaResponse(blog_topic, num_words, target_audience):
-    """call the local Llama2 model, downloaded into the models directory"""
-    local_llm_path = "models/llama-2-7b-chat.ggmlv3.q8_0.bin"
-    llm = CTransformers(
-        model=local_llm_path,
-        model_type="llama",
-        config={"max_new_tokens": 256, "temperature": 0},
-    )
+    """call the local Llama2 model, loaded once & shared by all sessions,
+    yields the blog token by token"""
+    scheduler = get_scheduler()
 
     # define the prompt template
     template = """
@@ -26,13 +92,27 @@ def getLlamaResponse(blog_topic, num_words, target_audience):
         template=template,
     )
 
-    # generate response from local llm
-    response = llm(
-        prompt.format(
-            blog_topic=blog_topic, num_words=num_words, target_audience=target_audience
-        )
+    text = prompt.format(
+        blog_topic=blog_topic, num_words=num_words, target_audience=target_audience
     )
-    return response
+    target_words = int(num_words) if num_words.strip().isdigit() else None
+    if target_words:
+        max_tokens = LLM_CONFIG["context_length"] - count_tokens(scheduler.llm, text)
+        max_new_tokens = token_budget(scheduler.llm, target_words, max_tokens=max_tokens)
+    else:
+        max_new_tokens = LLM_CONFIG["max_new_tokens"]
+
+    # generate response from local llm, shorter blogs are served first
+    ticket = scheduler.submit(text, priority=max_new_tokens, max_new_tokens=max_new_tokens)
+    try:
+        tokens = ticket.stream()
+        if target_words:
+            tokens = until_word_target(tokens, target_words)
+        yield from tokens
+    finally:
+        # closed early (see below): don't keep generating an answer nobody
+        # will see - in worker mode the worker stops too
+        ticket.cancel()
 
 
 # code entry point
@@ -57,7 +137,11 @@ with col2:
 submit = st.button("Generate")
 
 if submit:
-    st.write(getLlamaResponse(blog_topic, num_words, target_audience))
+    # a rerun (e.g. the user clicked again) is raised by the next st.* call,
+    # i.e. when write_stream writes the next token; closing the generator
+    # then cancels its ticket right away instead of whenever it is collected
+    with closing(getLlamaResponse(blog_topic, num_words, target_audience)) as blog:
+        st.write_stream(blog)
     # st.write(
     #     f"Will generate a blog about '{blog_topic}' of '{num_words}' words for '{target_audience}'"
     # )
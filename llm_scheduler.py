@@ -0,0 +1,253 @@
+"""
+llm_scheduler.py - queue, coalesce & prioritize requests to a local model
+
+A local model is CPU bound: when every Streamlit session calls it at the same
+time, the requests fight over the same cores and they all finish late.
+GenerationScheduler puts a queue in front of the model:
+    * at most one request runs on a model instance at a time - an instance
+      has one context (KV cache), two generations on it corrupt each other.
+      To run requests in parallel, give it one instance per request (e.g.
+      ModelRegistry.get(..., instance=i)), each with its share of the cores
+      as its threads
+    * waiting requests are served by priority (lower first), then in order
+    * identical requests (same prompt & parameters) that are waiting or
+      running are coalesced: they share one generation
+    * a request nobody is waiting for any more (cancelled, or its stream
+      was abandoned) is dropped from the queue, or stopped between tokens
+      (with a WorkerLLM, in the worker process too)
+    * queue depth, wait times etc. are available from stats
+
+Usage:
+    scheduler = GenerationScheduler(llm)  # or GenerationScheduler([llm1, llm2])
+    ticket = scheduler.submit(prompt, priority=1)
+    for token in ticket.stream():
+        ...
+    # or: text = ticket.result()
+"""
+
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Iterator, Optional
+
+from local_models import stream_tokens
+
+
+class CancelledError(Exception):
+    """the request was cancelled before it finished"""
+
+
+class _Job:
+    """one generation, shared by all the tickets of identical requests"""
+
+    def __init__(self, key, prompt, kwargs, priority):
+        self.key = key
+        self.prompt = prompt
+        self.kwargs = kwargs
+        self.priority = priority
+        self.tokens = []
+        self.subscribers = 0
+        self.state = "queued"  # -> running -> done | failed | cancelled
+        self.error = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.changed = threading.Condition()
+
+    @property
+    def finished_or_cancelled(self):
+        return self.state in ("done", "failed", "cancelled")
+
+
+class Ticket:
+    """handle on a submitted request"""
+
+    def __init__(self, scheduler, job):
+        self._scheduler = scheduler
+        self._job = job
+        self._cancelled = False
+
+    @property
+    def state(self):
+        return "cancelled" if self._cancelled else self._job.state
+
+    def stream(self, timeout: Optional[float] = None) -> Iterator[str]:
+        """tokens as they are generated (from the start, also when joining a
+        generation that is already running); stopping early cancels the ticket"""
+        job, position = self._job, 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                with job.changed:
+                    while position == len(job.tokens) and not job.finished_or_cancelled:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise TimeoutError("no answer in time")
+                        job.changed.wait(remaining)
+                    tokens = job.tokens[position:]
+                    state = job.state
+                position += len(tokens)
+                yield from tokens
+                if not tokens and state != "running" and state != "queued":
+                    break
+            if state == "failed":
+                raise job.error
+            if state == "cancelled" or self._cancelled:
+                raise CancelledError("request cancelled")
+        finally:
+            if job.state != "done":
+                self.cancel()
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        return "".join(self.stream(timeout))
+
+    def cancel(self):
+        """stop waiting for the answer; the generation is dropped once no
+        ticket waits for it any more"""
+        if not self._cancelled:
+            self._cancelled = True
+            self._scheduler._unsubscribe(self._job)
+
+
+class GenerationScheduler:
+    """see module docstring
+
+    Args:
+        llm: the (local) LangChain LLM, e.g. from local_models.ModelRegistry,
+            or a list of instances of it - one per generation running at a time
+        max_concurrency: max generations running at the same time, by
+            default (& at most) the number of instances
+        metrics_window: number of recent requests the wait time stats cover
+    """
+
+    def __init__(self, llm, max_concurrency: Optional[int] = None, metrics_window: int = 1000):
+        llms = list(llm) if isinstance(llm, (list, tuple)) else [llm]
+        if max_concurrency is not None and max_concurrency > len(llms):
+            raise ValueError(
+                f"max_concurrency {max_concurrency} needs as many model instances, got {len(llms)}"
+            )
+        # tokens are counted etc. with the first one
+        self.llm = llms[0]
+        self.max_concurrency = max_concurrency or len(llms)
+        self._queue = []  # heap of (priority, seq, job)
+        self._seq = itertools.count()
+        self._jobs = {}  # key -> job, for queued & running jobs
+        self._lock = threading.Condition()
+        self._running = 0
+        self._counts = {"submitted": 0, "coalesced": 0, "completed": 0, "cancelled": 0, "failed": 0}
+        self._wait_times = deque(maxlen=metrics_window)
+        self._run_times = deque(maxlen=metrics_window)
+        # each worker thread generates with its own instance
+        self._workers = [
+            threading.Thread(target=self._work, args=(instance,), daemon=True)
+            for instance in llms[: self.max_concurrency]
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, prompt: str, priority: int = 0, **kwargs) -> Ticket:
+        """queue a request, kwargs (e.g. max_new_tokens) go to the model"""
+        key = json.dumps([prompt, kwargs], sort_keys=True)
+        with self._lock:
+            self._counts["submitted"] += 1
+            job = self._jobs.get(key)
+            # a running job that was just cancelled can't be joined any more
+            if job is not None and job.state != "cancelled":
+                self._counts["coalesced"] += 1
+                if job.state == "queued" and priority < job.priority:
+                    # re-queued at the higher priority, the old entry is skipped
+                    job.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._seq), job))
+            else:
+                job = _Job(key, prompt, kwargs, priority)
+                self._jobs[key] = job
+                heapq.heappush(self._queue, (priority, next(self._seq), job))
+                self._lock.notify()
+            job.subscribers += 1
+        return Ticket(self, job)
+
+    def _unsubscribe(self, job):
+        with self._lock:
+            job.subscribers -= 1
+            if job.subscribers > 0 or job.finished_or_cancelled:
+                return
+            if job.state == "queued":
+                # dropped from the queue when a worker pops it
+                self._finish(job, "cancelled")
+            else:
+                # the worker stops generating before the next token
+                job.state = "cancelled"
+
+    def _finish(self, job, state, error=None):
+        """called with self._lock held"""
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        self._counts["completed" if state == "done" else state] += 1
+        with job.changed:
+            job.state = state
+            job.error = error
+            job.finished = time.monotonic()
+            job.changed.notify_all()
+
+    def _next_job(self):
+        with self._lock:
+            while True:
+                while self._queue:
+                    priority, _, job = heapq.heappop(self._queue)
+                    if job.state == "queued" and priority == job.priority:
+                        job.state = "running"
+                        job.started = time.monotonic()
+                        self._running += 1
+                        self._wait_times.append(job.started - job.submitted)
+                        return job
+                self._lock.wait()
+
+    def _work(self, llm):
+        while True:
+            job = self._next_job()
+            state, error = "done", None
+            try:
+                tokens = stream_tokens(llm, job.prompt, **job.kwargs)
+                for token in tokens:
+                    if job.state == "cancelled":
+                        tokens.close()
+                        state = "cancelled"
+                        break
+                    with job.changed:
+                        job.tokens.append(token)
+                        job.changed.notify_all()
+            except Exception as e:
+                state, error = "failed", e
+            with self._lock:
+                self._running -= 1
+                self._run_times.append(time.monotonic() - job.started)
+                if job.state == "cancelled":
+                    state = "cancelled"
+                self._finish(job, state, error)
+
+    @property
+    def stats(self) -> dict:
+        """queue depth, running requests, counters & wait times (seconds)"""
+
+        def percentile(values, p):
+            if not values:
+                return 0.0
+            values = sorted(values)
+            return values[min(len(values) - 1, int(len(values) * p))]
+
+        with self._lock:
+            wait_times, run_times = list(self._wait_times), list(self._run_times)
+            queued = sum(1 for job in self._jobs.values() if job.state == "queued")
+            return {
+                "queue_depth": queued,
+                "running": self._running,
+                "max_concurrency": self.max_concurrency,
+                **self._counts,
+                "wait_p50": percentile(wait_times, 0.5),
+                "wait_p95": percentile(wait_times, 0.95),
+                "wait_max": max(wait_times, default=0.0),
+                "run_mean": sum(run_times) / len(run_times) if run_times else 0.0,
+            }
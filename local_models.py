@@ -0,0 +1,362 @@
+"""
+local_models.py - load local (GGML) models once per process, or in a worker
+
+llama2_app1.py used to create CTransformers(...) for every click of
+"Generate", i.e. re-read a 7 GB weights file each time. ModelRegistry loads
+each model once per process - its weights memory-mapped (mmap), so pages
+come from the OS page cache and are shared with other processes - runs a
+short warm-up prompt, and hands the same instance to every caller (e.g. to
+all Streamlit sessions, via st.cache_resource).
+
+ModelWorker instead loads the model in a dedicated worker process, which the
+UI talks to over multiprocessing queues; WorkerLLM wraps it as a LangChain
+LLM. A request whose stream is closed early is cancelled in the worker too,
+which stops generating before its next token. The UI process then stays
+small & responsive, and the model survives Streamlit script reruns & code
+reloads. Give WorkerLLM a tokenizer (see load_tokenizer()) to count tokens
+in the UI process, instead of queueing behind other users' generations in
+the worker.
+
+Usage:
+    llm = ModelRegistry().get("models/llama-2-7b-chat.ggmlv3.q8_0.bin", "llama")
+    # or
+    llm = WorkerLLM(
+        worker=ModelWorker("models/llama-2-7b-chat.ggmlv3.q8_0.bin"),
+        tokenizer=load_tokenizer("hf-internal-testing/llama-tokenizer"),
+    )
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+WARMUP_PROMPT = "Hello"
+
+
+def rss_mb() -> float:
+    """current resident memory (RSS) of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        pass
+    if resource is None:
+        return float("nan")
+    # no /proc (e.g. macOS): fall back to the peak RSS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (2**20 if sys.platform == "darwin" else 1024)
+
+
+def load_ctransformers(model: str, model_type: str, config: dict):
+    """default loader: a LangChain CTransformers model, weights memory-mapped"""
+    from langchain.llms import CTransformers
+
+    return CTransformers(model=model, model_type=model_type, config={"mmap": True, **config})
+
+
+def load_tokenizer(name: str) -> Callable[[str], List[int]]:
+    """the tokenizer name (a Hugging Face hub repo or a tokenizer.json file)
+    as a callable(text) -> token ids, without loading any model weights"""
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_file(name) if os.path.isfile(name) else Tokenizer.from_pretrained(name)
+    return lambda text: tokenizer.encode(text, add_special_tokens=False).ids
+
+
+def stream_tokens(llm, prompt: str, **kwargs) -> Iterator[str]:
+    """generate tokens one by one, kwargs (e.g. max_new_tokens) are passed on
+    to the ctransformers model where there is one"""
+    client = getattr(llm, "client", None)
+    if client is not None:
+        yield from client(prompt, stream=True, **kwargs)
+    else:
+        for chunk in llm.stream(prompt, **kwargs):
+            yield chunk if isinstance(chunk, str) else chunk.text
+
+
+def count_tokens(llm, text: str) -> int:
+    """length of text in the model's tokens: the ctransformers tokenizer where
+    there is one, else the LLM's get_num_tokens()"""
+    client = getattr(llm, "client", None)
+    if client is not None and hasattr(client, "tokenize"):
+        return len(client.tokenize(text))
+    return llm.get_num_tokens(text)
+
+
+class ModelRegistry:
+    """process wide cache of loaded local models
+
+    Args:
+        loader: callable(model, model_type, config) returning a LangChain LLM,
+            load_ctransformers() by default
+        warmup_prompt: generated (1 token) right after loading, None to skip
+    """
+
+    def __init__(self, loader: Optional[Callable] = None, warmup_prompt: Optional[str] = WARMUP_PROMPT):
+        self.loader = loader or load_ctransformers
+        self.warmup_prompt = warmup_prompt
+        self._models: Dict[tuple, Any] = {}
+        self._stats: Dict[tuple, dict] = {}
+        self._locks: Dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str, model_type: str = "llama", config: Optional[dict] = None, instance: int = 0):
+        """the loaded model, loading (& warming up) it on first use - instance
+        n > 0 is another copy of it, with a context (KV cache) of its own to
+        generate in parallel (memory-mapped weights are shared)"""
+        config = config or {}
+        key = (model, model_type, json.dumps(config, sort_keys=True), instance)
+        llm = self._models.get(key)
+        if llm is not None:
+            return llm
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        # one lock per model: concurrent sessions wait for a single load
+        with key_lock:
+            if key not in self._models:
+                rss_before = rss_mb()
+                start = time.perf_counter()
+                llm = self.loader(model, model_type, config)
+                load_time = time.perf_counter() - start
+                warmup_time = None
+                if self.warmup_prompt:
+                    start = time.perf_counter()
+                    tokens = stream_tokens(llm, self.warmup_prompt, max_new_tokens=1)
+                    next(tokens, None)
+                    tokens.close()
+                    warmup_time = time.perf_counter() - start
+                self._stats[key] = {
+                    "model": model,
+                    "load_time": load_time,
+                    "warmup_time": warmup_time,
+                    "rss_mb": rss_mb() - rss_before,
+                }
+                self._models[key] = llm
+        return self._models[key]
+
+    @property
+    def stats(self) -> List[dict]:
+        """load time, warm-up time & memory added, of each model loaded"""
+        return list(self._stats.values())
+
+
+def _worker_main(requests, responses, cancels, model, model_type, config, loader):
+    """worker process: load the model, then serve requests one at a time"""
+    registry = ModelRegistry(loader)
+    try:
+        llm = registry.get(model, model_type, config)
+    except Exception as e:
+        responses.put((None, "error", f"{type(e).__name__}: {e}"))
+        return
+    responses.put((None, "ready", {**registry.stats[0], "rss_total_mb": rss_mb()}))
+    cancelled = set()
+
+    def is_cancelled(request_id):
+        while True:
+            try:
+                cancelled.add(cancels.get_nowait())
+            except queue.Empty:
+                return request_id in cancelled
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, kind, prompt, kwargs = request
+        # requests are served in order, cancels of earlier ones are stale
+        cancelled = {i for i in cancelled if i >= request_id}
+        if kind == "stats":
+            responses.put((request_id, "done", {**registry.stats[0], "rss_total_mb": rss_mb()}))
+            continue
+        if kind == "count_tokens":
+            try:
+                responses.put((request_id, "done", count_tokens(llm, prompt)))
+            except Exception as e:
+                responses.put((request_id, "error", f"{type(e).__name__}: {e}"))
+            continue
+        if is_cancelled(request_id):
+            responses.put((request_id, "cancelled", None))
+            continue
+        try:
+            tokens = stream_tokens(llm, prompt, **kwargs)
+            for token in tokens:
+                responses.put((request_id, "token", token))
+                if is_cancelled(request_id):
+                    tokens.close()
+                    responses.put((request_id, "cancelled", None))
+                    break
+            else:
+                responses.put((request_id, "done", None))
+        except Exception as e:
+            responses.put((request_id, "error", f"{type(e).__name__}: {e}"))
+
+
+class ModelWorker:
+    """a local model running in its own process, see module docstring
+
+    Requests are answered one at a time (in the order they arrive), tokens
+    are sent back as they are generated.
+
+    Args:
+        model, model_type, config: as for ModelRegistry.get()
+        loader: as for ModelRegistry, must be picklable (a module level function)
+        start_timeout: max seconds to wait for the model to load
+    """
+
+    def __init__(
+        self,
+        model: str,
+        model_type: str = "llama",
+        config: Optional[dict] = None,
+        loader: Optional[Callable] = None,
+        start_timeout: float = 600,
+    ):
+        # spawn, not fork: forking a process with (Streamlit's) threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._requests = context.Queue()
+        self._responses = context.Queue()
+        # ids of requests nobody waits for any more, checked between tokens
+        self._cancels = context.Queue()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(self._requests, self._responses, self._cancels, model, model_type, config or {}, loader),
+            daemon=True,
+        )
+        self.process.start()
+        request_id, kind, payload = self._responses.get(timeout=start_timeout)
+        if kind == "error":
+            self.process.join()
+            raise RuntimeError(f"Could not load {model}: {payload}")
+        self.model = model
+        self.load_stats = payload
+        self._ids = itertools.count()
+        self._pending: Dict[int, queue.Queue] = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_responses, daemon=True)
+        self._reader.start()
+
+    def _read_responses(self):
+        """hand each response to the request it belongs to"""
+        while True:
+            message = self._responses.get()
+            if message is None:
+                break
+            request_id, kind, payload = message
+            with self._lock:
+                pending = self._pending.get(request_id)
+            if pending is not None:
+                pending.put((kind, payload))
+
+    def _request(self, kind, prompt=None, **kwargs) -> Iterator:
+        pending = queue.Queue()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = pending
+            # ids reach the worker in order, it relies on that to drop stale cancels
+            self._requests.put((request_id, kind, prompt, kwargs))
+        finished = False
+        try:
+            while True:
+                kind, payload = pending.get()
+                if kind == "error":
+                    finished = True
+                    raise RuntimeError(payload)
+                yield kind, payload
+                if kind == "done":
+                    finished = True
+                    return
+        finally:
+            with self._lock:
+                del self._pending[request_id]
+            if not finished:
+                # closed early (e.g. the scheduler cancelled it): tell the
+                # worker to stop generating, or not to start
+                self._cancels.put(request_id)
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        for kind, payload in self._request("generate", prompt, **kwargs):
+            if kind == "token":
+                yield payload
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        return "".join(self.stream(prompt, **kwargs))
+
+    def stats(self) -> dict:
+        """load stats & current RSS of the worker process"""
+        for kind, payload in self._request("stats"):
+            if kind == "done":
+                return payload
+
+    def count_tokens(self, text: str) -> int:
+        for kind, payload in self._request("count_tokens", text):
+            if kind == "done":
+                return payload
+
+    def close(self):
+        self._requests.put(None)
+        self._responses.put(None)
+        self.process.join(timeout=10)
+
+
+class WorkerLLM(LLM):
+    """LangChain LLM answering through a ModelWorker
+
+    tokenizer: callable(text) -> tokens of the model's tokenizer, used in
+    this process; without one, tokens are counted by the worker (in turn with
+    the generations)
+    """
+
+    worker: Any
+    tokenizer: Optional[Callable[[str], List[int]]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-worker"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.worker.model}
+
+    def get_num_tokens(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return len(self.tokenizer(text))
+        return self.worker.count_tokens(text)
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        if stop:
+            kwargs["stop"] = stop
+        for token in self.worker.stream(prompt, **kwargs):
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,155 @@
+"""
+menu_parser.py - safe, tolerant parsing of LLM generated menus
+
+restaurants.py used to eval() the menu the LLM returned - unsafe (it runs
+whatever the model wrote) and brittle (one missing quote or a truncated answer
+and the whole two-call chain has to run again). parse_menu() never executes
+anything and recovers as many (item, price) pairs as it can from:
+    * the tuple format asked for in the prompt: [(item, price), ...]
+      - with or without quotes, truncated, missing brackets etc.
+    * JSON, as asked for by MENU_JSON_INSTRUCTIONS (see MENU_JSON_SCHEMA)
+      - with code fences, trailing commas, or truncated
+    * plain lists, e.g. "1. Paneer Tikka - $12.99"
+MenuStreamParser does the same for the tuple format incrementally, yielding
+items as soon as they are complete while the output is still being generated.
+"""
+
+import json
+import re
+from typing import List, Tuple
+
+MenuItem = Tuple[str, str]
+
+# JSON schema of the menu, for the JSON mode of the menu prompt
+MENU_JSON_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"item": {"type": "string"}, "price": {"type": "string"}},
+        "required": ["item", "price"],
+    },
+}
+MENU_JSON_INSTRUCTIONS = (
+    "Return ONLY a JSON array matching this JSON schema, no other text: "
+    + json.dumps(MENU_JSON_SCHEMA)
+)
+
+_QUOTED = r'"(?:[^"\\]|\\.)*"' + r"|'.*?'(?=\s*,)"
+# a tuple ends with ")" - or, if that went missing, where the next one starts
+TUPLE_RE = re.compile(
+    r"\(\s*(?P<item>" + _QUOTED + r"|[^,()]+?)\s*,\s*"
+    r"(?P<price>\"[^\"]*\"|'[^']*'|[^()]+?)\s*(?:\)|(?=,\s*\())"
+)
+# a tuple cut off by the end of the output, e.g. `("Pho", "$9.50"`
+PARTIAL_TUPLE_RE = re.compile(
+    r"\(\s*(?P<item>" + _QUOTED + r"|[^,()]+?)\s*,\s*"
+    r"(?P<price>\"[^\"]+\"|'[^']+'|[^()\"'\s][^()]*?)\s*[\]]*\s*$"
+)
+# JSON objects & [item, price] pairs, found wherever they are in the output
+JSON_OBJECT_RE = re.compile(r"\{[^{}]*\}")
+JSON_PAIR_RE = re.compile(
+    r'\[\s*("(?:[^"\\]|\\.)*")\s*,\s*("(?:[^"\\]|\\.)*"|\d[\d.]*)\s*\]'
+)
+LINE_RE = re.compile(
+    r"^\s*(?:[-*•]|\d+[.)])?\s*(?P<item>.+?)\s*(?:[-–:]|\.{2,})\s*"
+    r"(?P<price>[$€£₹]?\s?\d[\d,.]*(?:\s?[$€£₹])?)\s*$"
+)
+FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+class MenuParseError(ValueError):
+    """no menu items could be recovered from the LLM output"""
+
+
+def _clean(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        value = value[1:-1]
+    return value.strip().strip("'\"").strip()
+
+
+class MenuStreamParser:
+    """incremental parser for the [(item, price), ...] format
+
+    Usage:
+        parser = MenuStreamParser()
+        for chunk in llm.stream(prompt):
+            for item, price in parser.feed(chunk):
+                ...
+        remaining = parser.close()   # repairs a truncated last tuple
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.items: List[MenuItem] = []
+
+    def feed(self, text: str) -> List[MenuItem]:
+        """add more output, returns items completed by it"""
+        self.buffer += text
+        new_items = []
+        for match in TUPLE_RE.finditer(self.buffer, self.pos):
+            item, price = _clean(match["item"]), _clean(match["price"])
+            if item and price:
+                new_items.append((item, price))
+            self.pos = match.end()
+        self.items.extend(new_items)
+        return new_items
+
+    def close(self) -> List[MenuItem]:
+        """end of output, returns the last item if only its ")" was missing"""
+        match = PARTIAL_TUPLE_RE.search(self.buffer, self.pos)
+        if match:
+            item, price = _clean(match["item"]), _clean(match["price"])
+            if item and price:
+                self.items.append((item, price))
+                return [(item, price)]
+        return []
+
+
+def _parse_json(text: str) -> List[MenuItem]:
+    """pick out every complete JSON object / pair in text, so that chatter
+    around the JSON, missing outer brackets or a truncated end don't matter"""
+    items = []
+    for match in JSON_OBJECT_RE.finditer(text):
+        try:
+            # trailing commas are a common mistake
+            entry = json.loads(re.sub(r",\s*}", "}", match.group()))
+        except json.JSONDecodeError:
+            continue
+        values = list(entry.values())
+        item = entry.get("item", entry.get("name", values[0] if values else ""))
+        price = entry.get("price", values[1] if len(values) > 1 else "")
+        if str(item).strip() and str(price).strip():
+            items.append((str(item).strip(), str(price).strip()))
+    if items:
+        return items
+    for match in JSON_PAIR_RE.finditer(text):
+        item, price = json.loads(match[1]), json.loads(match[2])
+        if str(item).strip() and str(price).strip():
+            items.append((str(item).strip(), str(price).strip()))
+    return items
+
+
+def parse_menu(text: str) -> List[MenuItem]:
+    """recover (item, price) pairs from LLM output, raises MenuParseError if
+    there are none"""
+    text = FENCE_RE.sub("", text.strip())
+    items = _parse_json(text)
+    if items:
+        return items
+
+    parser = MenuStreamParser()
+    parser.feed(text)
+    parser.close()
+    if parser.items:
+        return parser.items
+
+    items = []
+    for line in text.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            items.append((_clean(match["item"]), match["price"].strip()))
+    if items:
+        return items
+    raise MenuParseError(f"Could not find any menu items in: {text[:200]!r}")
@@ -0,0 +1,170 @@
+"""
+model_factory.py - one place to create the LLM clients of every script
+
+Each script used to import its provider's package at the top and build its
+own client at import time - for Streamlit apps on every rerun. get_model():
+    * imports only the package of the provider asked for, when it is first
+      asked for (importing all of langchain_openai, langchain_google_genai &
+      google.generativeai up front costs seconds)
+    * caches the clients by (provider, model, params): the next call - from
+      another script, Streamlit rerun or session - gets the same client
+    * shares one HTTP connection pool (httpx) between the OpenAI clients, so
+      connections to the API are kept alive & reused - except openai-llm: it
+      hands its http_client to its async client too, which needs an
+      httpx.AsyncClient, so it keeps a pool of its own
+
+Providers:
+    openai          langchain_openai.ChatOpenAI
+    openai-llm      langchain.llms.OpenAI (completions, used by the older scripts)
+    openai-client   openai.OpenAI, the raw client
+    gemini          langchain_google_genai.ChatGoogleGenerativeAI
+    genai           google.generativeai.GenerativeModel, the raw client
+LLM_TO_USE (e.g. in .env) picks the provider when none is given.
+
+get_module() gives the provider's module itself (imported & set up the same
+way), for the module level functions of raw clients, e.g. genai.list_models().
+
+Usage:
+    from model_factory import get_model
+    llm = get_model("openai-llm", temperature=0.7)
+    model = get_model()  # the LLM_TO_USE provider & its default model
+"""
+
+import importlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+DEFAULT_PROVIDER = "openai"
+
+
+class Provider(NamedTuple):
+    module: str
+    attr: str
+    default_model: Optional[str] = None  # None: the client's own default
+    model_param: str = "model"
+    # pass the shared (sync) httpx client as http_client - only for clients
+    # that don't also give it to an async client
+    shared_http_client: bool = False
+    setup: Optional[Callable] = None  # called with the module, once
+
+
+def _configure_genai(genai):
+    # as before: without GOOGLE_API_KEY, genai looks for other credentials
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+PROVIDERS: Dict[str, Provider] = {
+    "openai": Provider("langchain_openai", "ChatOpenAI", "gpt-4", shared_http_client=True),
+    "openai-llm": Provider("langchain.llms", "OpenAI", None, "model_name"),
+    "openai-client": Provider("openai", "OpenAI", None, shared_http_client=True),
+    "gemini": Provider("langchain_google_genai", "ChatGoogleGenerativeAI", "gemini-2.5-flash"),
+    "genai": Provider(
+        "google.generativeai", "GenerativeModel", "gemini-2.5-flash", "model_name", setup=_configure_genai
+    ),
+}
+
+
+class ModelFactory:
+    """creates & caches LLM clients, see module docstring
+
+    Args:
+        providers: name -> Provider, PROVIDERS by default
+        max_connections: size of the shared HTTP connection pool
+    """
+
+    def __init__(self, providers: Optional[Dict[str, Provider]] = None, max_connections: int = 100):
+        self.providers = dict(PROVIDERS if providers is None else providers)
+        self.max_connections = max_connections
+        self._clients = {}
+        self._modules = {}
+        self._http_client = None
+        self._lock = threading.RLock()
+        self.created = 0
+        self.hits = 0
+        self.import_times: Dict[str, float] = {}
+
+    def register(self, name: str, provider: Provider):
+        self.providers[name] = provider
+
+    def _spec(self, provider: Optional[str]):
+        """(name, Provider) of provider, LLM_TO_USE's if None"""
+        provider = provider or os.environ.get("LLM_TO_USE", DEFAULT_PROVIDER)
+        spec = self.providers.get(provider)
+        if spec is None:
+            raise ValueError(f"unknown provider {provider!r}, one of {sorted(self.providers)}")
+        return provider, spec
+
+    def _module(self, name: str, provider: Provider):
+        """the provider's module, imported (& set up) on first use"""
+        if name not in self._modules:
+            start = time.perf_counter()
+            module = importlib.import_module(provider.module)
+            if provider.setup is not None:
+                provider.setup(module)
+            self.import_times[name] = time.perf_counter() - start
+            self._modules[name] = module
+        return self._modules[name]
+
+    def http_client(self):
+        """the httpx client (& connection pool) shared by the OpenAI clients"""
+        with self._lock:
+            if self._http_client is None:
+                import httpx
+
+                self._http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=self.max_connections, keepalive_expiry=60),
+                    timeout=httpx.Timeout(600, connect=10),
+                )
+            return self._http_client
+
+    def module(self, provider: Optional[str] = None):
+        """the module of provider, imported & set up like for get()"""
+        provider, spec = self._spec(provider)
+        with self._lock:
+            return self._module(provider, spec)
+
+    def get(self, provider: Optional[str] = None, model: Optional[str] = None, **params):
+        """the client for provider & model, params go to its constructor"""
+        provider, spec = self._spec(provider)
+        model = model or spec.default_model
+        key = (provider, model, json.dumps(params, sort_keys=True, default=repr))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+            module = self._module(provider, spec)
+            kwargs = dict(params)
+            if model is not None:
+                kwargs[spec.model_param] = model
+            if spec.shared_http_client:
+                kwargs.setdefault("http_client", self.http_client())
+            client = self._clients[key] = getattr(module, spec.attr)(**kwargs)
+            self.created += 1
+            return client
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "created": self.created,
+            "hits": self.hits,
+            "import_times": dict(self.import_times),
+        }
+
+
+# shared by every script in the process
+default_factory = ModelFactory()
+
+
+def get_model(provider: Optional[str] = None, model: Optional[str] = None, **params):
+    """default_factory.get(), see ModelFactory.get()"""
+    return default_factory.get(provider, model, **params)
+
+
+def get_module(provider: Optional[str] = None):
+    """default_factory.module(), see ModelFactory.module()"""
+    return default_factory.module(provider)
@@ -5,7 +5,9 @@
 import os
 import pathlib
 from dotenv import load_dotenv
-import openai
+
+from completion_cache import CompletionCache
+from model_factory import get_model
 
 system_prompt = "You will be provided with a piece of Python code, and your task is to find and fix bugs in it."
 
@@ -28,14 +30,19 @@ for i in range(10):
 def main():
     # load environment variables from .env - this seems to create a problem with Streamlit reload
     load_dotenv()
-    response = openai.ChatCompletion.create(
+    # the same code gets the same fix, from the cache after the first run
+    cache = CompletionCache("completion_cache.db")
+    client = get_model("openai-client")
+    fixed_code = cache.chat_completion(
+        client.chat.completions.create,
         model="gpt-3.5-turbo",
+        temperature=0,
         messages=[
             {"role": "system", "content": f"{system_prompt}"},
             {"role": "user", "content": f"{code_to_debug}"},
         ],
     )
-    print(response["choices"][0]["message"]["content"])
+    print(fixed_code)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,20 @@
 """
 query_db.py - illustrates how you can use LangChain to enable an LLM
 to query a database
+
+Table listings & schema lookups by the agent are served from a schema cache
+(see schema_cache.py) and queries run through a pooled engine; results are
+streamed, cut down to a token budget & cached (see query_executor.py). Set DB_URI
+(e.g. sqlite:///chinook.db) to use another database than the one in config.ini
+
+Questions are first tried with a single SQL generating prompt (see
+sql_fast_path.py), the SQL agent only takes over when that fails.
+
+usage: python query_db.py [--serve [--host HOST] [--port PORT]] [--timeout SECS]
+    --serve runs an HTTP server for many concurrent users (query_db_server.py)
 """
+import argparse
+import asyncio
 import os
 import dotenv
 import pathlib
@@ -9,13 +22,15 @@ import urllib.parse
 
 # import psycopg2
 from configparser import ConfigParser
-from langchain.llms import OpenAI
-from langchain.sql_database import SQLDatabase
 from langchain.agents.agent_toolkits import SQLDatabaseToolkit
-from langchain.agents import AgentExecutor
 from langchain.agents import create_sql_agent
 from langchain.agents.agent_types import AgentType
 
+from model_factory import get_model
+from query_executor import QueryExecutor
+from schema_cache import CachedSQLDatabase, SchemaCache, create_pooled_engine
+from sql_fast_path import SQLFastPath
+
 
 def get_dbconnect_uri() -> str:
     parser = ConfigParser()
@@ -50,40 +65,74 @@ def get_dbconnect_uri() -> str:
     return connection_uri
 
 
-def chat_with_database(agent):
+async def achat_with_database(agent, timeout=120):
+    """interactive prompt loop over a build_fast_path() fast path - a
+    question that takes longer than timeout seconds is cancelled, including
+    the SQL query it is running"""
+    from query_db_server import QueryServer
+
+    # a one session server tracks the connections running the question's SQL
+    server = QueryServer(agent, engine=agent.db.schema_cache.engine, timeout=timeout)
+    session = server.create_session()
     print(
         "Chat with your database. Enter your prompt or type 'exit' (without quotes) to quit"
     )
 
     while True:
-        prompt = input("Prompt? ")
+        prompt = await asyncio.to_thread(input, "Prompt? ")
         if prompt.lower() == "exit":
             print("Thank you and Goodbye!")
             break
         else:
             try:
-                print(agent.run(prompt))
+                print((await server.ask(session, prompt))["answer"])
+            except asyncio.TimeoutError:
+                print(f"No answer after {timeout}s, question cancelled")
             except Exception as e:
                 print(e)
 
 
-def main():
-    dotenv.load_dotenv()
-    # db_connect_params = get_dbconnect_params()
-    # conn = psycopg2.connect(**db_connect_params)
-    db_conn_uri = get_dbconnect_uri()
-    # connect to database
-    db = SQLDatabase.from_uri(db_conn_uri)
+def build_fast_path(db_conn_uri, llm=None, verbose=True, schema_cache_path="schema_cache.json"):
+    """fast path + SQL agent over one pooled engine, schema cache & result
+    cache - shared by all users in server mode"""
+    # connect to database - schema metadata is cached in schema_cache.json
+    engine = create_pooled_engine(db_conn_uri)
+    schema_cache = SchemaCache(engine, schema_cache_path)
+    executor = QueryExecutor(engine, token_budget=1000, tables=lambda: schema_cache.tables)
+    db = CachedSQLDatabase(engine, schema_cache, executor=executor)
     # instantiate my llm
-    llm = OpenAI(temperature=0, verbose=True)
-    toolkit = SQLDatabaseToolkit(db=db, llm=OpenAI(temperature=0))
+    llm = llm or get_model("openai-llm", temperature=0, verbose=verbose)
+    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
     agent_executor = create_sql_agent(
         llm=llm,
         toolkit=toolkit,
-        verbose=True,
+        verbose=verbose,
         agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
     )
-    chat_with_database(agent_executor)
+    # agent_executor is only used for questions the fast path can't answer
+    return SQLFastPath(llm, db, agent=agent_executor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat with your database")
+    parser.add_argument(
+        "--serve", action="store_true", help="serve many users over HTTP, see query_db_server.py"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--timeout", type=float, default=120, help="max seconds per question")
+    args = parser.parse_args()
+
+    dotenv.load_dotenv()
+    # db_connect_params = get_dbconnect_params()
+    # conn = psycopg2.connect(**db_connect_params)
+    db_conn_uri = os.environ.get("DB_URI") or get_dbconnect_uri()
+    if args.serve:
+        from query_db_server import serve
+
+        serve(build_fast_path(db_conn_uri, verbose=False), args.host, args.port, args.timeout)
+    else:
+        asyncio.run(achat_with_database(build_fast_path(db_conn_uri), args.timeout))
 
 
 if __name__ == "__main__":
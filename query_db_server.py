@@ -0,0 +1,223 @@
+"""
+query_db_server.py - chat with your database, many users at a time, over HTTP
+
+achat_with_database() in query_db.py serves one user & one question at a
+time. QueryServer runs every question as an asyncio task over agent.arun()
+(or SQLFastPath.aanswer()), so sessions are served concurrently while all of
+them share one pooled engine, schema cache & result cache. A question that
+runs longer than the timeout, or that its session cancels, is cancelled -
+including the SQL query it is running, if any (sqlite3 interrupt() /
+psycopg2 cancel() on the connection).
+
+API (JSON):
+    POST   /sessions              -> {"session_id": ...}
+    POST   /sessions/{id}/ask     {"question": ...} -> {"answer": ..., "elapsed": ...}
+                                  409 if the session is busy, 504 on timeout,
+                                  499 if cancelled
+    POST   /sessions/{id}/cancel  cancel the question in flight
+    DELETE /sessions/{id}
+    GET    /stats
+
+usage: python query_db.py --serve [--host HOST] [--port PORT] [--timeout SECS]
+"""
+
+import asyncio
+import contextvars
+import time
+import uuid
+
+from aiohttp import web
+from sqlalchemy import event
+
+# session a question (and the SQL it runs, in worker threads) belongs to
+CURRENT_SESSION = contextvars.ContextVar("query_db_session", default=None)
+
+
+class SessionBusy(Exception):
+    """the session is answering another question"""
+
+
+class Session:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.task = None
+        self.cancelled = False
+        # raw DB-API connections running SQL for the current question
+        self.connections = set()
+        self.questions = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def busy(self):
+        return self.task is not None and not self.task.done()
+
+
+def _interrupt(dbapi_connection):
+    """abort the statement running on a raw DB-API connection, if we can"""
+    for name in ("interrupt", "cancel"):  # sqlite3, psycopg2
+        method = getattr(dbapi_connection, name, None)
+        if method is not None:
+            method()
+            return
+
+
+class QueryServer:
+    """see module docstring
+
+    Args:
+        agent: SQL agent or SQLFastPath, shared by all sessions
+        engine: SQLAlchemy engine the agent uses, to cancel running queries
+        timeout: max seconds per question
+        max_concurrency: max questions answered at the same time, others wait
+        session_ttl: idle seconds after which a session is dropped
+    """
+
+    def __init__(self, agent, engine=None, timeout=120, max_concurrency=32, session_ttl=30 * 60):
+        self.agent = agent
+        self.engine = engine
+        self.timeout = timeout
+        self.session_ttl = session_ttl
+        self.sessions = {}
+        self.counts = {"answered": 0, "timeouts": 0, "cancelled": 0, "errors": 0}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        if engine is not None:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+            event.listen(engine, "checkin", self._on_checkin)
+
+    # connection tracking, called by SQLAlchemy in whatever thread runs the SQL
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        session = CURRENT_SESSION.get()
+        if session is not None:
+            session.connections.add(conn.connection.dbapi_connection)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        for session in list(self.sessions.values()):
+            session.connections.discard(dbapi_connection)
+
+    def create_session(self):
+        now = time.monotonic()
+        for session in list(self.sessions.values()):
+            if not session.busy and now - session.last_used > self.session_ttl:
+                del self.sessions[session.id]
+        session = Session(uuid.uuid4().hex)
+        self.sessions[session.id] = session
+        return session
+
+    async def _answer(self, session, question):
+        CURRENT_SESSION.set(session)
+        async with self._semaphore:
+            if hasattr(self.agent, "aanswer"):
+                return await self.agent.aanswer(question)
+            return {"answer": await self.agent.arun(question)}
+
+    def cancel(self, session):
+        """cancel the question in flight & the SQL it is running"""
+        if session.busy:
+            session.cancelled = True
+            session.task.cancel()
+        for dbapi_connection in list(session.connections):
+            _interrupt(dbapi_connection)
+
+    async def ask(self, session, question):
+        """answer question, raises SessionBusy, asyncio.TimeoutError /
+        CancelledError"""
+        # no await before session.task is set, so a concurrent ask() on the
+        # same session sees it busy
+        if session.busy:
+            raise SessionBusy(session.id)
+        session.last_used = time.monotonic()
+        session.questions += 1
+        session.cancelled = False
+        session.task = asyncio.create_task(self._answer(session, question))
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(session.task, self.timeout)
+        except asyncio.TimeoutError:
+            self.cancel(session)
+            self.counts["timeouts"] += 1
+            raise
+        except asyncio.CancelledError:
+            if not session.cancelled:
+                raise  # the request itself went away
+            self.counts["cancelled"] += 1
+            raise
+        except Exception:
+            self.counts["errors"] += 1
+            raise
+        finally:
+            session.last_used = time.monotonic()
+        self.counts["answered"] += 1
+        return {**response, "elapsed": time.perf_counter() - start}
+
+    @property
+    def stats(self):
+        stats = {
+            "sessions": len(self.sessions),
+            "busy_sessions": sum(session.busy for session in self.sessions.values()),
+            **self.counts,
+        }
+        if self.engine is not None:
+            stats["pool"] = self.engine.pool.status()
+        return stats
+
+    # HTTP handlers
+    def _session(self, request):
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            raise web.HTTPNotFound(text="unknown session")
+        return session
+
+    async def handle_create(self, request):
+        return web.json_response({"session_id": self.create_session().id})
+
+    async def handle_ask(self, request):
+        session = self._session(request)
+        # the body first: the busy check in ask() must not be followed by an await
+        question = (await request.json()).get("question", "")
+        try:
+            return web.json_response(await self.ask(session, question))
+        except SessionBusy:
+            return web.json_response({"error": "session is busy"}, status=409)
+        except asyncio.TimeoutError:
+            return web.json_response({"error": f"no answer after {self.timeout}s"}, status=504)
+        except asyncio.CancelledError:
+            if not session.cancelled:
+                raise
+            return web.json_response({"error": "cancelled"}, status=499)
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_cancel(self, request):
+        session = self._session(request)
+        busy = session.busy
+        self.cancel(session)
+        return web.json_response({"cancelled": busy})
+
+    async def handle_delete(self, request):
+        session = self._session(request)
+        self.cancel(session)
+        del self.sessions[session.id]
+        return web.json_response({"deleted": session.id})
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats)
+
+
+def make_app(server: QueryServer) -> web.Application:
+    app = web.Application()
+    app.add_routes(
+        [
+            web.post("/sessions", server.handle_create),
+            web.post("/sessions/{session_id}/ask", server.handle_ask),
+            web.post("/sessions/{session_id}/cancel", server.handle_cancel),
+            web.delete("/sessions/{session_id}", server.handle_delete),
+            web.get("/stats", server.handle_stats),
+        ]
+    )
+    return app
+
+
+def serve(fast_path, host="127.0.0.1", port=8080, timeout=120):
+    """serve a query_db.build_fast_path() fast path until interrupted"""
+    server = QueryServer(fast_path, engine=fast_path.db.schema_cache.engine, timeout=timeout)
+    web.run_app(make_app(server), host=host, port=port)
@@ -0,0 +1,377 @@
+"""
+query_executor.py - streaming, token budgeted & cached execution of agent SQL
+
+SQLDatabase.run() fetches the whole result set and str()s it into the
+prompt: a `SELECT * FROM big_table` from the agent means millions of rows in
+memory and a prompt far larger than the LLM's context. QueryExecutor instead:
+    * streams rows through a server-side cursor (stream_results), so only a
+      buffer of rows is held in memory at any time
+    * renders rows, in the same format as SQLDatabase.run(), until a token
+      budget is used up, then appends a summary of the rest: row count &
+      per column stats (nulls, min, max, mean)
+    * caches rendered results by normalized SQL (not of SELECT ... FOR UPDATE
+      / FOR SHARE, which are run for their locks); a cached result is dropped
+      when a statement run through the executor writes to one of its tables,
+      when it expires (ttl) or on invalidate()
+
+Usage:
+    executor = QueryExecutor(engine, tables=lambda: schema_cache.tables)
+    print(executor.run("SELECT * FROM orders"))
+"""
+
+import decimal
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import text
+
+# statements starting with one of these return rows & don't change anything
+READ_KEYWORDS = {"select", "values", "show", "pragma", "describe"}
+# statements starting with one of these change data or schema
+WRITE_KEYWORDS = {
+    "insert", "update", "delete", "merge", "create", "drop", "alter", "truncate",
+    "replace", "grant", "revoke", "vacuum", "reindex",
+}
+# pragmas taking an argument in parentheses that only query, e.g.
+# PRAGMA table_info(t) - any other PRAGMA x(y) or PRAGMA x = y sets something
+QUERY_PRAGMAS = {
+    "table_info", "table_xinfo", "table_list", "index_info", "index_xinfo",
+    "index_list", "foreign_key_list", "foreign_key_check", "integrity_check",
+    "quick_check",
+}
+# words that may come before the statement's own keyword
+PREFIX_KEYWORDS = {"explain", "analyze", "analyse", "verbose", "query", "plan"}
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+WORD_RE = re.compile(r'"((?:[^"]|"")+)"|([A-Za-z_][\w$]*)')
+TOKEN_RE = re.compile(r'"(?:[^"]|"")+"|[A-Za-z_][\w$]*|[();]')
+# first word of a CTE's body: "name AS [NOT] [MATERIALIZED] (<word>"
+CTE_BODY_RE = re.compile(r"\bas\s+(?:not\s+)?(?:materialized\s+)?\(\s*([a-z_]\w*)")
+# tables named after these keywords, when the table names aren't known
+# "PRAGMA [schema.]name" followed by = or (
+PRAGMA_ARG_RE = re.compile(r"\bpragma\s+(?:[\w$]+\.)?([\w$]+)\s*([=(])")
+TABLE_REF_RE = re.compile(
+    r'\b(?:from|join|into|update|table)\s+((?:"[^"]+"|[\w$]+)(?:\.(?:"[^"]+"|[\w$]+))?)'
+)
+
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 characters per token
+    return max(1, len(text) // 4)
+
+
+def normalize_sql(sql: str) -> str:
+    """canonical form of a statement, used as cache key: comments, extra white
+    space & trailing ; removed, lower case except for string literals"""
+    def code(part):
+        return re.sub(r"\s+", " ", COMMENT_RE.sub(" ", part)).lower()
+
+    parts, last = [], 0
+    for match in LITERAL_RE.finditer(sql):
+        parts.append(code(sql[last : match.start()]))
+        parts.append(match.group())
+        last = match.end()
+    parts.append(code(sql[last:]))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _words(sql: str) -> List[str]:
+    """identifiers & keywords of a normalized statement, outside string literals"""
+    code = LITERAL_RE.sub("''", sql)
+    return [quoted or word for quoted, word in WORD_RE.findall(code)]
+
+
+def _statements(sql: str) -> List[List[str]]:
+    """unquoted words of each statement of a normalized sql, outside string
+    literals & parentheses - so not in sub-queries, function calls or CTE bodies"""
+    code = LITERAL_RE.sub("''", sql)
+    statements, words, depth = [], [], 0
+    for token in TOKEN_RE.findall(code):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth = max(depth - 1, 0)
+        elif token == ";":
+            if words:
+                statements.append(words)
+            words = []
+        elif depth == 0 and not token.startswith('"'):
+            words.append(token)
+    if words:
+        statements.append(words)
+    return statements
+
+
+def _statement_kind(words: List[str]) -> Optional[str]:
+    """the keyword saying what a statement does: its first word, after any
+    EXPLAIN [ANALYZE] or WITH ... AS (...) clauses"""
+    if words and words[0] == "with":
+        # the CTEs' bodies are in parentheses, the main statement follows them
+        words = [word for word in words if word in READ_KEYWORDS | WRITE_KEYWORDS]
+    words = [word for word in words if word not in PREFIX_KEYWORDS] or [None]
+    return words[0]
+
+
+def is_read_only(sql: str) -> bool:
+    """whether a normalized statement only reads: it's decided by what kind of
+    statement it is, so columns or functions named like keywords don't count"""
+    statements = _statements(sql)
+    for words in statements:
+        if _statement_kind(words) not in READ_KEYWORDS:
+            return False
+        # SELECT ... INTO creates a table
+        if words[0] == "select" and "into" in words:
+            return False
+    # PRAGMA journal_mode = WAL changes the database, PRAGMA journal_mode doesn't
+    if any(words[0] == "pragma" for words in statements):
+        code = LITERAL_RE.sub("''", sql)
+        for name, arg in PRAGMA_ARG_RE.findall(code):
+            if arg == "=" or name not in QUERY_PRAGMAS:
+                return False
+    # WITH x AS (DELETE ... RETURNING *) SELECT ... writes too
+    if any(words[0] == "with" for words in statements):
+        code = LITERAL_RE.sub("''", sql)
+        if any(word in WRITE_KEYWORDS for word in CTE_BODY_RE.findall(code)):
+            return False
+    return bool(statements)
+
+
+def locks_rows(sql: str) -> bool:
+    """whether a normalized statement locks the rows it reads (SELECT ... FOR
+    UPDATE / FOR [NO KEY | KEY] SHARE / LOCK IN SHARE MODE)"""
+    for words in _statements(sql):
+        for word, following in zip(words, words[1:]):
+            if word == "for" and following in ("update", "share", "no", "key"):
+                return True
+            if word == "lock" and following == "in":
+                return True
+    return False
+
+
+def referenced_tables(sql: str, known_tables: Optional[Iterable[str]] = None) -> set:
+    """(lower case) names of the tables a normalized statement reads or writes"""
+    if known_tables is not None:
+        known = {table.lower() for table in known_tables}
+        return known & {word.lower() for word in _words(sql)}
+    code = LITERAL_RE.sub("''", sql)
+    return {
+        name.split(".")[-1].strip('"').lower() for name in TABLE_REF_RE.findall(code)
+    }
+
+
+class ColumnStats:
+    """running stats of one column of a result set"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.total = 0
+        self.numeric = True
+        self.comparable = True
+
+    def add(self, value):
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if self.numeric:
+            if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+                self.total += value
+            else:
+                self.numeric = False
+        if self.comparable:
+            try:
+                if self.min is None or value < self.min:
+                    self.min = value
+                if self.max is None or value > self.max:
+                    self.max = value
+            except TypeError:
+                self.comparable = False
+
+    def summary(self, max_length=40) -> str:
+        parts = [f"{self.nulls} nulls"]
+        if self.comparable and self.min is not None:
+            parts.append(f"min {str(self.min)[:max_length]}")
+            parts.append(f"max {str(self.max)[:max_length]}")
+        values = self.count - self.nulls
+        if self.numeric and values:
+            parts.append(f"mean {float(self.total) / values:.4g}")
+        return f"{self.name}: " + ", ".join(parts)
+
+
+class QueryResult(NamedTuple):
+    text: str  # what the agent sees
+    rows_shown: int
+    row_count: int  # rows scanned, all of them if complete is True
+    complete: bool  # False if the scan stopped at max_scan_rows
+    tokens: int
+    elapsed: float  # seconds spent executing (not fetching from the cache)
+
+
+class QueryExecutor:
+    """see module docstring
+
+    Args:
+        engine: SQLAlchemy engine, see schema_cache.create_pooled_engine()
+        token_budget: max tokens of rows in a result, the summary comes on top
+        max_scan_rows: rows scanned to count & summarize a large result, beyond
+            that the row count is reported as a lower bound
+        max_entries: number of results cached, least recently used are evicted
+        ttl: seconds a cached result is used, in case the data is changed by
+            someone else (None = until invalidated)
+        tables: optional callable returning the table names of the database,
+            to find which tables a statement uses (e.g. SchemaCache.tables)
+        count_tokens: optional token counter, a ~4 chars/token estimate otherwise
+        fetch_size: rows fetched from the server-side cursor at a time
+        max_string_length: longer values are truncated, as by SQLDatabase
+    """
+
+    def __init__(
+        self,
+        engine,
+        token_budget: int = 1000,
+        max_scan_rows: int = 100_000,
+        max_entries: int = 256,
+        ttl: Optional[float] = 5 * 60,
+        tables: Optional[Callable[[], Iterable[str]]] = None,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        fetch_size: int = 1000,
+        max_string_length: int = 300,
+    ):
+        self.engine = engine
+        self.token_budget = token_budget
+        self.max_scan_rows = max_scan_rows
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tables = tables
+        self.count_tokens = count_tokens or _estimate_tokens
+        self.fetch_size = fetch_size
+        self.max_string_length = max_string_length
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # normalized sql -> (result, tables it reads or None if unknown, time cached)
+        self._cache = OrderedDict()
+
+    def _render_value(self, value):
+        if isinstance(value, str) and len(value) > self.max_string_length:
+            return value[: self.max_string_length] + "..."
+        return value
+
+    def _stream(self, sql: str) -> QueryResult:
+        """run a read-only statement, rendering rows until the token budget is
+        used up & summarizing the rest"""
+        start = time.perf_counter()
+        rendered, tokens, rows_shown, row_count = [], 2, 0, 0
+        truncated = False
+        with self.engine.connect() as conn:
+            result = conn.execution_options(
+                stream_results=True, max_row_buffer=self.fetch_size
+            ).execute(text(sql))
+            columns = [ColumnStats(name) for name in result.keys()]
+            complete = True
+            for row in result:
+                if row_count == self.max_scan_rows:
+                    complete = False
+                    break
+                row_count += 1
+                for stats, value in zip(columns, row):
+                    stats.add(value)
+                if truncated:
+                    continue
+                row_text = repr(tuple(self._render_value(value) for value in row))
+                row_tokens = self.count_tokens(row_text) + 1
+                if tokens + row_tokens > self.token_budget:
+                    truncated = True
+                    continue
+                rendered.append(row_text)
+                tokens += row_tokens
+                rows_shown += 1
+            result.close()
+        # same format as SQLDatabase.run(), so small results don't change
+        output = f"[{', '.join(rendered)}]" if rendered else ""
+        if truncated or not complete:
+            total = f"{row_count}" if complete else f"more than {row_count}"
+            scope = "" if complete else f" (first {row_count} rows)"
+            output += (
+                f"\n-- showing {rows_shown} of {total} rows, the rest was left out "
+                f"to save tokens; add filters, aggregates or LIMIT to see more\n"
+                f"-- column stats{scope}:\n"
+                + "\n".join(f"--   {stats.summary()}" for stats in columns)
+            )
+        return QueryResult(
+            output,
+            rows_shown,
+            row_count,
+            complete,
+            self.count_tokens(output) if output else 0,
+            time.perf_counter() - start,
+        )
+
+    def _referenced_tables(self, sql):
+        return referenced_tables(sql, self.tables() if self.tables else None)
+
+    def execute(self, sql: str) -> QueryResult:
+        """run sql, results of read-only statements are served from the cache
+        (except those locking rows, e.g. SELECT ... FOR UPDATE)"""
+        key = normalize_sql(sql)
+        if not is_read_only(key):
+            start = time.perf_counter()
+            with self.engine.begin() as conn:
+                conn.execute(text(sql))
+            self.invalidate(self._referenced_tables(key) or None)
+            return QueryResult("", 0, 0, True, 0, time.perf_counter() - start)
+        if locks_rows(key):
+            # run for its locks, which a cached result wouldn't take
+            return self._stream(sql)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                result, _, cached_at = entry
+                if self.ttl is None or time.time() - cached_at < self.ttl:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._cache[key]
+            self.misses += 1
+        result = self._stream(sql)
+        with self._lock:
+            used = self._referenced_tables(key) or None
+            self._cache[key] = (result, used, time.time())
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    def run(self, sql: str) -> str:
+        """result of sql as text for the agent, like SQLDatabase.run()"""
+        return self.execute(sql).text
+
+    def invalidate(self, tables: Optional[Iterable[str]] = None):
+        """drop cached results that read any of tables (None = everything)"""
+        with self._lock:
+            if tables is None:
+                self._cache.clear()
+                return
+            tables = {table.lower() for table in tables}
+            for key in [
+                k for k, (_, used, _) in self._cache.items() if used is None or used & tables
+            ]:
+                del self._cache[key]
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._cache),
+        }
@@ -0,0 +1,200 @@
+"""
+response_cache.py - SQLite backed LLM response cache, with optional semantic matching
+
+ResponseCache plugs into LangChain's global LLM cache (set_llm_cache), so it
+sits in front of every LLM call made by any chain - every step of a
+SequentialChain is looked up separately. A response is found by:
+    1. exact match on (normalized prompt, LLM + its parameters) - prompts
+       are dedented & stripped of trailing whitespace, so the same triple
+       quoted prompt indented differently is the same prompt, or
+    2. optionally, the most similar cached prompt of the same LLM, if its
+       embedding's cosine similarity is above a threshold
+Entries expire after a TTL, and once the cache holds more than max_entries
+responses the least recently used ones are evicted.
+
+completion_cache.py adds a memory tier, coalescing of identical calls in
+flight & the raw openai / genai clients on top of it.
+
+Usage:
+    from langchain.globals import set_llm_cache
+    set_llm_cache(ResponseCache("llm_cache.db"))
+"""
+
+import array
+import hashlib
+import math
+import sqlite3
+import textwrap
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    llm TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding BLOB,
+    elapsed REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_llm ON responses (llm);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    lines = textwrap.dedent(prompt.replace("\r\n", "\n")).split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def _key(prompt: str, llm_string: str) -> str:
+    text = f"{llm_string}\x00{normalize_prompt(prompt)}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache(BaseCache):
+    """see module docstring
+
+    Args:
+        db_path: SQLite database file
+        ttl: seconds a response stays valid (None = forever)
+        max_entries: max responses kept, least recently used are evicted
+        embeddings: optional LangChain Embeddings, enables semantic matching
+        similarity_threshold: min cosine similarity for a semantic match
+    """
+
+    def __init__(
+        self,
+        db_path: str = "llm_cache.db",
+        ttl: Optional[float] = 24 * 60 * 60,
+        max_entries: int = 10_000,
+        embeddings=None,
+        similarity_threshold: float = 0.95,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # Streamlit serves each session from its own thread (reentrant, for
+        # subclasses that hold it around the disk tier)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "elapsed" not in columns:  # a db from before there was one
+            self._conn.execute("ALTER TABLE responses ADD COLUMN elapsed REAL NOT NULL DEFAULT 0")
+
+    def _expire(self):
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+            )
+
+    def _semantic_lookup(self, prompt, llm_string):
+        """key of the most similar cached prompt of this LLM, if similar enough"""
+        query = self.embeddings.embed_query(prompt)
+        best_key, best_score = None, self.similarity_threshold
+        rows = self._conn.execute(
+            "SELECT key, embedding FROM responses WHERE llm = ? AND embedding IS NOT NULL",
+            (llm_string,),
+        )
+        for key, blob in rows:
+            score = _cosine(query, array.array("f", blob))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _read(self, key: str, prompt: str, llm_string: str):
+        """(response, elapsed, created) of key - or of the most similar prompt,
+        with embeddings - None if it isn't cached"""
+        with self._lock:
+            self._expire()
+            query = "SELECT response, elapsed, created FROM responses WHERE key = ?"
+            row = self._conn.execute(query, (key,)).fetchone()
+            if row is None and self.embeddings is not None:
+                key = self._semantic_lookup(normalize_prompt(prompt), llm_string)
+                if key is not None:
+                    row = self._conn.execute(query, (key,)).fetchone()
+                    self.semantic_hits += 1
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+                )
+            self._conn.commit()
+        return None if row is None else (loads(row[0]), row[1], row[2])
+
+    def _write(self, key: str, llm_string: str, prompt: str, response, elapsed: float = 0.0):
+        """store response (anything langchain_core.load can (de)serialize) to
+        prompt, elapsed is how long the call took"""
+        prompt = normalize_prompt(prompt)
+        embedding = None
+        if self.embeddings is not None:
+            embedding = array.array("f", self.embeddings.embed_query(prompt)).tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, llm, prompt, response, embedding, elapsed, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, llm_string, prompt, dumps(response), embedding, elapsed, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        entry = self._read(_key(prompt, llm_string), prompt, llm_string)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self._write(_key(prompt, llm_string), llm_string, prompt, list(return_val))
+
+    def evict(self, prompt: str) -> int:
+        """forget the responses to prompt (of any LLM), e.g. one that turned
+        out to be unusable - returns the number of responses removed"""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM responses WHERE prompt = ?", (normalize_prompt(prompt),)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,10 +1,11 @@
 # restaurants-1.py - paramaterise a prompt
 import os
-from langchain.llms import OpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 import streamlit as st
 
+from model_factory import get_model
+
 
 # load environment variables from .env - this seems to create a problem with Streamlit reload
 # load_dotenv()
@@ -27,7 +28,7 @@ os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 # for a certain type of cuisine (for example Mexican, Italian, Indian etc.)
 
 # instantiate our LLM
-llm = OpenAI(temperature=0.7)
+llm = get_model("openai-llm", temperature=0.7)
 
 # create a prompt template
 prompt_template_name = PromptTemplate(
@@ -5,16 +5,72 @@
 # pre-requisits:
 # Install streamlit using: pip install streamlit
 # run this file (in the file's folder) using: streamlit run restaurants.py
+import asyncio
 from dotenv import load_dotenv
-from langchain.llms import OpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain, SequentialChain
+from langchain.globals import get_llm_cache, set_llm_cache
 import streamlit as st
 
+from model_factory import get_model
+from response_cache import ResponseCache
+from menu_parser import MENU_JSON_INSTRUCTIONS, MenuParseError, parse_menu
 
-def get_restaurant_name_and_items(cuisine: str):
-    # our llm
-    llm = OpenAI(temperature=0.6)
+# ask for the menu as "json" (validated against a JSON schema) or as python
+# "tuples" - menu_parser.py reads either, without eval()
+MENU_FORMAT = "json"
+# if the menu can't be parsed, ask again for the menu only (not the name)
+MAX_MENU_RETRIES = 2
+
+SELECT_CUISINE = "<Select Cuisine>"
+CUISINES = (
+    "American",
+    "Mexican",
+    "Indian",
+    "Chinese",
+    "Italian",
+    "Thai",
+    "Vietnamese",
+    "Japanese",
+    "Lebanese",
+    "French",
+)
+
+MENU_PROMPT = "Please suggest 10-15 menu items for {restaurant_name} with fictitious prices. "
+MENU_FORMAT_INSTRUCTIONS = {
+    "tuples": "Return as comma separated list of tuples enclosed in [], example [(menu_item1, price1), (menu_item2, price2),...]",
+    # escape the braces of the schema, PromptTemplate would read them as variables
+    "json": MENU_JSON_INSTRUCTIONS.replace("{", "{{").replace("}", "}}"),
+}
+
+
+@st.cache_resource
+def get_response_cache():
+    """cache LLM responses in a local SQLite db, so picking a cuisine that was
+    picked before (by anyone) doesn't call OpenAI again - see response_cache.py
+    NOTE: semantic matching is left off, as prompts for different cuisines
+    are near identical & would match each other"""
+    cache = ResponseCache("restaurants_cache.db", ttl=7 * 24 * 60 * 60)
+    # every LLM call of every chain is looked up in the cache first
+    set_llm_cache(cache)
+    return cache
+
+
+@st.cache_resource
+def get_llm():
+    # our llm, created once per process (see model_factory.py)
+    return get_model("openai-llm", temperature=0.6)
+
+
+@st.cache_resource
+def get_retry_llm():
+    # the same llm, but its answers are never looked up in (or added to) the
+    # response cache - a retry must really ask again
+    return get_model("openai-llm", temperature=0.6, cache=False)
+
+
+def build_restaurant_chain(llm, menu_format=MENU_FORMAT):
+    """build the prompts & chains for llm"""
 
     # prompt template for the restaurant name, given a cuisine
     prompt_template_name = PromptTemplate(
@@ -38,8 +94,7 @@ def get_restaurant_name_and_items(cuisine: str):
         input_variables=["restaurant_name"],
         # this is your prompt - same as above except the cuisine is parameterised with {}
         # similar to a Python f-string
-        template="""Please suggest 10-15 menu items for {restaurant_name} with fictitious prices. \
-                 Return as comma separated list of tuples enclosed in [], example [(menu_item1, price1), (menu_item2, price2),...]""",
+        template=MENU_PROMPT + MENU_FORMAT_INSTRUCTIONS[menu_format],
     )
 
     # chain is the same as before
@@ -56,12 +111,115 @@ def get_restaurant_name_and_items(cuisine: str):
         # NOTE: here we specify the output variables too
         output_variables=["restaurant_name", "menu_items"],
     )
+    return seq_chain
+
+
+@st.cache_resource
+def get_restaurant_chain(menu_format=MENU_FORMAT):
+    """build the LLM, prompts & chains once per process, instead of on every
+    Streamlit rerun"""
+    return build_restaurant_chain(get_llm(), menu_format)
+
+
+def build_menu_retry_chain(llm, menu_format=MENU_FORMAT):
+    """menu step only, for when the menu the LLM returned can't be parsed
+    llm should bypass the response cache (see get_retry_llm()), so retries
+    aren't answered - or their bad answers kept - by the cache"""
+    prompt_template_retry = PromptTemplate(
+        input_variables=["restaurant_name", "attempt"],
+        template=MENU_PROMPT
+        + MENU_FORMAT_INSTRUCTIONS[menu_format]
+        + "\nReply with the list ONLY, your previous reply could not be read (attempt {attempt}).",
+    )
+    return LLMChain(llm=llm, prompt=prompt_template_retry, output_key="menu_items")
+
 
+@st.cache_resource
+def get_menu_retry_chain(menu_format=MENU_FORMAT):
+    return build_menu_retry_chain(get_retry_llm(), menu_format)
+
+
+def evict_menu(menu_chain, restaurant_name):
+    """drop a menu that couldn't be parsed from the response cache, otherwise
+    every rerun for this cuisine would be served the same unreadable menu"""
+    cache = get_llm_cache()
+    if isinstance(cache, ResponseCache):
+        cache.evict(menu_chain.prompt.format(restaurant_name=restaurant_name))
+
+
+def get_restaurant_name_and_items(cuisine: str):
+    get_response_cache()
+    seq_chain = get_restaurant_chain()
     # now we execute the chain. Note how the call is a bit different
     response = seq_chain({"cuisine": cuisine})
+
+    # read the menu safely, on failure re-run just the menu step - the
+    # restaurant name we already have is fine
+    for attempt in range(1, MAX_MENU_RETRIES + 2):
+        try:
+            response["menu"] = parse_menu(response["menu_items"])
+            break
+        except MenuParseError:
+            if attempt == 1:
+                evict_menu(seq_chain.chains[1], response["restaurant_name"])
+            if attempt > MAX_MENU_RETRIES:
+                raise
+            response["menu_items"] = get_menu_retry_chain().run(
+                restaurant_name=response["restaurant_name"], attempt=attempt
+            )
     return response
 
 
+async def arun_restaurant_pipelines(cuisines, seq_chain, retry_chain, max_concurrency=4):
+    """names & menus for many cuisines, concurrently
+
+    Each cuisine runs as its own name -> menu pipeline, so a menu is requested
+    as soon as that cuisine's name arrives, instead of waiting for the slowest
+    name like a batch of name calls (abatch) followed by a batch of menu calls
+    would. A semaphore bounds the number of LLM calls in flight.
+    Returns one response per cuisine, in order, or the exception it failed with
+    """
+    name_chain, menu_chain = seq_chain.chains
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(chain, **inputs):
+        async with semaphore:
+            return await chain.ainvoke(inputs)
+
+    async def pipeline(cuisine):
+        response = await call(name_chain, cuisine=cuisine)
+        response.update(await call(menu_chain, restaurant_name=response["restaurant_name"]))
+        for attempt in range(1, MAX_MENU_RETRIES + 2):
+            try:
+                response["menu"] = parse_menu(response["menu_items"])
+                return response
+            except MenuParseError:
+                if attempt == 1:
+                    evict_menu(menu_chain, response["restaurant_name"])
+                if attempt > MAX_MENU_RETRIES:
+                    raise
+                retry = await call(
+                    retry_chain, restaurant_name=response["restaurant_name"], attempt=attempt
+                )
+                response["menu_items"] = retry["menu_items"]
+
+    return await asyncio.gather(
+        *(pipeline(cuisine) for cuisine in cuisines), return_exceptions=True
+    )
+
+
+def get_restaurant_name_and_items_batch(cuisines, max_concurrency: int = 4):
+    """batch version of get_restaurant_name_and_items(), for many cuisines at once
+    returns {cuisine: response}, a failed cuisine maps to the exception raised"""
+    get_response_cache()
+    responses = asyncio.run(
+        arun_restaurant_pipelines(
+            cuisines, get_restaurant_chain(), get_menu_retry_chain(), max_concurrency
+        )
+    )
+    return dict(zip(cuisines, responses))
+
+
 def main():
     # load environment variables from .env - this seems to create a problem with Streamlit reload
     load_dotenv()
@@ -79,33 +237,24 @@ def main():
     st.title("Restaurant name &amp; menu generator")
 
     # create a side-bar to select a cuisine from the following
-    SELECT_CUISINE = "<Select Cuisine>"
-    cuisines = (
-        SELECT_CUISINE,
-        "American",
-        "Mexican",
-        "Indian",
-        "Chinese",
-        "Italian",
-        "Thai",
-        "Vietnamese",
-        "Japanese",
-        "Lebanese",
-        "French",
-    )
+    cuisines = (SELECT_CUISINE,) + CUISINES
     # capture user's selection to a variable
     cuisine = st.sidebar.selectbox("Pick a cuisine", sorted(cuisines))
     # cuisine = "Arabic"
 
     # following runs only if user selects any item
     if cuisine and (cuisine != SELECT_CUISINE):
-        response = get_restaurant_name_and_items(cuisine)
+        try:
+            response = get_restaurant_name_and_items(cuisine)
+        except MenuParseError:
+            st.error("Sorry, could not come up with a menu. Please try again!")
+            return
         # print(response)
         # display the results
         st.header(f"Welcome to _{response['restaurant_name'].strip()}_")
         st.text("We are happy to serve you. Please pick your items from menu:")
-        for item_and_price in eval(response["menu_items"].strip()):
-            st.markdown(f"* {item_and_price[0]}&nbsp;&nbsp;({item_and_price[1]})")
+        for item, price in response["menu"]:
+            st.markdown(f"* {item}&nbsp;&nbsp;({price})")
 
 if __name__ == "__main__":
     main()
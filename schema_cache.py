@@ -0,0 +1,280 @@
+"""
+schema_cache.py - schema metadata cache & pooled engine for the SQL agent
+
+SQLDatabase reflects the database (and runs a SELECT for sample rows) every
+time the agent lists tables or asks for the schema of a table - i.e. several
+times per question. SchemaCache reads tables, columns & sample rows once,
+saves them to a JSON file so that the next run starts warm, and only re-reads
+them when a cheap catalog checksum query says the schema changed.
+CachedSQLDatabase serves the cached metadata to SQLDatabaseToolkit's tools.
+
+Note: the checksum covers tables & columns, not data, so sample rows are only
+refreshed along with the schema (they are just examples for the LLM).
+
+Usage:
+    engine = create_pooled_engine("sqlite:///chinook.db")
+    db = CachedSQLDatabase(engine, SchemaCache(engine, "schema_cache.json"))
+    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain.sql_database import SQLDatabase
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+# one query to fingerprint the schema, per dialect (see SchemaCache.checksum)
+CATALOG_QUERIES = {
+    # hashed server side, so a single short row comes back
+    "postgresql": (
+        "SELECT md5(string_agg(table_name || '.' || column_name || ':' || data_type, ',' "
+        "ORDER BY table_name, ordinal_position)) FROM information_schema.columns "
+        "WHERE table_schema = COALESCE(:schema, current_schema())"
+    ),
+    "sqlite": "SELECT type, name, sql FROM sqlite_master ORDER BY type, name",
+}
+
+
+def create_pooled_engine(
+    uri: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30,
+    pool_recycle: int = 30 * 60,
+):
+    """SQLAlchemy engine with an explicit connection pool
+
+    Connections are checked (pool_pre_ping) before being handed out & recycled
+    after pool_recycle seconds, so connections dropped by the server or a
+    firewall don't surface as agent errors.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        connect_args = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # every connection to :memory: is a different database, so share one
+            return create_engine(uri, poolclass=StaticPool, connect_args=connect_args)
+        return create_engine(
+            uri,
+            poolclass=QueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=True,
+            connect_args=connect_args,
+        )
+    return create_engine(
+        uri,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,
+    )
+
+
+class SchemaCache:
+    """tables, columns & table info (CREATE TABLE + sample rows) of a database
+
+    Args:
+        engine: SQLAlchemy engine of the database
+        cache_path: JSON file the metadata is saved to (None = memory only)
+        sample_rows: number of sample rows in the table info
+        check_interval: seconds between checksum queries, 0 = check on every use
+        schema: database schema, None for the default one
+    """
+
+    def __init__(
+        self,
+        engine,
+        cache_path: Optional[str] = "schema_cache.json",
+        sample_rows: int = 3,
+        check_interval: float = 30.0,
+        schema: Optional[str] = None,
+    ):
+        self.engine = engine
+        self.cache_path = cache_path
+        self.sample_rows = sample_rows
+        self.check_interval = check_interval
+        self.schema = schema
+        self.url = engine.url.render_as_string(hide_password=True)
+        self.num_builds = 0
+        self.num_checks = 0
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._meta = self._load()
+
+    def _load(self) -> Optional[dict]:
+        """saved metadata, None if there is none (for this database)"""
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != self.url or meta.get("schema") != self.schema:
+            return None
+        return meta
+
+    def _save(self):
+        if self.cache_path is None:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def checksum(self) -> str:
+        """fingerprint of the schema, from a single catalog query"""
+        self.num_checks += 1
+        query = CATALOG_QUERIES.get(self.engine.dialect.name)
+        with self.engine.connect() as conn:
+            if query is not None:
+                params = {"schema": self.schema} if ":schema" in query else {}
+                rows = conn.execute(text(query), params).fetchall()
+            else:
+                # no catalog query for this dialect, go through the inspector
+                inspector = inspect(conn)
+                rows = [
+                    (table, column["name"], str(column["type"]))
+                    for table in sorted(inspector.get_table_names(schema=self.schema))
+                    for column in inspector.get_columns(table, schema=self.schema)
+                ]
+        return hashlib.sha256(repr(rows).encode("utf-8")).hexdigest()
+
+    def _build(self, checksum: str) -> dict:
+        """read the metadata of every table from the database"""
+        db = SQLDatabase(
+            self.engine,
+            schema=self.schema,
+            sample_rows_in_table_info=self.sample_rows,
+            lazy_table_reflection=True,
+        )
+        inspector = inspect(self.engine)
+        tables = {}
+        for table in db.get_usable_table_names():
+            columns = inspector.get_columns(table, schema=self.schema)
+            tables[table] = {
+                "columns": [[c["name"], str(c["type"])] for c in columns],
+                "info": db.get_table_info([table]),
+            }
+        self.num_builds += 1
+        return {
+            "url": self.url,
+            "schema": self.schema,
+            "checksum": checksum,
+            "built": time.time(),
+            "tables": tables,
+        }
+
+    def refresh(self, force: bool = False) -> bool:
+        """make sure the metadata is current, returns True if it was rebuilt
+
+        The checksum query runs at most once every check_interval seconds.
+        """
+        if not force and self._meta is not None:
+            if time.monotonic() - self._checked < self.check_interval:
+                return False
+        with self._lock:
+            checksum = self.checksum()
+            self._checked = time.monotonic()
+            if not force and self._meta is not None and self._meta["checksum"] == checksum:
+                return False
+            self._meta = self._build(checksum)
+            self._save()
+            return True
+
+    def _tables(self) -> Dict[str, dict]:
+        self.refresh()
+        return self._meta["tables"]
+
+    @property
+    def tables(self) -> List[str]:
+        return sorted(self._tables())
+
+    @property
+    def version(self) -> str:
+        """checksum of the current schema, changes whenever the schema does"""
+        self.refresh()
+        return self._meta["checksum"]
+
+    def columns(self, table: str) -> List[List[str]]:
+        """[name, type] of each column of table"""
+        return self._tables()[table]["columns"]
+
+    def table_info(self, table: str) -> str:
+        """CREATE TABLE statement + sample rows, same as SQLDatabase.get_table_info()"""
+        return self._tables()[table]["info"]
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """SQLDatabase that answers table listings & schema lookups from a SchemaCache
+
+    Queries themselves still run against the database, through the engine's
+    pool - or through executor (a query_executor.QueryExecutor), if given.
+    """
+
+    def __init__(self, engine, schema_cache: SchemaCache, executor=None, **kwargs):
+        # must be set first, SQLDatabase.__init__ calls get_usable_table_names()
+        self.schema_cache = schema_cache
+        self.executor = executor
+        kwargs.setdefault("schema", schema_cache.schema)
+        kwargs.setdefault("sample_rows_in_table_info", schema_cache.sample_rows)
+        # tables are reflected by SchemaCache, only when the schema changes
+        kwargs["lazy_table_reflection"] = True
+        super().__init__(engine, **kwargs)
+
+    def get_usable_table_names(self) -> List[str]:
+        tables = set(self.schema_cache.tables)
+        if self._include_tables:
+            return sorted(self._include_tables & tables)
+        return sorted(tables - self._ignore_tables)
+
+    def get_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        usable_tables = self.get_usable_table_names()
+        if table_names is None:
+            table_names = usable_tables
+        missing_tables = set(table_names).difference(usable_tables)
+        if missing_tables:
+            raise ValueError(f"table_names {missing_tables} not found in database")
+        tables = []
+        for table in table_names:
+            if self._custom_table_info and table in self._custom_table_info:
+                tables.append(self._custom_table_info[table])
+            else:
+                tables.append(self.schema_cache.table_info(table))
+        return "\n\n".join(sorted(tables))
+
+    def run(
+        self,
+        command,
+        fetch: str = "all",
+        include_columns: bool = False,
+        *,
+        parameters: Optional[Dict[str, Any]] = None,
+        execution_options: Optional[Dict[str, Any]] = None,
+    ):
+        # the agent's sql_db_query tool only ever runs plain SQL strings
+        if (
+            self.executor is None
+            or not isinstance(command, str)
+            or fetch != "all"
+            or include_columns
+            or parameters
+            or execution_options
+        ):
+            return super().run(
+                command,
+                fetch,
+                include_columns,
+                parameters=parameters,
+                execution_options=execution_options,
+            )
+        return self.executor.run(command)
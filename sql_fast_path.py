@@ -0,0 +1,329 @@
+"""
+sql_fast_path.py - answer database questions with one SQL generating LLM call,
+falling back to the SQL agent only when that fails
+
+The ReAct SQL agent needs 4-6 LLM round trips per question (list tables, get
+the schema, check the query, run it, answer), even for simple questions that
+have been asked before. SQLFastPath instead:
+    1. looks the question's shape up in a template cache - questions that only
+       differ in their literals ("orders over 100" / "orders over 250") reuse
+       the SQL of an earlier answer, with the new values filled in
+    2. otherwise puts the schema of the relevant tables (from the schema cache)
+       into a single prompt asking for the SQL query
+    3. checks the SQL locally: read-only, balanced quotes & parentheses, then
+       EXPLAIN (the database parses & plans it, without running it)
+    4. runs it (through the QueryExecutor, if the database has one) and asks
+       the LLM to phrase the answer from the result
+If anything fails along the way, the question is handed to the full agent.
+
+Usage:
+    fast_path = SQLFastPath(llm, db, agent=agent_executor)
+    print(fast_path.run("How many orders were placed in 2023?"))
+"""
+
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.prompts import PromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy import text
+
+from query_executor import LITERAL_RE, is_read_only, normalize_sql
+
+SQL_PROMPT = PromptTemplate(
+    template="""You are a {dialect} expert. Write one syntactically correct {dialect} \
+query that answers the question below, using only the tables & columns shown.
+Unless the question asks for a specific number of results, return at most {top_k} \
+rows using LIMIT. Never write to the database (no INSERT, UPDATE, DELETE, DROP etc.).
+Return only the SQL query, no explanation and no markdown.
+
+Tables:
+{table_info}
+
+Question: {question}
+SQL query:""",
+    input_variables=["dialect", "top_k", "table_info", "question"],
+)
+
+ANSWER_PROMPT = PromptTemplate(
+    template="""Answer the question from the result of the SQL query, in one or two \
+sentences.
+
+Question: {question}
+SQL query: {sql}
+SQL result: {result}
+Answer:""",
+    input_variables=["question", "sql", "result"],
+)
+
+# quoted strings, numbers & capitalized words are the literals of a question
+QUESTION_TOKEN_RE = re.compile(
+    r"'([^']*)'|\"([^\"]*)\"|(?<![\w.])(\d+(?:\.\d+)?)(?![\w.]*\w)|([A-Za-z][\w-]*)|(\S)"
+)
+FENCE_RE = re.compile(r"```(?:sql)?", re.IGNORECASE)
+
+
+def _words(text: str) -> set:
+    """lower case words, plurals folded, for matching questions to tables"""
+    return {w[:-1] if w.endswith("s") else w for w in re.findall(r"[a-z0-9]+", text.lower())}
+
+
+def question_shape(question: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """question skeleton (literals replaced by <s>/<n>) & its (kind, value) literals"""
+    parts, literals = [], []
+    for i, match in enumerate(QUESTION_TOKEN_RE.finditer(question.strip().rstrip("?.!"))):
+        single, double, number, word, other = match.groups()
+        if single is not None or double is not None:
+            literals.append(("s", single if single is not None else double))
+        elif number is not None:
+            literals.append(("n", number))
+        elif word is not None and i > 0 and word[0].isupper() and word != "I":
+            literals.append(("s", word))
+        else:
+            parts.append((word or other).lower())
+            continue
+        parts.append(f"<{literals[-1][0]}>")
+    return " ".join(parts), literals
+
+
+def sql_literal(kind: str, value: str) -> str:
+    if kind == "n":
+        return str(float(value)) if "." in value else str(int(value))
+    return "'" + value.replace("'", "''") + "'"
+
+
+def extract_sql(output: str) -> str:
+    """the SQL statement in an LLM answer"""
+    output = FENCE_RE.sub("", output)
+    for prefix in ("SQLQuery:", "SQL query:", "SQL:"):
+        if prefix in output:
+            output = output.split(prefix, 1)[1]
+    output = output.split("SQLResult:", 1)[0]
+    code = LITERAL_RE.sub(lambda m: "x" * len(m.group()), output)
+    end = code.find(";")
+    return (output if end < 0 else output[:end]).strip()
+
+
+def check_sql(sql: str) -> Optional[str]:
+    """cheap local checks of a generated statement, an error message or None"""
+    if not sql:
+        return "no SQL query found"
+    normalized = normalize_sql(sql)
+    if not is_read_only(normalized):
+        return "not a read-only query"
+    code = LITERAL_RE.sub(" ", normalized)
+    if "'" in code:
+        return "unbalanced quotes"
+    depth = 0
+    for char in code:
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if depth < 0:
+            break
+    if depth != 0:
+        return "unbalanced parentheses"
+    return None
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    """counts LLM calls, including the ones made by the agent & its tools"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any):
+        self.calls += 1
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, **kwargs: Any):
+        self.calls += 1
+
+
+class SQLFastPath:
+    """see module docstring
+
+    Args:
+        llm: LLM (or chat model) writing the SQL & phrasing the answer
+        db: schema_cache.CachedSQLDatabase
+        agent: SQL agent for questions the fast path can't answer (optional)
+        top_k: default LIMIT asked for in the prompt
+        max_tables: max number of tables whose schema goes into the prompt
+        max_templates: number of question templates kept, least recently
+            used are evicted
+    """
+
+    def __init__(self, llm, db, agent=None, top_k=10, max_tables=4, max_templates=500):
+        self.llm = llm
+        self.db = db
+        self.agent = agent
+        self.top_k = top_k
+        self.max_tables = max_tables
+        self.max_templates = max_templates
+        self._lock = threading.Lock()
+        # question skeleton -> {"sql": SQL with __pN__ slots, "fixed": {N: value}}
+        self._templates = OrderedDict()
+        self._schema_version = None
+
+    def _invoke(self, prompt: str, callbacks) -> str:
+        output = self.llm.invoke(prompt, config={"callbacks": callbacks})
+        return getattr(output, "content", output)
+
+    async def _ainvoke(self, prompt: str, callbacks) -> str:
+        output = await self.llm.ainvoke(prompt, config={"callbacks": callbacks})
+        return getattr(output, "content", output)
+
+    def relevant_tables(self, question: str) -> List[str]:
+        """tables whose name or columns are mentioned by the question, best first"""
+        schema_cache = self.db.schema_cache
+        words = _words(question)
+        scores = {}
+        for table in self.db.get_usable_table_names():
+            score = 3 * len(_words(table) & words)
+            columns = schema_cache.columns(table)
+            score += len(_words(" ".join(name for name, _ in columns)) & words)
+            scores[table] = score
+        ranked = sorted(scores, key=lambda table: -scores[table])
+        matching = [table for table in ranked if scores[table] > 0]
+        # nothing matches - let the LLM pick from all the (first few) tables
+        return (matching or ranked)[: self.max_tables]
+
+    def _sql_prompt(self, question: str) -> str:
+        return SQL_PROMPT.format(
+            dialect=self.db.dialect,
+            top_k=self.top_k,
+            table_info=self.db.get_table_info(self.relevant_tables(question)),
+            question=question,
+        )
+
+    def generate_sql(self, question: str, callbacks=None) -> str:
+        return extract_sql(self._invoke(self._sql_prompt(question), callbacks))
+
+    def validate(self, sql: str) -> Optional[str]:
+        """error message if sql is not a valid read-only query, None if it is"""
+        error = check_sql(sql)
+        if error:
+            return error
+        try:
+            with self.db.schema_cache.engine.connect() as conn:
+                conn.execute(text(f"EXPLAIN {sql}"))
+        except Exception as e:
+            return f"EXPLAIN failed: {e}"
+        return None
+
+    def _template_sql(self, question: str) -> Optional[str]:
+        """SQL of an earlier question of the same shape, with this question's values"""
+        # templates are only valid for the schema they were written for
+        version = self.db.schema_cache.version
+        skeleton, literals = question_shape(question)
+        with self._lock:
+            if version != self._schema_version:
+                self._templates.clear()
+                self._schema_version = version
+            template = self._templates.get(skeleton)
+            if template is None:
+                return None
+            self._templates.move_to_end(skeleton)
+        if any(literals[i][1] != value for i, value in template["fixed"].items()):
+            return None
+        sql = template["sql"]
+        for i, (kind, value) in enumerate(literals):
+            sql = sql.replace(f"__p{i}__", sql_literal(kind, value))
+        return sql
+
+    def _learn_template(self, question: str, sql: str):
+        """remember sql for questions of this shape, the question's literals that
+        appear in sql become parameters"""
+        skeleton, literals = question_shape(question)
+        template_sql, fixed = sql, {}
+        for i, (kind, value) in enumerate(literals):
+            if kind == "n":
+                pattern = re.compile(r"(?<![\w.'])" + re.escape(value) + r"(?![\w.'])")
+            else:
+                pattern = re.compile(re.escape(sql_literal(kind, value)))
+            if pattern.search(template_sql):
+                template_sql = pattern.sub(f"__p{i}__", template_sql)
+            else:
+                fixed[i] = value
+        with self._lock:
+            self._templates[skeleton] = {"sql": template_sql, "fixed": fixed}
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+
+    def _execute(self, sql: str) -> Tuple[Optional[str], Optional[str]]:
+        """(result, None) or (None, error message)"""
+        executor = self.db.executor
+        try:
+            return (executor.run(sql) if executor is not None else self.db.run(sql)), None
+        except Exception as e:
+            return None, f"query failed: {e}"
+
+    def answer(self, question: str) -> dict:
+        """answer question, returns a dict with the answer & how it was found:
+        source is "template", "llm" or "agent" and llm_calls the number of LLM
+        calls it took"""
+        counter = LLMCallCounter()
+        sql, source, error = self._template_sql(question), "template", None
+        if sql is not None:
+            result, error = self._execute(sql)
+            if error is not None:
+                sql = None  # e.g. values that don't fit the template, ask the LLM
+        if sql is None:
+            sql, source = self.generate_sql(question, [counter]), "llm"
+            error = self.validate(sql)
+            if error is None:
+                result, error = self._execute(sql)
+        if error is None:
+            if source == "llm":
+                self._learn_template(question, sql)
+            answer = self._invoke(self._answer_prompt(question, sql, result), [counter])
+            return self._response(answer.strip(), sql, source, counter)
+        if self.agent is None:
+            raise ValueError(f"Could not answer {question!r} with SQL {sql!r}: {error}")
+        answer = self.agent.run(question, callbacks=[counter])
+        return self._response(answer, None, "agent", counter, error)
+
+    async def aanswer(self, question: str) -> dict:
+        """async answer(): LLM calls are awaited, database work runs in worker
+        threads & the agent fallback goes through agent.arun()"""
+        counter = LLMCallCounter()
+        sql = await asyncio.to_thread(self._template_sql, question)
+        source, error = "template", None
+        if sql is not None:
+            result, error = await asyncio.to_thread(self._execute, sql)
+            if error is not None:
+                sql = None
+        if sql is None:
+            prompt = await asyncio.to_thread(self._sql_prompt, question)
+            sql, source = extract_sql(await self._ainvoke(prompt, [counter])), "llm"
+            error = await asyncio.to_thread(self.validate, sql)
+            if error is None:
+                result, error = await asyncio.to_thread(self._execute, sql)
+        if error is None:
+            if source == "llm":
+                self._learn_template(question, sql)
+            answer = await self._ainvoke(self._answer_prompt(question, sql, result), [counter])
+            return self._response(answer.strip(), sql, source, counter)
+        if self.agent is None:
+            raise ValueError(f"Could not answer {question!r} with SQL {sql!r}: {error}")
+        answer = await self.agent.arun(question, callbacks=[counter])
+        return self._response(answer, None, "agent", counter, error)
+
+    @staticmethod
+    def _answer_prompt(question, sql, result):
+        return ANSWER_PROMPT.format(question=question, sql=sql, result=result or "no rows")
+
+    @staticmethod
+    def _response(answer, sql, source, counter, error=None) -> dict:
+        response = {"answer": answer, "sql": sql, "source": source, "llm_calls": counter.calls}
+        if error is not None:
+            response["error"] = error
+        return response
+
+    def run(self, question: str) -> str:
+        """same as agent.run(), so it can be used instead of the agent"""
+        return self.answer(question)["answer"]
+
+    async def arun(self, question: str) -> str:
+        """same as agent.arun()"""
+        return (await self.aanswer(question))["answer"]
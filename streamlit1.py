@@ -7,9 +7,9 @@ import pandas as pd
 load_dotenv()
 print(f"OPENAI_API_KEY = {os.getenv('OPENAI_API_KEY')}")
 
-from openai import OpenAI
+from model_factory import get_model
 
-client = OpenAI()
+client = get_model("openai-client")
 
 completion = client.chat.completions.create(
     model="gpt-3.5-turbo",
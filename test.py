@@ -1,9 +1,9 @@
 # test.py - test if I can call OpenAPI
 import os
-import openai
-from langchain.llms import OpenAI
 import streamlit as st
 
+from model_factory import get_model
+
 
 # setup the OpenAI API Key (read from file)
 OPEN_API_KEY_FILE = r"c:\dev\OpenAIKey.txt"
@@ -19,7 +19,7 @@ os.environ["OPENAI_API_KEY"] = OPEN_API_KEY
 st.title("LangChain demo with OpenAI API")
 input_text = st.text_input("Search the topic you want")
 
-llm = OpenAI(temperature=0.8)
+llm = get_model("openai-llm", temperature=0.8)
 
 if input_text:
     # just display response from LLM
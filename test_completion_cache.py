@@ -0,0 +1,92 @@
+"""
+test_completion_cache.py - in-flight calls of completion_cache.CompletionCache
+on the LangChain path, which only reports lookups & successful updates
+
+usage: python -m pytest test_completion_cache.py
+"""
+import threading
+import time
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models.llms import LLM
+
+from completion_cache import CompletionCache
+
+WAIT_TIMEOUT = 3.0
+
+
+class FlakyLLM(LLM):
+    """answers the prompt back after delay seconds, fails while failures > 0"""
+
+    delay: float = 0.2
+    failures: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "flaky"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("rate limited")
+        return f"answer to {prompt}"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CompletionCache(str(tmp_path / "cache.db"), wait_timeout=WAIT_TIMEOUT)
+
+
+def test_retry_after_failure_does_not_wait(cache):
+    llm = FlakyLLM(failures=1, cache=cache)
+    with pytest.raises(RuntimeError):
+        llm.invoke("hello")
+    start = time.perf_counter()
+    assert llm.invoke("hello") == "answer to hello"
+    assert time.perf_counter() - start < WAIT_TIMEOUT / 2
+    assert llm.calls == 2
+
+
+def test_same_prompt_twice_in_a_batch_does_not_wait(cache):
+    llm = FlakyLLM(cache=cache)
+    start = time.perf_counter()
+    result = llm.generate(["same", "same"])
+    assert time.perf_counter() - start < WAIT_TIMEOUT / 2
+    assert [g[0].text for g in result.generations] == ["answer to same"] * 2
+
+
+def test_failed_call_releases_its_waiters(cache):
+    llm = FlakyLLM(delay=0.5, failures=1, cache=cache, callbacks=[cache.error_handler])
+    errors = []
+
+    def failing():
+        try:
+            llm.invoke("hello")
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=failing)
+    leader.start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    assert llm.invoke("hello") == "answer to hello"
+    leader.join()
+    assert time.perf_counter() - start < WAIT_TIMEOUT / 2
+    assert len(errors) == 1
+
+
+def test_identical_concurrent_calls_share_one_call(cache):
+    llm = FlakyLLM(delay=0.3, cache=cache)
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(llm.invoke("hello"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert answers == ["answer to hello"] * 8
+    assert llm.calls == 1
+    assert cache.stats["shared"] == 7
@@ -1,35 +1,42 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 
 import streamlit as st
 import os
-import google.generativeai as genai
+
+# completion_cache.py & model_factory.py are shared by all the scripts, in the
+# repository root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from completion_cache import CompletionCache
+from model_factory import get_model
 
 
 # load API keys from local .env file
 load_dotenv(find_dotenv())
-# configure API access with key
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 
 # (Optional) - set the configuration that controls how responses are generated
-# by the Gemini model
-config = genai.GenerationConfig(
-    temperature=0.0,
-    # response_mime_type="application/json",
-)
+# by the Gemini model (a dict works as well as a genai.GenerationConfig)
+config = {
+    "temperature": 0.0,
+    # "response_mime_type": "application/json",
+}
+
+# create the Gemini model for use - we'll use flash, google.generativeai is
+# configured with GOOGLE_API_KEY by model_factory.py
+model = get_model("genai", "gemini-1.5-flash", generation_config=config)
+
 
-# create the Gemini model for use - we'll use flash
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config=config,
-)
+# answers (temperature 0) are cached in memory & on disk, asking the same
+# question again doesn't call Gemini
+cache = CompletionCache("completion_cache.db")
 
 
 # get response from Gemini model
 def get_gemini_response(question):
-    response = model.generate_content(question)
-    return response.text
+    return cache.generate_content(model, question)
 
 
 def main():
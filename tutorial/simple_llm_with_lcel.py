@@ -1,15 +1,18 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 
-import os
-from langchain_openai import ChatOpenAI
+# model_factory.py is shared by all the scripts, in the repository root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from model_factory import get_model
 
 
 # load API keys from local .env file
 load_dotenv(find_dotenv())
 
 # create instance of OpenAI GPT-4
-model = ChatOpenAI(model="gpt-4")
+model = get_model("openai", "gpt-4")
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
@@ -0,0 +1,91 @@
+"""
+word_budget.py - token budget & early stopping for answers of about N words
+
+Asking a local model for "no more than N words" doesn't stop it: it writes
+until it runs into max_new_tokens, so a fixed max_new_tokens (256 in
+llama2_app1.py) both wastes time on short answers and cuts long ones off
+mid-sentence. Instead:
+    * token_budget() turns the number of words into max_new_tokens, using the
+      model's own tokenizer to measure how many tokens a word takes (once per
+      model)
+    * until_word_target() stops the token stream as soon as N words are
+      written and a sentence has ended
+
+Usage:
+    max_new_tokens = token_budget(llm, num_words)
+    for token in until_word_target(stream_tokens(llm, prompt, max_new_tokens=max_new_tokens), num_words):
+        ...
+"""
+
+import json
+import math
+import re
+from typing import Dict, Iterable, Iterator
+
+from local_models import count_tokens
+
+# tokens per English word with the Llama tokenizer, when there's no tokenizer
+TOKENS_PER_WORD = 1.35
+# a paragraph of blog-like prose, to measure the tokens per word of a model
+SAMPLE_TEXT = (
+    "Vector databases store embeddings, the numerical representations that "
+    "machine learning models produce for text, images and audio. Instead of "
+    "matching keywords, they retrieve the items most similar to a query, which "
+    "makes them a natural fit for semantic search, recommendation systems and "
+    "retrieval-augmented generation. For researchers, the interesting questions "
+    "are about indexing strategies, approximate nearest neighbour algorithms "
+    "and the trade-offs between recall, latency and memory consumption."
+)
+SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*\s*$")
+# model -> tokens per word, measured once
+_tokens_per_word: Dict[str, float] = {}
+
+
+def _model_key(llm) -> str:
+    params = getattr(llm, "_identifying_params", {})
+    return f"{type(llm).__name__}:{json.dumps(params, sort_keys=True, default=repr)}"
+
+
+def tokens_per_word(llm) -> float:
+    """average tokens per word of the model's tokenizer, on SAMPLE_TEXT"""
+    key = _model_key(llm)
+    if key not in _tokens_per_word:
+        try:
+            _tokens_per_word[key] = count_tokens(llm, SAMPLE_TEXT) / len(SAMPLE_TEXT.split())
+        except ImportError:
+            # LangChain's default get_num_tokens() needs transformers
+            _tokens_per_word[key] = TOKENS_PER_WORD
+    return _tokens_per_word[key]
+
+
+def token_budget(
+    llm, num_words: int, slack: float = 1.25, min_tokens: int = 32, max_tokens: int = 1536
+) -> int:
+    """max_new_tokens for an answer of about num_words words
+
+    Args:
+        llm: the model, its tokenizer is used to convert words to tokens
+        num_words: words asked for
+        slack: extra room, so the model can finish its last sentence
+        min_tokens, max_tokens: bounds of the budget, max_tokens should leave
+            room for the prompt in the model's context
+    """
+    budget = math.ceil(num_words * tokens_per_word(llm) * slack)
+    return max(min_tokens, min(max_tokens, budget))
+
+
+def until_word_target(tokens: Iterable[str], num_words: int) -> Iterator[str]:
+    """pass tokens on until num_words words are written & a sentence ends,
+    then close the token stream (stopping the generation)"""
+    words, in_word = 0, False
+    for token in tokens:
+        yield token
+        for ch in token:
+            if ch.isspace():
+                in_word = False
+            elif not in_word:
+                words, in_word = words + 1, True
+        if words >= num_words and SENTENCE_END_RE.search(token):
+            if hasattr(tokens, "close"):
+                tokens.close()
+            return